@@ -0,0 +1,168 @@
+# app/api/admin.py
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+
+from app.services.dedup import materialize_duplicates
+from app.services.document_index import rebuild_document_index
+from app.services.index_versions import get_alias_target, list_versions, live_index
+from app.services.reindex import ReindexInProgress, get_job, list_jobs, start_reindex
+from app.services.tenants import (
+    DEFAULT_TENANT,
+    InvalidTenant,
+    list_tenants,
+    route,
+    tenant_alias,
+    tenant_stats,
+    validate_tenant_id,
+)
+from app.utils.auth import token_matches
+from app.utils.config import ADMIN_API_TOKEN, DOCUMENTS_ALIAS, REINDEX_BATCH
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoints do not exist (404) until ADMIN_API_TOKEN is configured;
+    then every request must send it as X-Admin-Token.
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(ADMIN_API_TOKEN, x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+class ReindexRequest(BaseModel):
+    model_id: Optional[str] = None   # default: EMBEDDING_MODEL
+    # None = keep chunks as ingested
+    chunk_strategy: Optional[Literal["fixed", "paragraph", "token", "small_to_big"]] = None
+    batch_size: int = REINDEX_BATCH
+    drop_old: bool = False
+    tenant_id: Optional[str] = None   # rebuild this tenant's dedicated collection instead
+
+
+def _tenant_or_400(tenant_id: Optional[str]) -> Optional[str]:
+    try:
+        return validate_tenant_id(tenant_id)
+    except InvalidTenant as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _dedicated_route_or_404(tenant_id: Optional[str]):
+    tenant_route = route(_tenant_or_400(tenant_id))
+    if tenant_id and not tenant_route.dedicated:
+        raise HTTPException(status_code=404, detail=f"Tenant {tenant_id!r} has no dedicated collection")
+    return tenant_route
+
+
+@router.post("/reindex", status_code=202)
+def reindex(payload: ReindexRequest):
+    """
+    Rebuild the document collection in the background and swap the alias
+    when done. Poll GET /api/admin/reindex/{job_id} for progress.
+    With tenant_id, that tenant's dedicated collection is rebuilt.
+    """
+    _dedicated_route_or_404(payload.tenant_id)
+    try:
+        job = start_reindex(
+            model_id=payload.model_id,
+            chunk_strategy=payload.chunk_strategy,
+            batch_size=payload.batch_size,
+            drop_old=payload.drop_old,
+            alias=tenant_alias(payload.tenant_id) if payload.tenant_id else DOCUMENTS_ALIAS,
+            tenant_id=payload.tenant_id,
+        )
+    except ReindexInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/reindex")
+def reindex_jobs():
+    return {"jobs": list_jobs()}
+
+
+@router.get("/reindex/{job_id}")
+def reindex_status(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reindex job not found")
+    return job
+
+
+@router.get("/collections")
+def collections():
+    """
+    Alias target and every registered collection version.
+    """
+    return {"alias": DOCUMENTS_ALIAS, "live": get_alias_target(), "versions": list_versions()}
+
+
+@router.post("/document-index/rebuild")
+def rebuild_document_vectors(tenant_id: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    (Re)build the live collection's document vectors for hierarchical search
+    from its stored chunk vectors, e.g. for collections created before it existed.
+    With tenant_id, the tenant's dedicated collection is rebuilt.
+    Near-duplicates stored without a point of their own get one first.
+    """
+    collection = _dedicated_route_or_404(tenant_id).collection if tenant_id else live_index()[0]
+    materialized = materialize_duplicates(db, collection)
+    db.commit()
+    return {
+        "collection": collection,
+        "documents": rebuild_document_index(collection),
+        "materialized_duplicates": materialized,
+    }
+
+
+@router.get("/tenants")
+def tenants(db: Session = Depends(get_db)):
+    """
+    Size, placement and query stats of every tenant ("default" = untenanted documents).
+    """
+    return {"tenants": [tenant_stats(db, tenant_id) for tenant_id in list_tenants(db)]}
+
+
+@router.get("/tenants/{tenant_id}")
+def tenant(tenant_id: str, db: Session = Depends(get_db)):
+    if tenant_id == DEFAULT_TENANT:
+        return tenant_stats(db, None)
+    return tenant_stats(db, _tenant_or_400(tenant_id))
+
+
+class DedicateRequest(BaseModel):
+    model_id: Optional[str] = None   # default: EMBEDDING_MODEL
+    batch_size: int = REINDEX_BATCH
+
+
+@router.post("/tenants/{tenant_id}/dedicate", status_code=202)
+def dedicate_tenant(tenant_id: str, payload: Optional[DedicateRequest] = None):
+    """
+    Move a tenant out of the shared collection into its own collection
+    (blue/green copy of its partition, alias swap, then its points are
+    removed from the shared collection). Poll GET /api/admin/reindex/{job_id}.
+    """
+    tenant_id = _tenant_or_400(tenant_id)
+    if not tenant_id:
+        raise HTTPException(status_code=400, detail="tenant_id is required")
+    if route(tenant_id).dedicated:
+        raise HTTPException(status_code=409, detail=f"Tenant {tenant_id!r} already has a dedicated collection")
+
+    payload = payload or DedicateRequest()
+    try:
+        job = start_reindex(
+            model_id=payload.model_id,
+            batch_size=payload.batch_size,
+            alias=tenant_alias(tenant_id),
+            source_alias=DOCUMENTS_ALIAS,
+            tenant_id=tenant_id,
+        )
+    except ReindexInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
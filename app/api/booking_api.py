@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 
 from app.db.database import SessionLocal
 from app.db.models import Booking
+from app.services.booking_cache import booking_cache
 
 
 router = APIRouter()
@@ -44,6 +45,7 @@ def create_booking(data: BookingRequest, db: Session = Depends(get_db)):
     db.add(booking)
     db.commit()
     db.refresh(booking)
+    booking_cache.invalidate(booking.id, [booking.session_id])
 
     return {
         "status": "ok",
@@ -4,6 +4,7 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.db.crud import create_booking
+from app.services.booking_cache import booking_cache
 
 router = APIRouter()
 
@@ -31,4 +32,5 @@ def create_booking_endpoint(payload: BookingIn, db: Session = Depends(get_db)):
         date=payload.date,
         time=payload.time,
     )
+    booking_cache.invalidate(booking.id, [payload.session_id])
     return {"status": "ok", "booking_id": booking.id}
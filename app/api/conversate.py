@@ -1,24 +1,79 @@
 # app/api/conversate.py
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Literal, Optional, Dict, Any, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+import anyio
 import logging
+import time
 
 from app.services.embedding import generate_embeddings
-from app.services.llm_service import generate_response
-from app.services.rag_service import RAGService
+from app.services.llm_service import complete, LLMOverloadedError
+from app.services.intent_service import (
+    IntentService, GREETING, SMALL_TALK, INTERVIEW_BOOKING,
+)
+from app.services.rag_service import RAGService, SearchUnavailable
 from app.db.database import get_db
 from app.db.models import Booking
+from app.services.booking_cache import booking_cache
+from app.services.semantic_memory import semantic_memory
+from app.services.tenants import InvalidTenant, TenantForbidden, authorize_tenant
+from app.services.trace_service import RequestTrace, trace_store
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.deadline import ClientDisconnected, Deadline, DeadlineExceeded
+from app.utils.profiling import profile_request
+from app.utils.rate_limit import API_KEY_HEADER
+from app.utils.metrics import (
+    PROMPT_TOKENS, COMPLETION_TOKENS, CHUNKS_RETRIEVED, INTENT_ROUTES, CONVERSATE_ABANDONED, CONVERSATE_DEGRADED,
+)
+from app.utils.config import (
+    BREAKER_QDRANT_SLOW_MS,
+    BREAKER_REDIS_SLOW_MS,
+    BUDGET_CRITICAL_MS,
+    BUDGET_DEGRADE_MS,
+    BUDGET_LLM_MIN_MS,
+    BUDGET_RESERVE_MS,
+    CONVERSATE_LATENCY_BUDGET_MS,
+    INTENT_EMBEDDINGS,
+    LLM_EXPECTED_TOKENS_PER_SEC,
+    LLM_EXPECTED_TTFT_MS,
+    LLM_MIN_COMPLETION_TOKENS,
+    MEMORY_MODE,
+    MEMORY_RECENT_TURNS,
+    MEMORY_TOP_K,
+    SEARCH_PRECISION,
+    SMALL_TALK_MODEL,
+)
 
 # Redis utilities
-from app.utils.redis_client import get_chat_history, save_message
+from app.utils.redis_client import get_chat_history, save_messages
 
 router = APIRouter()
 logger = logging.getLogger("conversate")
 logger.setLevel(logging.INFO)
 
 rag_service = RAGService()
+intent_service = IntentService()
+# Conversation memory is optional: while Redis is failing, answer without it
+memory_breaker = get_breaker("redis", BREAKER_REDIS_SLOW_MS)
+# Semantic memory index (embedding + Qdrant): without it, only the recent turns
+memory_index_breaker = get_breaker("memory_index", BREAKER_QDRANT_SLOW_MS)
+
+ANSWER_MAX_TOKENS = 200
+BUDGET_HEADER = "X-Latency-Budget-Ms"
+
+CANNED_REPLIES = {
+    GREETING: "Hello! Ask me anything about your uploaded documents, or ask me to book an interview.",
+    SMALL_TALK: "Happy to help. Ask me about your documents or say \"book an interview\" to schedule one.",
+}
+BOOKING_DETAILS_REPLY = (
+    "I can book your interview. Please send your name, email, date (YYYY-MM-DD) "
+    "and time (HH:MM) in the `booking` field."
+)
+LLM_UNAVAILABLE_REPLY = (
+    "The answer service is temporarily unavailable. "
+    "The passages most relevant to your question are listed in the sources."
+)
 
 
 # -----------------------------
@@ -29,12 +84,21 @@ class ConversateRequest(BaseModel):
     query: str
     top_k: Optional[int] = 4
     include_memory: Optional[bool] = True
-    mode: Optional[str] = "semantic"
+    mode: Optional[Literal["semantic", "hierarchical"]] = None   # None = RETRIEVAL_MODE
+    precision: Optional[Literal["fast", "balanced", "accurate", "exact"]] = None   # None = SEARCH_PRECISION
     booking: Optional[Dict[str, Any]] = None
+    # Retrieval scoping (payload filters); omitted = search every document
+    document_ids: Optional[List[int]] = None
+    filenames: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    tenant_id: Optional[str] = None   # only this tenant's documents are searched; must be the X-API-Key's tenant
+    # Client-side timeout; the pipeline degrades to answer within it (also: X-Latency-Budget-Ms)
+    latency_budget_ms: Optional[float] = None
 
 
 class SourceItem(BaseModel):
     filename: Optional[str] = None
+    document_id: Optional[int] = None
     chunk_id: Optional[int] = None
     score: Optional[float] = None
     chunk: Optional[str] = None
@@ -44,6 +108,9 @@ class ConversateResponse(BaseModel):
     answer: str
     round_trip_id: Optional[str] = None
     sources: List[SourceItem] = []
+    intent: Optional[str] = None
+    route: Optional[str] = None   # "booking", "small_talk" or "rag"
+    degraded: List[str] = []      # what was cut short (latency budget) or skipped (dependency unavailable)
 
 
 # -----------------------------
@@ -82,16 +149,338 @@ def build_prompt(context_chunks: List[str], user_query: str, session_memory: Opt
 # Conversate Endpoint
 # -----------------------------
 @router.post("/conversate", response_model=ConversateResponse)
-def conversate_endpoint(payload: ConversateRequest, db: Session = Depends(get_db)):
+def conversate_endpoint(
+    payload: ConversateRequest,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
     """
     Conversational RAG:
       1) Optional booking save
-      2) RAG retrieval via Qdrant
-      3) Memory from Redis
-      4) LLM generation
-      5) Save conversation back to Redis
+      2) Intent routing (greetings / small talk / booking skip RAG)
+      3) RAG retrieval via Qdrant
+      4) Conversation memory (semantic recall + recent turns)
+      5) LLM generation
+      6) Save conversation back to Redis
+    Qdrant, Redis and the LLM sit behind circuit breakers: while one is
+    failing, search serves recent cached results, memory is skipped, or the
+    sources come back with a service-unavailable answer (see `degraded`).
+    Every call gets a trace; its id is returned as round_trip_id and the
+    timing record can be fetched from /api/debug/traces/{round_trip_id}.
+
+    With a latency budget, retrieval / memory / the LLM call shrink to fit
+    it (reported in `degraded`); the request is abandoned with 504 once the
+    budget is spent, or 499 when the client has disconnected.
     """
+    try:
+        payload.tenant_id = authorize_tenant(payload.tenant_id, request.headers.get(API_KEY_HEADER))
+    except TenantForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except InvalidTenant as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    deadline = Deadline(_latency_budget_ms(payload, request), _disconnect_probe(request))
+    trace = RequestTrace("conversate")
+    trace.set(session_id=payload.session_id, tenant_id=payload.tenant_id, latency_budget_ms=deadline.budget_ms)
+
+    try:
+        with profile_request(request, "conversate") as profile:
+            if profile:
+                response.headers["X-Profile-Id"] = profile.profile_id
+                trace.set(profile_id=profile.profile_id)
+            return _run_conversate(payload, db, trace, deadline)
+    except DeadlineExceeded as e:
+        CONVERSATE_ABANDONED.labels("deadline").inc()
+        trace.status = "error"
+        trace.set(status_code=504)
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        CONVERSATE_ABANDONED.labels("disconnected").inc()
+        trace.status = "cancelled"
+        trace.set(status_code=499)
+        raise HTTPException(status_code=499, detail=str(e))
+    except HTTPException as e:
+        trace.status = "error"
+        trace.set(status_code=e.status_code)
+        raise
+    except Exception:
+        trace.status = "error"
+        raise
+    finally:
+        if deadline.degradations:
+            trace.set(degraded=deadline.degradations)
+            for decision in deadline.degradations:
+                CONVERSATE_DEGRADED.labels(decision.split(":")[0]).inc()
+        trace_store.save(trace)
+
+
+# -----------------------------
+# Latency budget
+# -----------------------------
+def _latency_budget_ms(payload: ConversateRequest, request: Request) -> Optional[float]:
+    """
+    The tighter of the X-Latency-Budget-Ms header and the latency_budget_ms
+    field; CONVERSATE_LATENCY_BUDGET_MS when neither is sent.
+    """
+    budgets = [payload.latency_budget_ms] if payload.latency_budget_ms else []
+    header = request.headers.get(BUDGET_HEADER)
+    if header:
+        try:
+            budgets.append(float(header))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {BUDGET_HEADER} header: {header!r}")
+    if any(b <= 0 for b in budgets):
+        raise HTTPException(status_code=400, detail="Latency budget must be positive")
+    return min(budgets) if budgets else CONVERSATE_LATENCY_BUDGET_MS or None
+
+
+def _disconnect_probe(request: Request):
+    """
+    Sync endpoints run in a worker thread: ask the event loop whether the
+    client has gone away (a non-blocking receive, checked between stages).
+    """
+    def probe() -> bool:
+        try:
+            return anyio.from_thread.run(request.is_disconnected)
+        except Exception:
+            return False
+    return probe
+
+
+def _retrieval_budget(deadline: Deadline, top_k: int, precision: Optional[str]) -> Tuple[int, Optional[str]]:
+    remaining = deadline.remaining_ms()
+    if remaining < BUDGET_LLM_MIN_MS + BUDGET_RESERVE_MS:
+        # The answer could not be generated in time anyway: skip retrieval too
+        raise DeadlineExceeded(f"{remaining:.0f} ms left, not enough for retrieval and the LLM call")
+    if remaining >= BUDGET_DEGRADE_MS:
+        return top_k, precision
+
+    reduced = 1 if remaining < BUDGET_CRITICAL_MS else max(1, top_k // 2)
+    if reduced < top_k:
+        deadline.degrade(f"top_k:{top_k}->{reduced}")
+    if (precision or SEARCH_PRECISION) != "fast":
+        deadline.degrade("precision:fast")
+    return reduced, "fast"
+
+
+def _llm_budget(deadline: Deadline, max_tokens: int = ANSWER_MAX_TOKENS) -> Tuple[int, Optional[float]]:
+    """
+    (max_tokens, absolute deadline) for the LLM call: the completion is
+    sized to what the expected token rate can produce in the time left.
+    """
+    if not deadline.bounded:
+        return max_tokens, None
+    available_ms = deadline.remaining_ms() - BUDGET_RESERVE_MS
+    if available_ms < BUDGET_LLM_MIN_MS:
+        raise DeadlineExceeded(
+            f"{max(0.0, available_ms):.0f} ms left for the LLM call (minimum {BUDGET_LLM_MIN_MS:.0f})"
+        )
+
+    affordable = int((available_ms - LLM_EXPECTED_TTFT_MS) / 1000 * LLM_EXPECTED_TOKENS_PER_SEC)
+    tokens = max(LLM_MIN_COMPLETION_TOKENS, min(max_tokens, affordable))
+    if tokens < max_tokens:
+        deadline.degrade(f"max_tokens:{max_tokens}->{tokens}")
+    return tokens, time.monotonic() + available_ms / 1000
+
+
+def _save_turn(session_id: Optional[str], query: str, answer: str, trace: RequestTrace, index: bool = True):
+    if not session_id:
+        return
+    try:
+        with trace.stage("memory_save"):
+            # One RPUSH for the exchange; its resulting length numbers the turn
+            length = memory_breaker.call(save_messages, session_id, [("user", query), ("assistant", answer)])
+    except CircuitOpenError:
+        trace.set(memory_saved=False)
+        return
+    except Exception:
+        logger.exception("Redis save failed")
+        trace.set(memory_saved=False)
+        return
+
+    if MEMORY_MODE != "semantic" or not index:
+        return
+    try:
+        with trace.stage("memory_index"):
+            memory_index_breaker.call(
+                semantic_memory.index_turn, session_id, semantic_memory.turn_of(length), query, answer
+            )
+    except CircuitOpenError:
+        pass
+    except Exception:
+        logger.exception("Semantic memory indexing failed")
+
+
+def _load_memory(payload: ConversateRequest, query_vector, trace: RequestTrace, deadline: Deadline) -> Optional[str]:
+    """
+    Semantic mode: top-k similar past turns + the last few turns.
+    Full mode: the whole Redis history.
+    Under budget pressure only the last few turns are loaded, or none at all;
+    while the Redis breaker is open (or the load fails) none, while the
+    memory index's is, only the last few turns.
+    """
+    if not (payload.session_id and payload.include_memory):
+        return None
+
+    remaining = deadline.remaining_ms()
+    if remaining < BUDGET_CRITICAL_MS:
+        deadline.degrade("memory:skipped")
+        return None
+    recent_only = remaining < BUDGET_DEGRADE_MS
+    if recent_only:
+        deadline.degrade("memory:recent_only")
+
+    def search(latest: int) -> list:
+        if recent_only or MEMORY_TOP_K <= 0:
+            return []
+        try:
+            return memory_index_breaker.call(
+                semantic_memory.search, payload.session_id, query_vector, MEMORY_TOP_K, latest - MEMORY_RECENT_TURNS + 1
+            )
+        except CircuitOpenError:
+            deadline.degrade("memory:recent_only")
+        except Exception:
+            logger.exception("Semantic memory search failed")
+            deadline.degrade("memory:recent_only")
+        return []
+
+    def load() -> Optional[str]:
+        if MEMORY_MODE == "semantic":
+            latest, recent = memory_breaker.call(semantic_memory.recent, payload.session_id)
+            recalled = semantic_memory.compose(search(latest), recent)
+            trace.set(memory_relevant=recalled["relevant"], memory_recent=recalled["recent"])
+            return recalled["text"]
+        mem = get_chat_history(payload.session_id)
+        if recent_only:
+            mem = mem[-2 * MEMORY_RECENT_TURNS:]
+        trace.set(memory_messages=len(mem))
+        return "\n".join(mem) if mem else None
+
+    try:
+        with trace.stage("memory_load"):
+            # semantic mode guards its Redis and index calls separately
+            memory_text = load() if MEMORY_MODE == "semantic" else memory_breaker.call(load)
+    except CircuitOpenError:
+        deadline.degrade("memory:unavailable")
+        return None
+    except Exception:
+        logger.exception("Memory load failed")
+        deadline.degrade("memory:unavailable")
+        return None
+
+    if memory_text:
+        trace.set(memory_chars=len(memory_text))
+    return memory_text
+
+
+def _routed_response(
+    answer: str, intent: str, route: str, trace: RequestTrace, deadline: Optional[Deadline] = None
+) -> ConversateResponse:
+    INTENT_ROUTES.labels(intent, route).inc()
+    trace.set(intent=intent, route=route)
+    return ConversateResponse(
+        answer=answer,
+        round_trip_id=trace.trace_id,
+        sources=[],
+        intent=intent,
+        route=route,
+        degraded=list(deadline.degradations) if deadline else [],
+    )
+
+
+def _small_talk_reply(
+    payload: ConversateRequest, intent: str, trace: RequestTrace, deadline: Deadline
+) -> ConversateResponse:
+    """
+    Greetings / small talk: canned reply, or a small model when SMALL_TALK_MODEL is set.
+    No embedding, retrieval or history load.
+    """
+    answer = CANNED_REPLIES[intent]
+
+    if SMALL_TALK_MODEL and deadline.remaining_ms() < BUDGET_CRITICAL_MS:
+        deadline.degrade("small_talk:canned")
+    elif SMALL_TALK_MODEL:
+        try:
+            with trace.stage("llm"):
+                max_tokens, llm_deadline = _llm_budget(deadline, 60)
+                llm_resp = complete(
+                    f"Reply briefly and friendly to the user's message: {payload.query}",
+                    model=SMALL_TALK_MODEL,
+                    max_tokens=max_tokens,
+                    session_id=payload.session_id,
+                    deadline=llm_deadline,
+                )
+            answer = llm_resp["text"]
+            usage = llm_resp.get("usage") or {}
+            PROMPT_TOKENS.inc(usage.get("prompt_tokens") or 0)
+            COMPLETION_TOKENS.inc(usage.get("completion_tokens") or 0)
+        except CircuitOpenError:
+            deadline.degrade("llm:unavailable")
+        except Exception:
+            logger.exception("Small-talk model failed, using canned reply")
+
+    _save_turn(payload.session_id, payload.query, answer, trace, index=False)
+    return _routed_response(answer, intent, "small_talk", trace, deadline)
+
+
+def _booking_flow_reply(
+    payload: ConversateRequest, db: Session, trace: RequestTrace, deadline: Optional[Deadline] = None
+) -> ConversateResponse:
+    """
+    Booking intent without booking details: ask for them (and list existing bookings).
+    """
+    answer = BOOKING_DETAILS_REPLY
+
+    if payload.session_id:
+        try:
+            existing = booking_cache.get_session_bookings(db, payload.session_id)
+        except Exception:
+            logger.exception("Booking lookup failed")
+            existing = []
+        if existing:
+            listed = "; ".join(f"{b['date']} at {b['time']}" for b in existing)
+            answer += f" You already have {len(existing)} booking(s): {listed}."
+
+    _save_turn(payload.session_id, payload.query, answer, trace)
+    return _routed_response(answer, INTERVIEW_BOOKING, "booking", trace, deadline)
+
+
+def normalize_hits(search_result, deadline: Deadline) -> Tuple[List[str], List[SourceItem]]:
+    """
+    Prompt chunks and response sources from RAGService.search output.
+    """
+    context_chunks: List[str] = []
+    sources: List[SourceItem] = []
+
+    if isinstance(search_result, list):
+        if any(hit.get("cached") for hit in search_result):
+            deadline.degrade("retrieval:cached")
+        for hit in search_result:
+            chunk_text = hit.get("chunk") or hit.get("text") or ""
+            if chunk_text:
+                context_chunks.append(chunk_text)
 
+            sources.append(
+                SourceItem(
+                    filename=hit.get("filename"),
+                    document_id=hit.get("document_id"),
+                    chunk_id=hit.get("chunk_id"),
+                    score=hit.get("score"),
+                    chunk=(chunk_text[:250] + "...") if len(chunk_text) > 250 else chunk_text
+                )
+            )
+    else:
+        # fallback (rare)
+        chunk = str(search_result)
+        context_chunks = [chunk]
+        sources = [SourceItem(chunk=chunk)]
+    return context_chunks, sources
+
+
+def _run_conversate(
+    payload: ConversateRequest, db: Session, trace: RequestTrace, deadline: Deadline
+) -> ConversateResponse:
     # -----------------------------
     # 1. Handle booking request
     # -----------------------------
@@ -108,11 +497,13 @@ def conversate_endpoint(payload: ConversateRequest, db: Session = Depends(get_db
             db.add(booking)
             db.commit()
             db.refresh(booking)
+            booking_cache.invalidate(booking.id, [booking.session_id])
 
-            return ConversateResponse(
-                answer=f"Booking confirmed for {booking.name} on {booking.date} at {booking.time}",
-                round_trip_id=None,
-                sources=[]
+            return _routed_response(
+                f"Booking confirmed for {booking.name} on {booking.date} at {booking.time}",
+                INTERVIEW_BOOKING,
+                "booking",
+                trace,
             )
         except Exception as e:
             logger.exception("Booking save failed")
@@ -122,94 +513,147 @@ def conversate_endpoint(payload: ConversateRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
     top_k = payload.top_k if payload.top_k and payload.top_k > 0 else 4
+    trace.set(top_k=top_k)
 
     # -----------------------------
-    # 2. Generate query embedding
+    # 2. Intent routing: cheap paths skip retrieval and the 70B model
     # -----------------------------
+    query_vector = None
+    deadline.check("intent")
     try:
-        _ = generate_embeddings([payload.query])[0]  # for validation, RAGService also embeds internally
+        with trace.stage("intent"):
+            intent, intent_method = intent_service.classify(payload.query)
+
+        if intent_method == "default" and INTENT_EMBEDDINGS:
+            with trace.stage("embed"):
+                query_vector = generate_embeddings([payload.query])[0]
+            with trace.stage("intent"):
+                intent, intent_method = intent_service.classify(payload.query, embedding=query_vector)
+    except Exception as e:
+        logger.exception("Intent detection failed")
+        raise HTTPException(status_code=500, detail=f"Intent detection failed: {e}")
+
+    trace.set(intent_method=intent_method)
+
+    if intent in (GREETING, SMALL_TALK):
+        return _small_talk_reply(payload, intent, trace, deadline)
+
+    if intent == INTERVIEW_BOOKING:
+        return _booking_flow_reply(payload, db, trace, deadline)
+
+    # -----------------------------
+    # 3. Generate query embedding
+    # -----------------------------
+    deadline.check("embed")
+    try:
+        if query_vector is None:
+            with trace.stage("embed"):
+                query_vector = generate_embeddings([payload.query])[0]
     except Exception as e:
         logger.exception("Embedding generation failed")
         raise HTTPException(status_code=500, detail=f"Embedding generation failed: {e}")
 
     # -----------------------------
-    # 3. RAG: Search Qdrant
+    # 4. RAG: Search Qdrant (fewer, cheaper hits when the budget is tight)
     # -----------------------------
+    deadline.check("search")
+    top_k, precision = _retrieval_budget(deadline, top_k, payload.precision)
     try:
-        search_result = rag_service.search(payload.query, limit=top_k)
+        with trace.stage("search"):
+            search_result = rag_service.search(
+                payload.query,
+                limit=top_k,
+                document_ids=payload.document_ids,
+                filenames=payload.filenames,
+                tags=payload.tags,
+                query_vector=query_vector,
+                mode=payload.mode,
+                tenant_id=payload.tenant_id,
+                precision=precision,
+            )
+    except SearchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.exception("RAG retrieval failed")
         raise HTTPException(status_code=500, detail=f"RAG retrieval failed: {e}")
 
-    context_chunks: List[str] = []
-    sources: List[SourceItem] = []
-
-    # Normalize output
-    if isinstance(search_result, list):
-        for hit in search_result:
-            chunk_text = hit.get("chunk") or hit.get("text") or ""
-            if chunk_text:
-                context_chunks.append(chunk_text)
-
-            sources.append(
-                SourceItem(
-                    filename=hit.get("filename"),
-                    chunk_id=hit.get("chunk_id"),
-                    score=hit.get("score"),
-                    chunk=(chunk_text[:250] + "...") if len(chunk_text) > 250 else chunk_text
-                )
-            )
-    else:
-        # fallback (rare)
-        chunk = str(search_result)
-        context_chunks = [chunk]
-        sources = [SourceItem(chunk=chunk)]
+    context_chunks, sources = normalize_hits(search_result, deadline)
+    CHUNKS_RETRIEVED.inc(len(context_chunks))
+    trace.set(hits=len(sources))
 
     # -----------------------------
-    # 4. Load Redis conversation memory
+    # 5. Load conversation memory
     # -----------------------------
-    session_memory_text = None
-
-    if payload.session_id and payload.include_memory:
-        try:
-            mem = get_chat_history(payload.session_id)
-            if mem:
-                session_memory_text = "\n".join(mem)
-        except Exception:
-            logger.exception("Redis memory load failed")
+    deadline.check("memory")
+    session_memory_text = _load_memory(payload, query_vector, trace, deadline)
 
     # -----------------------------
-    # 5. Build final prompt
+    # 6. Build final prompt
     # -----------------------------
-    prompt = build_prompt(context_chunks, payload.query, session_memory_text)
+    with trace.stage("prompt_build"):
+        prompt = build_prompt(context_chunks, payload.query, session_memory_text)
 
     # -----------------------------
-    # 6. Call LLM
+    # 7. Call LLM (timeout and max_tokens sized to the remaining budget)
     # -----------------------------
+    deadline.check("llm")
+    max_tokens, llm_deadline = _llm_budget(deadline)
     try:
-        llm_resp = generate_response(prompt)
+        with trace.stage("llm"):
+            llm_resp = complete(prompt, max_tokens=max_tokens, session_id=payload.session_id, deadline=llm_deadline)
         llm_text = llm_resp["text"] if isinstance(llm_resp, dict) else str(llm_resp)
+    except LLMOverloadedError as e:
+        logger.warning("LLM gateway overloaded")
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError:
+        # Fail fast: the retrieved passages are still useful on their own
+        deadline.degrade("llm:unavailable")
+        INTENT_ROUTES.labels(intent, "rag").inc()
+        trace.set(intent=intent, route="rag")
+        return ConversateResponse(
+            answer=LLM_UNAVAILABLE_REPLY,
+            round_trip_id=trace.trace_id,
+            sources=sources,
+            intent=intent,
+            route="rag",
+            degraded=list(deadline.degradations),
+        )
     except Exception as e:
+        if llm_deadline is not None and time.monotonic() >= llm_deadline:
+            raise DeadlineExceeded(f"LLM call did not finish within the latency budget: {e}")
         logger.exception("LLM generation failed")
         raise HTTPException(status_code=500, detail=f"LLM call failed: {e}")
 
+    usage = (llm_resp.get("usage") or {}) if isinstance(llm_resp, dict) else {}
+    coalesced = bool(isinstance(llm_resp, dict) and llm_resp.get("coalesced"))
+    if not coalesced:
+        # a coalesced answer was paid for by the identical in-flight request
+        PROMPT_TOKENS.inc(usage.get("prompt_tokens") or 0)
+        COMPLETION_TOKENS.inc(usage.get("completion_tokens") or 0)
+    trace.set(
+        prompt_chars=len(prompt),
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        llm_coalesced=coalesced,
+    )
+
     # -----------------------------
-    # 7. Save chat to Redis
+    # 8. Save chat to Redis
     # -----------------------------
-    if payload.session_id:
-        try:
-            save_message(payload.session_id, "user", payload.query)
-            save_message(payload.session_id, "assistant", llm_text)
-        except Exception:
-            logger.exception("Redis save failed")
+    _save_turn(payload.session_id, payload.query, llm_text, trace)
 
     # -----------------------------
-    # 8. Return final response
+    # 9. Return final response
     # -----------------------------
+    INTENT_ROUTES.labels(intent, "rag").inc()
+    trace.set(intent=intent, route="rag")
     return ConversateResponse(
         answer=llm_text,
-        round_trip_id=None,
-        sources=sources
+        round_trip_id=trace.trace_id,
+        sources=sources,
+        intent=intent,
+        route="rag",
+        degraded=list(deadline.degradations),
     )
 
 
@@ -0,0 +1,341 @@
+# app/api/conversate_ws.py
+import json
+import logging
+import uuid
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.api.conversate import (
+    ANSWER_MAX_TOKENS,
+    BOOKING_DETAILS_REPLY,
+    CANNED_REPLIES,
+    LLM_UNAVAILABLE_REPLY,
+    ConversateRequest,
+    build_prompt,
+    intent_service,
+    normalize_hits,
+    rag_service,
+)
+from app.services.chat_session import ChatSession
+from app.services.embedding import generate_embeddings
+from app.services.intent_service import GREETING, INTERVIEW_BOOKING, SMALL_TALK
+from app.services.llm_service import DEFAULT_MODEL, LLMOverloadedError, stream
+from app.services.rag_service import SearchUnavailable
+from app.services.tenants import InvalidTenant, authorize_tenant
+from app.services.trace_service import RequestTrace, trace_store
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.config import (
+    INTENT_EMBEDDINGS,
+    RATE_LIMIT_CHAT_COST,
+    RATE_LIMIT_ENABLED,
+    SMALL_TALK_MODEL,
+    WS_MAX_CONNECTIONS,
+)
+from app.utils.deadline import Deadline
+from app.utils.metrics import (
+    ADMISSION_REJECTED,
+    CHUNKS_RETRIEVED,
+    COMPLETION_TOKENS,
+    CONVERSATE_DEGRADED,
+    INTENT_ROUTES,
+    PROMPT_TOKENS,
+    WS_CONNECTIONS,
+    WS_RETRIEVALS,
+    WS_SENT_BYTES,
+)
+from app.utils.rate_limit import API_KEY_HEADER, route_group, rate_limiter
+
+router = APIRouter()
+logger = logging.getLogger("conversate_ws")
+
+CHAT_GROUP = route_group("POST", "/api/conversate")
+_connections = 0   # open sockets in this worker (event loop only)
+
+
+class TurnPlan(NamedTuple):
+    intent: str
+    route: str
+    answer: Optional[str] = None        # fixed reply, nothing to generate
+    prompt: Optional[str] = None
+    model: Optional[str] = None
+    max_tokens: int = ANSWER_MAX_TOKENS
+    sources: Optional[List[Dict]] = None
+    sources_reused: bool = False
+
+
+# -----------------------------
+# WebSocket Conversate Endpoint
+# -----------------------------
+@router.websocket("/conversate/ws")
+async def conversate_ws(websocket: WebSocket, session_id: Optional[str] = None, tenant_id: Optional[str] = None):
+    """
+    Multi-turn conversation over one socket (?session_id=...&tenant_id=...);
+    the tenant is the one of the X-API-Key header.
+
+    The session's memory is loaded from Redis once and kept in process,
+    turns are written back behind the conversation, and retrieval results
+    of the connection are reused for repeated questions.
+
+    Client frames: {"query": ..., "top_k"?, "mode"?, "precision"?,
+    "document_ids"?, "filenames"?, "tags"?, "include_memory"?}
+    Server frames:
+      {"type": "session", "session_id"}                      once, on connect
+      {"type": "start", "round_trip_id", "intent", "route"}
+      {"type": "sources", "sources"} or {"type": "sources", "reused": true} (same as the last turn)
+      {"type": "token", "text"} ...                          the answer, streamed
+      {"type": "end", "degraded", "usage"}
+      {"type": "error", "status", "detail", "retry_after"?}
+    """
+    global _connections
+    try:
+        tenant_id = authorize_tenant(tenant_id, websocket.headers.get(API_KEY_HEADER))
+    except InvalidTenant as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    if WS_MAX_CONNECTIONS and _connections >= WS_MAX_CONNECTIONS:
+        ADMISSION_REJECTED.labels("chat", "connections").inc()
+        await websocket.close(code=1013, reason="Too many open conversations, try again shortly")
+        return
+
+    await websocket.accept()
+    _connections += 1
+    WS_CONNECTIONS.inc()
+    session = ChatSession(session_id or uuid.uuid4().hex, tenant_id)
+    session.start()
+    try:
+        await anyio.to_thread.run_sync(session.load)
+        await _send(websocket, {"type": "session", "session_id": session.session_id})
+        while True:
+            await _handle_turn(websocket, session, await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _connections -= 1
+        WS_CONNECTIONS.dec()
+        await session.close()
+
+
+async def _send(websocket: WebSocket, frame: Dict):
+    text = json.dumps(frame, separators=(",", ":"))
+    WS_SENT_BYTES.inc(len(text.encode("utf-8")))
+    await websocket.send_text(text)
+
+
+async def _send_error(websocket: WebSocket, status: int, detail: str, retry_after: Optional[float] = None):
+    frame = {"type": "error", "status": status, "detail": detail}
+    if retry_after is not None:
+        frame["retry_after"] = round(retry_after, 1)
+    await _send(websocket, frame)
+
+
+async def _handle_turn(websocket: WebSocket, session: ChatSession, raw: str):
+    try:
+        message = json.loads(raw)
+        if not isinstance(message, dict):
+            raise ValueError("Expected a JSON object")
+        payload = ConversateRequest.model_validate(
+            {**message, "session_id": session.session_id, "tenant_id": session.tenant_id}
+        )
+    except (ValueError, ValidationError) as e:
+        await _send_error(websocket, 422, str(e))
+        return
+    if not payload.query.strip():
+        await _send_error(websocket, 400, "Query cannot be empty.")
+        return
+    if payload.booking:
+        await _send_error(websocket, 400, "Send bookings to POST /api/conversate.")
+        return
+
+    # Every message costs like one /conversate call
+    if RATE_LIMIT_ENABLED:
+        limited = await anyio.to_thread.run_sync(partial(
+            rate_limiter.hit,
+            CHAT_GROUP,
+            RATE_LIMIT_CHAT_COST,
+            api_key=websocket.headers.get(API_KEY_HEADER),
+            session_id=session.session_id,
+            client=websocket.client.host if websocket.client else None,
+        ))
+        if not limited.allowed:
+            ADMISSION_REJECTED.labels("chat", "rate").inc()
+            await _send_error(websocket, 429, "Rate limit exceeded for chat requests", limited.retry_after)
+            return
+
+    trace = RequestTrace("conversate_ws")
+    trace.set(session_id=session.session_id, tenant_id=session.tenant_id)
+    deadline = Deadline()   # unbounded; collects what was degraded
+    try:
+        plan = await anyio.to_thread.run_sync(_plan_turn, payload, session, trace, deadline)
+
+        INTENT_ROUTES.labels(plan.intent, plan.route).inc()
+        trace.set(intent=plan.intent, route=plan.route)
+        await _send(websocket, {
+            "type": "start", "round_trip_id": trace.trace_id, "intent": plan.intent, "route": plan.route,
+        })
+        if plan.sources_reused:
+            await _send(websocket, {"type": "sources", "reused": True})
+        elif plan.sources is not None:
+            await _send(websocket, {"type": "sources", "sources": plan.sources})
+
+        answer, usage, generated = await _stream_answer(websocket, plan, payload.session_id, trace, deadline)
+        if generated or plan.route != "rag":
+            # a service-unavailable reply is not part of the conversation
+            session.add_turn(payload.query, answer, index=plan.route != "small_talk")
+        await _send(websocket, {"type": "end", "degraded": list(deadline.degradations), "usage": usage})
+    except SearchUnavailable as e:
+        trace.status = "error"
+        await _send_error(websocket, 503, str(e))
+    except LLMOverloadedError as e:
+        trace.status = "error"
+        await _send_error(websocket, 503, str(e))
+    except WebSocketDisconnect:
+        trace.status = "cancelled"
+        raise
+    except Exception as e:
+        trace.status = "error"
+        logger.exception("WebSocket turn failed")
+        await _send_error(websocket, 500, f"Conversation turn failed: {e}")
+    finally:
+        if deadline.degradations:
+            trace.set(degraded=deadline.degradations)
+            for decision in deadline.degradations:
+                CONVERSATE_DEGRADED.labels(decision.split(":")[0]).inc()
+        trace_store.save(trace)
+
+
+def _plan_turn(payload: ConversateRequest, session: ChatSession, trace: RequestTrace, deadline: Deadline) -> TurnPlan:
+    """
+    Everything before generation (runs in a worker thread): intent, then
+    for RAG the retrieval (or the connection's earlier one) and the prompt
+    with in-process memory.
+    """
+    query_vector = None
+    with trace.stage("intent"):
+        intent, intent_method = intent_service.classify(payload.query)
+    if intent_method == "default" and INTENT_EMBEDDINGS:
+        with trace.stage("embed"):
+            query_vector = generate_embeddings([payload.query])[0]
+        with trace.stage("intent"):
+            intent, intent_method = intent_service.classify(payload.query, embedding=query_vector)
+    trace.set(intent_method=intent_method)
+
+    if intent in (GREETING, SMALL_TALK):
+        if not SMALL_TALK_MODEL:
+            return TurnPlan(intent, "small_talk", answer=CANNED_REPLIES[intent])
+        return TurnPlan(
+            intent, "small_talk",
+            answer=CANNED_REPLIES[intent],   # used if the model fails
+            prompt=f"Reply briefly and friendly to the user's message: {payload.query}",
+            model=SMALL_TALK_MODEL,
+            max_tokens=60,
+        )
+    if intent == INTERVIEW_BOOKING:
+        return TurnPlan(intent, "booking", answer=BOOKING_DETAILS_REPLY)
+
+    if query_vector is None:
+        with trace.stage("embed"):
+            query_vector = generate_embeddings([payload.query])[0]
+
+    top_k = payload.top_k if payload.top_k and payload.top_k > 0 else 4
+    scope = session.retrieval_scope(
+        top_k, payload.mode, payload.precision, payload.document_ids, payload.filenames, payload.tags
+    )
+    hits = session.cached_retrieval(payload.query, query_vector, scope)
+    reused = hits is not None
+    WS_RETRIEVALS.labels("reused" if reused else "search").inc()
+    if not reused:
+        with trace.stage("search"):
+            hits = rag_service.search(
+                payload.query,
+                limit=top_k,
+                document_ids=payload.document_ids,
+                filenames=payload.filenames,
+                tags=payload.tags,
+                query_vector=query_vector,
+                mode=payload.mode,
+                tenant_id=payload.tenant_id,
+                precision=payload.precision,
+            )
+        session.remember_retrieval(payload.query, query_vector, scope, hits)
+    # the client already has these sources when they are the previous turn's
+    resend = hits is not session.last_hits
+    session.last_hits = hits
+    context_chunks, sources = normalize_hits(hits, deadline)
+    CHUNKS_RETRIEVED.inc(len(context_chunks))
+    trace.set(top_k=top_k, hits=len(sources), retrieval_reused=reused)
+
+    memory_text = None
+    if payload.include_memory:
+        with trace.stage("memory_load"):
+            memory = session.memory_text(query_vector)
+        if not memory["complete"]:
+            deadline.degrade("memory:unavailable")
+        memory_text = memory["text"]
+        trace.set(memory_relevant=memory["relevant"], memory_recent=memory["recent"])
+
+    with trace.stage("prompt_build"):
+        prompt = build_prompt(context_chunks, payload.query, memory_text)
+    trace.set(prompt_chars=len(prompt))
+    return TurnPlan(
+        intent, "rag",
+        answer=LLM_UNAVAILABLE_REPLY,   # used if the LLM breaker is open
+        prompt=prompt,
+        sources=[source.model_dump() for source in sources],
+        sources_reused=not resend,
+    )
+
+
+async def _stream_answer(
+    websocket: WebSocket, plan: TurnPlan, session_id: Optional[str], trace: RequestTrace, deadline: Deadline
+) -> Tuple[str, Dict, bool]:
+    """
+    Streams the generated answer as token frames, or sends the plan's fixed
+    reply as one. Returns (answer, usage, generated).
+    """
+    if plan.prompt is None:
+        await _send(websocket, {"type": "token", "text": plan.answer})
+        return plan.answer, {}, False
+
+    parts: List[str] = []
+
+    def generate() -> Dict:
+        tokens = stream(
+            plan.prompt, model=plan.model or DEFAULT_MODEL, max_tokens=plan.max_tokens, session_id=session_id
+        )
+        try:
+            while True:
+                try:
+                    delta = next(tokens)
+                except StopIteration as done:
+                    return done.value or {}
+                parts.append(delta)
+                anyio.from_thread.run(_send, websocket, {"type": "token", "text": delta})
+        finally:
+            tokens.close()
+
+    try:
+        with trace.stage("llm"):
+            usage = await anyio.to_thread.run_sync(generate)
+    except CircuitOpenError:
+        deadline.degrade("llm:unavailable")
+        usage = None
+    except (LLMOverloadedError, WebSocketDisconnect):
+        raise
+    except Exception:
+        if plan.route == "rag" or parts:
+            raise
+        logger.exception("Small-talk model failed, using canned reply")
+        usage = None
+
+    if usage is None:
+        await _send(websocket, {"type": "token", "text": plan.answer})
+        return plan.answer, {}, False
+
+    PROMPT_TOKENS.inc(usage.get("prompt_tokens") or 0)
+    COMPLETION_TOKENS.inc(usage.get("completion_tokens") or 0)
+    trace.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+    return "".join(parts), usage, True
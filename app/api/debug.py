@@ -0,0 +1,83 @@
+# app/api/debug.py
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.services.embedding import embedding_cache
+from app.services.trace_service import trace_store
+from app.utils.auth import token_matches
+from app.utils.config import DEBUG_API_TOKEN
+from app.utils.profiling import list_profiles, memory_snapshot_diff, profile_path, stop_memory_tracing
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """
+    Debug endpoints do not exist (404) until DEBUG_API_TOKEN is configured;
+    then every request must send it as X-Debug-Token.
+    """
+    if not DEBUG_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(DEBUG_API_TOKEN, x_debug_token):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+
+@router.get("/traces")
+def list_traces(limit: int = Query(50, ge=1, le=1000)):
+    """
+    Most recent request traces, newest first.
+    """
+    return {"traces": trace_store.recent(limit)}
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str):
+    record = trace_store.get(trace_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return record
+
+
+@router.get("/profiles")
+def get_profiles():
+    """
+    Request profiles captured with X-Profile: 1 (collapsed-stack files).
+    """
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str):
+    path = profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
+
+
+@router.post("/memory/snapshot")
+def memory_snapshot(
+    top: int = Query(25, ge=1, le=500),
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+):
+    """
+    tracemalloc diff against the previous snapshot (the first call sets the baseline).
+    """
+    return memory_snapshot_diff(top=top, key_type=key_type)
+
+
+@router.delete("/memory/snapshot")
+def memory_snapshot_stop():
+    """
+    Stop tracemalloc (it slows allocations down while active).
+    """
+    return stop_memory_tracing()
+
+
+@router.get("/embedding-cache")
+def embedding_cache_stats():
+    """
+    Query embedding cache counters for this worker (Prometheus has the totals).
+    """
+    return embedding_cache.stats()
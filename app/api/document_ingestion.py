@@ -1,28 +1,60 @@
 # app/api/document_ingestion.py
-from typing import Literal, List
+from typing import Literal, Optional
 import os
-import json
-import uuid
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+import shutil
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app.services.text_extraction import extract_text_from_pdf, extract_text_from_txt
-from app.services.chunking import fixed_length_chunking, paragraph_chunking
-from app.services.embedding import generate_embeddings
-from app.services.vector_db import upsert_vectors  # expects function to upsert list of PointStruct
+from app.services.ingestion import UPLOAD_DIR, IngestionError, ingest_document, delete_document, parse_tags
+from app.services.tenants import InvalidTenant, TenantForbidden, authorize_tenant
 from app.db.database import get_db
 from app.db.models import Document
-from qdrant_client.http import models as qdrant_models
+from app.utils.profiling import profile_request
+from app.utils.rate_limit import API_KEY_HEADER
 
 router = APIRouter()
-UPLOAD_DIR = "uploaded_docs"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+def _save_upload(file: UploadFile) -> str:
+    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    with open(file_path, "wb") as fh:
+        shutil.copyfileobj(file.file, fh)
+    return file_path
+
+
+def _authorized_tenant(request: Request, tenant_id: Optional[str]) -> Optional[str]:
+    """
+    The caller's tenant (from its X-API-Key); a tenant_id that is not the key's own is refused.
+    """
+    try:
+        return authorize_tenant(tenant_id, request.headers.get(API_KEY_HEADER))
+    except TenantForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except InvalidTenant as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _get_document_or_404(db: Session, document_id: int, tenant_id: Optional[str] = None) -> Document:
+    """
+    Documents are only visible to their own tenant (no tenant_id = the default corpus).
+    """
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if not doc or doc.tenant_id != tenant_id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
+
+
+# Ingestion is blocking (extraction, embedding, Qdrant, SQLite): plain `def`
+# endpoints run in the threadpool instead of stalling the event loop
 @router.post("/upload")
-async def upload_document(
+def upload_document(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
-    chunk_strategy: Literal["fixed", "paragraph"] = Form("fixed"),
+    chunk_strategy: Literal["fixed", "paragraph", "token", "small_to_big"] = Form("fixed"),
+    tags: Optional[str] = Form(None),
+    tenant_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
 ):
     """
@@ -30,105 +62,77 @@ async def upload_document(
       - Save file
       - Extract text (.pdf or .txt)
       - Chunk (fixed word-size or paragraph)
+      - Optional comma-separated tags stored on every chunk (filterable)
+      - Optional tenant_id: routed to the tenant's collection / partition
       - Create embeddings for chunks
       - Upsert vectors to Qdrant
       - Persist metadata in SQLite (Document model)
     """
-    # 1) Save uploaded file locally
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as fh:
-        fh.write(await file.read())
-
-    # 2) Extract text
-    filename_lower = file.filename.lower()
-    if filename_lower.endswith(".pdf"):
-        text = extract_text_from_pdf(file_path)
-        filetype = "pdf"
-    elif filename_lower.endswith(".txt"):
-        text = extract_text_from_txt(file_path)
-        filetype = "txt"
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type. Only .pdf and .txt allowed.")
-
-    if not text or not text.strip():
-        raise HTTPException(status_code=400, detail="No readable text found in document.")
-
-    # 3) Chunk text
-    if chunk_strategy == "fixed":
-        chunks: List[str] = fixed_length_chunking(text)
-    else:
-        chunks = paragraph_chunking(text)
-
-    if not chunks:
-        raise HTTPException(status_code=400, detail="Chunking produced 0 chunks. Document may be empty.")
-
-    # 4) Generate embeddings
-    try:
-        embeddings = generate_embeddings(chunks)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Embedding generation failed: {e}")
-
-    if len(embeddings) != len(chunks):
-        raise HTTPException(status_code=500, detail="Embedding count mismatch with chunks.")
-
-    # 5) Create DB document entry first so we have an id
-    doc = Document(
-        filename=file.filename,
-        filetype=filetype,
-        chunk_strategy=chunk_strategy,
-        number_of_chunks=len(chunks),
-        vector_ids="[]",
-    )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
-
-    # 6) Prepare PointStructs for Qdrant and generate stable vector ids
-    points: List[qdrant_models.PointStruct] = []
-    vector_ids: List[str] = []
-    collection_name = "documents"
-
-    for idx, (chunk_text, vector) in enumerate(zip(chunks, embeddings)):
-        # stable unique id: <docid>_<chunk_idx>_<uuid8>
-        # vector_id = f"{doc.id}_{idx}_{uuid.uuid4().hex[:8]}"
-        vector_id = str(uuid.uuid4())
-
-        vector_ids.append(vector_id)
-
-        payload = {
-            "chunk": chunk_text,
-            "filename": file.filename,
-            "chunk_id": idx,
-            "document_id": doc.id,
-        }
-
-        points.append(
-            qdrant_models.PointStruct(
-                id=vector_id,
-                vector=vector,
-                payload=payload,
+    tenant_id = _authorized_tenant(request, tenant_id)
+    with profile_request(request, "upload") as profile:
+        if profile:
+            response.headers["X-Profile-Id"] = profile.profile_id
+
+        file_path = _save_upload(file)
+
+        try:
+            result = ingest_document(
+                db, file_path, file.filename, chunk_strategy, tags=parse_tags(tags), tenant_id=tenant_id
             )
+        except IngestionError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {"message": "Document uploaded and processed successfully.", **result}
+
+
+@router.put("/{document_id}")
+def replace_document(
+    document_id: int,
+    request: Request,
+    file: UploadFile = File(...),
+    chunk_strategy: Literal["fixed", "paragraph", "token", "small_to_big"] = Form("fixed"),
+    tags: Optional[str] = Form(None),
+    tenant_id: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Replace a document's content, keeping its document_id.
+    New vectors are written before the old ones are filter-deleted.
+    """
+    doc = _get_document_or_404(db, document_id, _authorized_tenant(request, tenant_id))
+    file_path = _save_upload(file)
+
+    try:
+        result = ingest_document(
+            db, file_path, file.filename, chunk_strategy, document=doc, tags=parse_tags(tags)
         )
+    except IngestionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {"message": "Document replaced successfully.", **result}
+
+
+@router.delete("/{document_id}")
+def remove_document(
+    document_id: int, request: Request, tenant_id: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """
+    Delete a document: one Qdrant filter-delete on document_id + the SQLite row.
+    """
+    doc = _get_document_or_404(db, document_id, _authorized_tenant(request, tenant_id))
 
-    # 7) Upsert to Qdrant
     try:
-        upsert_vectors(collection_name=collection_name, points=points)
+        return delete_document(db, doc)
     except Exception as e:
-        # If upsert fails, keep DB entry but inform user
-        raise HTTPException(status_code=500, detail=f"Qdrant upsert failed: {e}")
-
-    # 8) Update DB with vector ids JSON and return response
-    doc.vector_ids = json.dumps(vector_ids)
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
-
-    return {
-        "message": "Document uploaded and processed successfully.",
-        "document_id": doc.id,
-        "filename": doc.filename,
-        "filetype": doc.filetype,
-        "chunk_strategy": doc.chunk_strategy,
-        "total_chunks": doc.number_of_chunks,
-        "vector_ids": vector_ids,
-    }
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Document deletion failed: {e}")
+
+
+@router.get("/dedup/stats")
+def dedup_stats(db: Session = Depends(get_db)):
+    """
+    Near-duplicate suppression: canonical vs linked chunks and the
+    embeddings that were not computed.
+    """
+    from app.services.dedup import dedup_index
+
+    return dedup_index.stats(db)
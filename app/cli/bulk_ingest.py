@@ -0,0 +1,415 @@
+# app/cli/bulk_ingest.py
+"""
+Bulk directory ingestion: the same extract -> chunk -> embed -> upsert ->
+Document-metadata pipeline as POST /api/doc/upload, without HTTP.
+
+    python -m app.cli.bulk_ingest uploaded_docs --chunk-strategy paragraph
+    python -m app.cli.bulk_ingest /data/customer --tags acme --report ingest.json
+    python -m app.cli.bulk_ingest /data/acme --tenant acme
+
+  - extraction + chunking run in a process pool (one file per task)
+  - near-duplicate chunks are linked to a canonical chunk, not embedded
+  - chunks from many files are embedded in large batches
+  - points are upserted in batches by a small thread pool, overlapping the
+    next embedding batch
+  - files whose sha256 is already on a Document row are skipped, so an
+    interrupted run can simply be started again
+
+Heavy modules (embedding model, Qdrant, SQLAlchemy) are imported in main()
+only; pool workers re-import this module and must stay light.
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional
+
+from app.services.chunking import chunk_layout, chunk_text
+from app.services.pdf_extraction import file_sha256, iter_pdf_pages
+from app.services.text_extraction import extract_text_from_txt
+from app.utils.config import (
+    BULK_EMBED_BATCH,
+    BULK_EXTRACT_WORKERS,
+    BULK_UPSERT_BATCH,
+    BULK_UPSERT_CONCURRENCY,
+)
+
+SUPPORTED_EXTENSIONS = {".pdf": "pdf", ".txt": "txt"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest every .pdf / .txt file under a directory")
+    parser.add_argument("directory", nargs="?", default="uploaded_docs")
+    parser.add_argument("--chunk-strategy", choices=["fixed", "paragraph", "token", "small_to_big"], default="fixed")
+    parser.add_argument("--tags", help="comma-separated tags stored on every chunk")
+    parser.add_argument("--tenant", help="tenant the documents belong to (default: the untenanted corpus)")
+    parser.add_argument("--workers", type=int, default=BULK_EXTRACT_WORKERS, help="extraction processes")
+    parser.add_argument("--embed-batch", type=int, default=BULK_EMBED_BATCH, help="chunks per embedding call")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="model batch size inside one call")
+    parser.add_argument("--upsert-batch", type=int, default=BULK_UPSERT_BATCH, help="points per Qdrant upsert")
+    parser.add_argument("--upsert-concurrency", type=int, default=BULK_UPSERT_CONCURRENCY)
+    parser.add_argument("--report", help="write the throughput report as JSON to this path")
+    return parser.parse_args()
+
+
+def discover(root: str) -> List[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(dirpath, name))
+    return sorted(paths)
+
+
+# -----------------------------
+# Pool worker
+# -----------------------------
+def prepare_file(path: str, chunk_strategy: str) -> Dict:
+    """
+    Extract and chunk one file (runs in a pool worker).
+    PDFs are read serially here: the pool already parallelises across files.
+    """
+    start = time.perf_counter()
+    filetype = SUPPORTED_EXTENSIONS[os.path.splitext(path)[1].lower()]
+    try:
+        if filetype == "pdf":
+            text = "".join(iter_pdf_pages(path, workers=1))
+        else:
+            text = extract_text_from_txt(path)
+        spans, parents = chunk_layout(text, chunk_strategy) if text and text.strip() else ([], None)
+        chunks = chunk_text(text, chunk_strategy, spans)
+        error = None if chunks else "No readable text found in document."
+    except Exception as e:
+        text, chunks, spans, parents, error = "", [], [], None, f"{type(e).__name__}: {e}"
+
+    return {
+        "path": path,
+        "filetype": filetype,
+        "chunks": chunks,
+        "spans": spans,
+        "parents": parents,
+        "text": text,
+        "error": error,
+        "extract_s": time.perf_counter() - start,
+    }
+
+
+def prepare_stream(pool, paths: List[str], chunk_strategy: str, window: int) -> Iterator[Dict]:
+    """
+    Prepared files in completion order, with at most `window` files in flight.
+    """
+    queued = iter(paths)
+    pending = {pool.submit(prepare_file, p, chunk_strategy) for p in islice(queued, window)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            for path in islice(queued, 1):
+                pending.add(pool.submit(prepare_file, path, chunk_strategy))
+            yield future.result()
+
+
+# -----------------------------
+# Report
+# -----------------------------
+class Report:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files_found = 0
+        self.skipped = 0
+        self.ingested = 0
+        self.chunks = 0
+        self.duplicates = 0
+        self.failed: List[Dict] = []
+        self.stage_s = {
+            "hash": 0.0, "extract_cpu": 0.0, "dedup": 0.0, "embed": 0.0, "upsert_wait": 0.0, "doc_vector": 0.0,
+        }
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "files_found": self.files_found,
+            "skipped_already_ingested": self.skipped,
+            "ingested": self.ingested,
+            "failed": len(self.failed),
+            "failures": self.failed,
+            "chunks": self.chunks,
+            "duplicate_chunks_skipped": self.duplicates,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(self.ingested / elapsed, 3) if elapsed else 0.0,
+            "chunks_per_s": round(self.chunks / elapsed, 3) if elapsed else 0.0,
+            "stage_s": {k: round(v, 3) for k, v in self.stage_s.items()},
+        }
+
+    def progress(self, total: int):
+        elapsed = time.perf_counter() - self.started
+        done = self.ingested + len(self.failed)
+        print(f"[{done}/{total}] {self.ingested} ingested, {len(self.failed)} failed, "
+              f"{self.chunks} chunks, {self.chunks / elapsed if elapsed else 0:.1f} chunks/s", flush=True)
+
+
+# -----------------------------
+# Batched embed + upsert
+# -----------------------------
+class BulkIngestor:
+    def __init__(self, db, args, report: Report, upsert_pool: ThreadPoolExecutor, collection: str, model_id: str):
+        from app.services.ingestion import build_points, parse_tags
+
+        self.db = db
+        self.collection = collection
+        self.model_id = model_id
+        self.args = args
+        self.report = report
+        self.upsert_pool = upsert_pool
+        self.tags = parse_tags(args.tags)
+        self._build_points = build_points
+        self._in_flight: Optional[Dict] = None   # previous batch, still upserting
+
+    def flush(self, files: List[Dict]):
+        """
+        Embed one batch of files, create their rows and start the upserts.
+        The previous batch is finalized afterwards, so its upserts overlap
+        this batch's embedding.
+        """
+        from app.db.models import Document
+        from app.services.dedup import PendingIndex, dedup_index
+        from app.services.document_store import document_text_store
+        from app.services.embedding import generate_embeddings
+        from app.services.vector_db import upsert_vectors
+        from app.utils.config import DEDUP_ENABLED
+
+        if not files:
+            return
+
+        # Near-duplicates (against the corpus and earlier files of this batch)
+        # are linked instead of embedded. Canonical chunks of the batch still
+        # in flight are not visible yet; at worst one extra copy is embedded.
+        pending = PendingIndex()
+        start = time.perf_counter()
+        for f in files:
+            f["plan"] = (
+                dedup_index.plan(self.db, f["chunks"], pending, tenant_id=self.args.tenant, collection=self.collection)
+                if DEDUP_ENABLED else None
+            )
+            f["keep"] = f["plan"].keep if f["plan"] is not None else list(range(len(f["chunks"])))
+        self.report.stage_s["dedup"] += time.perf_counter() - start
+
+        texts = [f["chunks"][i] for f in files for i in f["keep"]]
+        start = time.perf_counter()
+        embeddings = generate_embeddings(
+            texts, use_cache=False, batch_size=self.args.encode_batch_size, model_id=self.model_id
+        )
+        self.report.stage_s["embed"] += time.perf_counter() - start
+
+        docs = []
+        for f in files:
+            doc = Document(
+                filename=f["filename"],
+                filetype=f["filetype"],
+                chunk_strategy=self.args.chunk_strategy,
+                number_of_chunks=len(f["chunks"]),
+                vector_ids="[]",
+                tenant_id=self.args.tenant,
+            )
+            self.db.add(doc)
+            docs.append(doc)
+        self.db.commit()
+
+        # Duplicates reuse their canonical chunk's vector (possibly another file's)
+        offset = 0
+        for f in files:
+            n = len(f["keep"])
+            f["embeddings"] = embeddings[offset:offset + n]
+            if f["plan"] is not None:
+                pending.set_vectors(f["plan"], f["embeddings"])
+            offset += n
+
+        points = []
+        for f, doc in zip(files, docs):
+            f["revision"] = uuid.uuid4().hex
+            if f["plan"] is not None:
+                f["embeddings"] = f["plan"].chunk_vectors(pending)
+            file_points, f["vector_ids"] = self._build_points(
+                f["chunks"], f["embeddings"], f["filename"], doc.id, f["revision"], self.tags,
+                spans=f["spans"], parents=f["parents"], tenant_id=self.args.tenant,
+            )
+            document_text_store.save(doc.id, f["revision"], f.pop("text"))
+            points.extend(file_points)
+
+        size = max(1, self.args.upsert_batch)
+        futures = [
+            self.upsert_pool.submit(upsert_vectors, self.collection, points[i:i + size])
+            for i in range(0, len(points), size)
+        ]
+
+        self.finalize()
+        self._in_flight = {"files": files, "docs": docs, "futures": futures, "pending": pending}
+
+    def finalize(self):
+        """
+        Wait for the in-flight batch. On success the rows get their vector ids
+        and content hash (which is what makes a re-run skip them); on failure
+        the batch's vectors and rows are removed again.
+        """
+        from qdrant_client.http import models
+
+        from app.services.dedup import dedup_index
+        from app.services.document_index import doc_payload, mean_vector, upsert_document_vectors
+        from app.services.document_store import document_text_store
+        from app.services.vector_db import chunk_payload, delete_document_vectors
+
+        batch, self._in_flight = self._in_flight, None
+        if batch is None:
+            return
+
+        start = time.perf_counter()
+        done, _ = wait(batch["futures"])
+        self.report.stage_s["upsert_wait"] += time.perf_counter() - start
+        errors = [f.exception() for f in done if f.exception() is not None]
+
+        if not errors:
+            doc_points = []
+            for f, doc in zip(batch["files"], batch["docs"]):
+                doc.vector_ids = json.dumps(f["vector_ids"])
+                doc.content_hash = f["content_hash"]
+                if f["plan"] is not None:
+                    dedup_index.record(
+                        self.db,
+                        f["plan"],
+                        dict(enumerate(f["vector_ids"])),
+                        {
+                            i: chunk_payload(
+                                c, f["filename"], i, doc.id, f["revision"], self.tags,
+                                span=f["spans"][i], parent=f["parents"][i] if f["parents"] else None,
+                                tenant_id=self.args.tenant,
+                            )
+                            for i, c in enumerate(f["chunks"])
+                        },
+                        batch["pending"],
+                    )
+                    self.report.duplicates += len(f["plan"].duplicates)
+                self.report.ingested += 1
+                self.report.chunks += len(f["chunks"])
+
+                vector = mean_vector(f["embeddings"])
+                if vector is not None:
+                    doc_points.append(models.PointStruct(
+                        id=doc.id,
+                        vector=vector,
+                        payload=doc_payload(
+                            doc.id, f["filename"], f["revision"], self.tags, len(f["chunks"]), self.args.tenant
+                        ),
+                    ))
+
+            # Document vectors for hierarchical search, one upsert per batch
+            start = time.perf_counter()
+            if doc_points:
+                upsert_document_vectors(self.collection, len(doc_points[0].vector), doc_points)
+            self.report.stage_s["doc_vector"] += time.perf_counter() - start
+            self.db.commit()
+            return
+
+        for f, doc in zip(batch["files"], batch["docs"]):
+            try:
+                delete_document_vectors(doc.id, collection_name=self.collection)
+            except Exception:
+                pass
+            document_text_store.delete(doc.id)
+            self.db.delete(doc)
+            self.report.failed.append({"path": f["path"], "error": f"Qdrant upsert failed: {errors[0]}"})
+        self.db.commit()
+
+
+def main():
+    args = parse_args()
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        raise SystemExit(f"Not a directory: {args.directory}")
+
+    from app.db.database import SessionLocal
+    from app.db.models import Document
+    from app.db.session import init_db
+    from app.services.tenants import InvalidTenant, route, validate_tenant_id
+
+    try:
+        args.tenant = validate_tenant_id(args.tenant)
+    except InvalidTenant as e:
+        raise SystemExit(str(e))
+
+    init_db()
+    tenant_route = route(args.tenant)
+    collection, model_id = tenant_route.collection, tenant_route.model_id
+
+    report = Report()
+    paths = discover(root)
+    report.files_found = len(paths)
+
+    db = SessionLocal()
+    pool = ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=get_context("spawn"))
+    upsert_pool = ThreadPoolExecutor(max_workers=max(1, args.upsert_concurrency), thread_name_prefix="upsert")
+    try:
+        # Resume: skip content that is already ingested (also duplicates within this run)
+        start = time.perf_counter()
+        hashes = dict(zip(paths, pool.map(file_sha256, paths, chunksize=16)))
+        report.stage_s["hash"] = time.perf_counter() - start
+
+        seen = {
+            h for (h,) in db.query(Document.content_hash).filter(
+                Document.content_hash.isnot(None),
+                Document.tenant_id == args.tenant if args.tenant else Document.tenant_id.is_(None),
+            )
+        }
+        todo = []
+        for path in paths:
+            if hashes[path] in seen:
+                report.skipped += 1
+            else:
+                seen.add(hashes[path])
+                todo.append(path)
+        print(f"{len(paths)} files found, {report.skipped} already ingested or duplicate, {len(todo)} to ingest", flush=True)
+
+        ingestor = BulkIngestor(db, args, report, upsert_pool, collection, model_id)
+        batch, batch_chunks = [], 0
+        for prepared in prepare_stream(pool, todo, args.chunk_strategy, window=4 * max(1, args.workers)):
+            report.stage_s["extract_cpu"] += prepared["extract_s"]
+            if prepared["error"]:
+                report.failed.append({"path": prepared["path"], "error": prepared["error"]})
+                continue
+
+            prepared["filename"] = os.path.relpath(prepared["path"], root)
+            prepared["content_hash"] = hashes[prepared["path"]]
+            batch.append(prepared)
+            batch_chunks += len(prepared["chunks"])
+
+            if batch_chunks >= args.embed_batch:
+                ingestor.flush(batch)
+                batch, batch_chunks = [], 0
+                report.progress(len(todo))
+
+        ingestor.flush(batch)
+        ingestor.finalize()
+        report.progress(len(todo))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        upsert_pool.shutdown(wait=True)
+        db.close()
+
+    result = report.to_dict()
+    print(
+        f"\n{result['ingested']} ingested, {result['skipped_already_ingested']} skipped, {result['failed']} failed "
+        f"in {result['elapsed_s']}s: {result['files_per_s']} files/s, {result['chunks_per_s']} chunks/s"
+    )
+    print("stage seconds: " + ", ".join(f"{k} {v}" for k, v in result["stage_s"].items()))
+    for failure in result["failures"]:
+        print(f"  failed: {failure['path']}: {failure['error']}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
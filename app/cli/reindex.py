@@ -0,0 +1,66 @@
+# app/cli/reindex.py
+"""
+Blue/green re-index from the command line (same job as POST /api/admin/reindex).
+
+    python -m app.cli.reindex
+    python -m app.cli.reindex --model-id sentence-transformers/all-mpnet-base-v2 --drop-old
+    python -m app.cli.reindex --chunk-strategy paragraph
+    python -m app.cli.reindex --dedicate-tenant acme      # move a tenant to its own collection
+"""
+import argparse
+import threading
+
+from app.utils.config import REINDEX_BATCH
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the document collection and swap the alias")
+    parser.add_argument("--model-id", help="embedding model for the new collection (default: EMBEDDING_MODEL)")
+    parser.add_argument("--chunk-strategy", choices=["fixed", "paragraph", "token", "small_to_big"], help="re-chunk stored text")
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH, help="chunks per embedding call")
+    parser.add_argument("--drop-old", action="store_true", help="delete the previous collection after the swap")
+    parser.add_argument("--tenant", help="rebuild this tenant's dedicated collection")
+    parser.add_argument("--dedicate-tenant", help="move this tenant from the shared collection to its own")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from app.db.session import init_db
+    from app.services.reindex import ReindexJob
+    from app.services.tenants import InvalidTenant, tenant_alias, validate_tenant_id
+    from app.utils.config import DOCUMENTS_ALIAS
+
+    try:
+        tenant_id = validate_tenant_id(args.dedicate_tenant or args.tenant)
+    except InvalidTenant as e:
+        raise SystemExit(str(e))
+
+    init_db()
+    job = ReindexJob(
+        model_id=args.model_id,
+        chunk_strategy=args.chunk_strategy,
+        batch_size=args.batch_size,
+        drop_old=args.drop_old,
+        alias=tenant_alias(tenant_id) if tenant_id else DOCUMENTS_ALIAS,
+        source_alias=DOCUMENTS_ALIAS if args.dedicate_tenant else None,
+        tenant_id=tenant_id,
+    )
+    worker = threading.Thread(target=job.run, daemon=True)
+    worker.start()
+
+    while worker.is_alive():
+        worker.join(timeout=2.0)
+        p = job.progress
+        print(f"[{job.status}] {p['documents_done']}/{p['documents_total']} documents, "
+              f"{p['points_written']} points, {p['points_per_s']} points/s", flush=True)
+
+    state = job.to_dict()
+    print(f"\n{state['status']}: {state['source']} -> {state['target']}")
+    if state["error"]:
+        raise SystemExit(state["error"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float, LargeBinary, Text
 from datetime import datetime
 
 Base = declarative_base()
@@ -14,6 +14,66 @@ class Document(Base):
     chunk_strategy = Column(String)
     number_of_chunks = Column(Integer)
     vector_ids = Column(String)
+    content_hash = Column(String, index=True)   # sha256 of the source file
+    tenant_id = Column(String, index=True)      # None = default (untenanted) corpus
+
+
+class CollectionVersion(Base):
+    """
+    One physical Qdrant collection of document chunks and the model it was
+    embedded with; DOCUMENTS_ALIAS points at the live one.
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String, primary_key=True)
+    model_id = Column(String)
+    vector_size = Column(Integer)
+    chunk_strategy = Column(String, nullable=True)   # None = kept as ingested
+    status = Column(String, default="building")      # building / live / retired / failed
+    points = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChunkSignature(Base):
+    """
+    MinHash signature of a stored (canonical) chunk, keyed by its Qdrant point id.
+    """
+    __tablename__ = "chunk_signatures"
+
+    point_id = Column(String, primary_key=True)
+    document_id = Column(Integer, index=True)
+    revision = Column(String)
+    signature = Column(LargeBinary)
+
+
+class LshBucket(Base):
+    """
+    One LSH band bucket ("<band>:<hash>") a canonical chunk falls into.
+    """
+    __tablename__ = "lsh_buckets"
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String, index=True)
+    point_id = Column(String, index=True)
+
+
+class ChunkDuplicate(Base):
+    """
+    A near-duplicate chunk that was linked to a canonical point instead of
+    being embedded: its own point (point_id) reuses the canonical vector.
+    Keeps its own payload so it can be promoted if the canonical chunk goes away.
+    """
+    __tablename__ = "chunk_duplicates"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, index=True)
+    revision = Column(String)
+    chunk_id = Column(Integer)
+    point_id = Column(String)   # None = recorded before duplicates were stored as points
+    canonical_point_id = Column(String, index=True)
+    similarity = Column(Float)
+    signature = Column(LargeBinary)
+    payload = Column(Text)
 
 
 class Booking(Base):
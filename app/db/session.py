@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from app.db.models import Base
 
 DATABASE_URL = "sqlite:///./app_data.db"
@@ -7,7 +7,25 @@ engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+# Columns added after the first release; create_all() never alters existing tables
+_ADDED_COLUMNS = {
+    "documents": {"content_hash": "VARCHAR", "tenant_id": "VARCHAR"},
+    "chunk_duplicates": {"point_id": "VARCHAR"},
+}
+
 
+def _add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, ddl_type in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_tenant_id ON documents (tenant_id)"))
 
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
@@ -2,23 +2,35 @@ from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
+import logging
 
 # Routers
 from app.api import document_ingestion, test_qdrant, test_redis
 from app.api import router as api_router
 from app.api.test_redis import router as test_redis_router
 from app.api.conversate import router as conversate_router
+from app.api.conversate_ws import router as conversate_ws_router
 from app.api.booking_api import router as booking_router
+from app.api.debug import router as debug_router
+from app.api.admin import router as admin_router
 
 # DB imports
 from app.db.session import init_db
 from app.db.database import get_db
 from app.db.models import Booking
+from app.services.booking_cache import booking_cache
+from app.services.pdf_extraction import shutdown_pool as shutdown_pdf_pool
+from app.services.index_versions import ensure_documents_alias
+from app.services.vector_db import ensure_payload_indexes
+from app.utils.circuit_breaker import breaker_states
+from app.utils.metrics import metrics_middleware, metrics_response
+from app.utils.rate_limit import rate_limit_middleware
 
 # Schemas
 from app.schemas.booking import BookingCreate, BookingResponse
 
 load_dotenv()
+logger = logging.getLogger("main")
 
 
 # ---------------------------------------------------
@@ -27,8 +39,13 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()   # create tables if not exist
+    try:
+        live_collection = ensure_documents_alias()   # alias -> legacy "documents" on first start
+        ensure_payload_indexes(live_collection)      # document_id / filename indexes for filter-deletes
+    except Exception:
+        logger.warning("Qdrant alias / payload index setup skipped", exc_info=True)
     yield       # shutdown
-    pass
+    shutdown_pdf_pool()
 
 
 # ---------------------------------------------------
@@ -40,16 +57,23 @@ app = FastAPI(
 )
 
 
+app.middleware("http")(metrics_middleware)
+app.middleware("http")(rate_limit_middleware)   # outermost: shed requests never reach the routes or metrics
+
+
 # ---------------------------------------------------
 # 🚀 Include Routers
 # ---------------------------------------------------
 app.include_router(conversate_router, prefix="/api")
+app.include_router(conversate_ws_router, prefix="/api")
 app.include_router(api_router, prefix="/api")
 app.include_router(test_qdrant.router, prefix="/api/test")
 app.include_router(test_redis.router, prefix="/api/test")
 app.include_router(document_ingestion.router, prefix="/api/doc")
 app.include_router(test_redis_router)
 app.include_router(booking_router, prefix="/api")
+app.include_router(debug_router, prefix="/api/debug")
+app.include_router(admin_router, prefix="/api/admin")
 
 
 # ---------------------------------------------------
@@ -60,6 +84,24 @@ def root():
     return {"message": "Backend running successfully 🚀"}
 
 
+# ---------------------------------------------------
+# 🚀 Prometheus Metrics
+# ---------------------------------------------------
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+
+# ---------------------------------------------------
+# 🚀 Health (circuit breakers of this worker)
+# ---------------------------------------------------
+@app.get("/health")
+def health():
+    breakers = breaker_states()
+    degraded = sorted(name for name, b in breakers.items() if b["state"] != "closed")
+    return {"status": "degraded" if degraded else "ok", "degraded": degraded, "breakers": breakers}
+
+
 # ---------------------------------------------------
 # 🚀 Booking CRUD APIs
 # ---------------------------------------------------
@@ -68,9 +110,19 @@ def get_all_bookings(db: Session = Depends(get_db)):
     return db.query(Booking).all()
 
 
+@app.get("/api/bookings/cache/stats")
+def get_booking_cache_stats():
+    return booking_cache.stats()
+
+
+@app.get("/api/bookings/session/{session_id}", response_model=list[BookingResponse])
+def get_session_bookings(session_id: str, db: Session = Depends(get_db)):
+    return booking_cache.get_session_bookings(db, session_id)
+
+
 @app.get("/api/bookings/{booking_id}", response_model=BookingResponse)
 def get_booking(booking_id: int, db: Session = Depends(get_db)):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = booking_cache.get_booking(db, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     return booking
@@ -82,6 +134,7 @@ def update_booking(booking_id: int, updated: BookingCreate, db: Session = Depend
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
+    old_session_id = booking.session_id
     booking.session_id = updated.session_id
     booking.name = updated.name
     booking.email = updated.email
@@ -90,6 +143,7 @@ def update_booking(booking_id: int, updated: BookingCreate, db: Session = Depend
 
     db.commit()
     db.refresh(booking)
+    booking_cache.invalidate(booking_id, [old_session_id, booking.session_id])
     return booking
 
 
@@ -99,7 +153,9 @@ def delete_booking(booking_id: int, db: Session = Depends(get_db)):
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
+    session_id = booking.session_id
     db.delete(booking)
     db.commit()
+    booking_cache.invalidate(booking_id, [session_id])
 
     return {"status": "deleted", "booking_id": booking_id}
@@ -0,0 +1,259 @@
+# app/services/booking_cache.py
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Booking
+from app.utils.config import (
+    BOOKING_CACHE_SIZE,
+    BOOKING_CACHE_TTL,
+    BOOKING_CACHE_REDIS,
+    BOOKING_CACHE_REDIS_TTL,
+)
+from app.utils.lru_cache import LRUCache
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger("booking_cache")
+
+INVALIDATION_CHANNEL = "booking:invalidate"
+
+# Stores a value loaded from SQLite only if no writer invalidated the key
+# since the generation was read (KEYS: value, generation; ARGV: generation
+# seen before the load, value, ttl). Returns 1 if stored.
+SET_IF_GENERATION_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+return 1
+"""
+
+
+def booking_to_dict(booking: Booking) -> Dict[str, Any]:
+    return {
+        "id": booking.id,
+        "session_id": booking.session_id,
+        "name": booking.name,
+        "email": booking.email,
+        "date": booking.date,
+        "time": booking.time,
+    }
+
+
+class BookingCache:
+    """
+    Read-through cache for booking lookups:
+      1) in-process LRU (short TTL, per worker)
+      2) Redis (optional, shared by all workers)
+      3) SQLite
+    Writers must call `invalidate` after commit.
+
+    A reader that loaded a row before a writer's invalidate must not cache
+    it afterwards: every invalidate bumps a generation (per key in Redis,
+    per process locally) and a fill only lands if the generation it saw
+    before the load is unchanged. Invalidations are also published on
+    INVALIDATION_CHANNEL so every worker drops its local copies; while a
+    worker is not subscribed its local tier is bypassed.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(maxsize=BOOKING_CACHE_SIZE, ttl=BOOKING_CACHE_TTL)
+        self.use_redis = BOOKING_CACHE_REDIS
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0, "stale_fills_dropped": 0}
+        self._epoch = 0   # bumped on every local drop
+        self._script = None
+        self._listener: Optional[threading.Thread] = None
+        self._subscribed = threading.Event()
+
+    # -----------------------------
+    # Keys
+    # -----------------------------
+    @staticmethod
+    def _booking_key(booking_id: int) -> str:
+        return f"booking:{booking_id}"
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"booking:session:{session_id}"
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:gen"
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    # -----------------------------
+    # Local tier
+    # -----------------------------
+    def _drop_local(self, keys: Optional[Iterable[str]] = None):
+        """
+        Drop `keys` (all entries if None) and void in-flight local fills.
+        """
+        with self._lock:
+            self._epoch += 1
+        if keys is None:
+            self.local.clear()
+        else:
+            for key in keys:
+                self.local.delete(key)
+
+    def _set_local(self, key: str, value, epoch: int):
+        with self._lock:
+            if epoch != self._epoch:
+                return
+        self.local.set(key, value)
+
+    def _local_enabled(self) -> bool:
+        """
+        Without Redis the local tier is the only one; with it, local entries
+        are only trusted while this worker receives invalidations.
+        """
+        if not self.use_redis:
+            return True
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(
+                        target=self._listen, name="booking-cache-invalidations", daemon=True
+                    )
+                    self._listener.start()
+        return self._subscribed.is_set()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Entries cached while not subscribed may have missed an invalidation
+                self._drop_local()
+                self._subscribed.set()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._drop_local(json.loads(message["data"]))
+            except Exception:
+                logger.warning("Booking cache invalidation listener failed", exc_info=True)
+            self._subscribed.clear()
+            self._drop_local()
+            time.sleep(1.0)
+
+    # -----------------------------
+    # Tiered read-through
+    # -----------------------------
+    def _lookup(self, key: str, load: Callable[[], Any]):
+        epoch = self._epoch
+        local_enabled = self._local_enabled()
+        if local_enabled:
+            value = self.local.get(key)
+            if value is not None:
+                self._count("local_hits")
+                return value
+
+        generation = None
+        if self.use_redis:
+            try:
+                raw, generation = get_redis_client().mget(key, self._generation_key(key))
+                generation = generation or "0"
+                if raw is not None:
+                    value = json.loads(raw)
+                    if local_enabled:
+                        self._set_local(key, value, epoch)
+                    self._count("redis_hits")
+                    return value
+            except Exception:
+                generation = None
+                logger.warning("Redis booking cache read failed", exc_info=True)
+
+        self._count("misses")
+        value = load()
+        if value is not None:
+            self._fill(key, value, epoch, generation, local_enabled)
+        return value
+
+    def _fill(self, key: str, value, epoch: int, generation: Optional[str], local_enabled: bool):
+        if self.use_redis:
+            if generation is None:
+                # Redis unreachable: no generation to check against, don't cache
+                return
+            try:
+                if self._script is None:
+                    self._script = get_redis_client().register_script(SET_IF_GENERATION_LUA)
+                stored = self._script(
+                    keys=[key, self._generation_key(key)],
+                    args=[generation, json.dumps(value), BOOKING_CACHE_REDIS_TTL],
+                )
+            except Exception:
+                logger.warning("Redis booking cache write failed", exc_info=True)
+                return
+            if not stored:
+                self._count("stale_fills_dropped")
+                return
+        if local_enabled:
+            self._set_local(key, value, epoch)
+
+    # -----------------------------
+    # Public lookups
+    # -----------------------------
+    def get_booking(self, db: Session, booking_id: int) -> Optional[Dict[str, Any]]:
+        def load():
+            booking = db.query(Booking).filter(Booking.id == booking_id).first()
+            return booking_to_dict(booking) if booking else None
+
+        return self._lookup(self._booking_key(booking_id), load)
+
+    def get_session_bookings(self, db: Session, session_id: str) -> List[Dict[str, Any]]:
+        def load():
+            rows = db.query(Booking).filter(Booking.session_id == session_id).order_by(Booking.id).all()
+            return [booking_to_dict(b) for b in rows]
+
+        return self._lookup(self._session_key(session_id), load)
+
+    # -----------------------------
+    # Invalidation
+    # -----------------------------
+    def invalidate(self, booking_id: Optional[int] = None, session_ids: Iterable[Optional[str]] = ()):
+        keys = []
+        if booking_id is not None:
+            keys.append(self._booking_key(booking_id))
+        keys.extend(self._session_key(s) for s in set(session_ids) if s)
+
+        if not keys:
+            return
+
+        self._drop_local(keys)
+
+        if self.use_redis:
+            try:
+                pipe = get_redis_client().pipeline(transaction=True)
+                for key in keys:
+                    pipe.incr(self._generation_key(key))
+                    # Kept as long as a cached value, far longer than any read in flight
+                    pipe.expire(self._generation_key(key), BOOKING_CACHE_REDIS_TTL)
+                pipe.delete(*keys)
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+                pipe.execute()
+            except Exception:
+                logger.warning("Redis booking cache invalidation failed", exc_info=True)
+
+        self._count("invalidations")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        stats["redis_enabled"] = self.use_redis
+        stats["local_tier_active"] = not self.use_redis or self._subscribed.is_set()
+        return stats
+
+
+booking_cache = BookingCache()
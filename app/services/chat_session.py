@@ -0,0 +1,197 @@
+# app/services/chat_session.py
+"""
+Conversation state of one WebSocket connection.
+
+The session's memory is read from Redis once, when the connection starts,
+and then kept in process: every turn appends to it locally and is queued
+for a background writer, which persists queued turns to Redis (and the
+semantic memory index) off the request path. Retrieval results are kept
+too, so a repeated or near-identical question reuses them.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import anyio
+import numpy as np
+
+from app.services.semantic_memory import semantic_memory
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.config import (
+    BREAKER_QDRANT_SLOW_MS,
+    BREAKER_REDIS_SLOW_MS,
+    MEMORY_MODE,
+    MEMORY_RECENT_TURNS,
+    MEMORY_TOP_K,
+    WS_RETRIEVAL_CACHE_SIZE,
+    WS_RETRIEVAL_REUSE_SIMILARITY,
+    WS_WRITE_BEHIND_FLUSH_TIMEOUT,
+)
+from app.utils.lru_cache import LRUCache
+from app.utils.redis_client import get_chat_history, save_messages
+
+logger = logging.getLogger("chat_session")
+
+memory_breaker = get_breaker("redis", BREAKER_REDIS_SLOW_MS)
+memory_index_breaker = get_breaker("memory_index", BREAKER_QDRANT_SLOW_MS)
+
+_CLOSE = object()
+
+
+class ChatSession:
+    def __init__(self, session_id: str, tenant_id: Optional[str] = None):
+        self.session_id = session_id
+        self.tenant_id = tenant_id
+        self.turn = 0                   # latest exchange number (semantic memory)
+        self.messages: List[str] = []   # "role: text"; the whole history in full mode, else the recent window
+        self.history_loaded = False     # False when Redis was unavailable at the start
+        self._loaded = False
+        self._retrievals = LRUCache(WS_RETRIEVAL_CACHE_SIZE)
+        self._last_retrieval: Optional[Tuple[str, np.ndarray, List[Dict]]] = None   # (scope, query vector, hits)
+        self.last_hits: Optional[List[Dict]] = None   # retrieval of the previous RAG turn
+        self._pending: "asyncio.Queue" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    # -----------------------------
+    # Memory (in process)
+    # -----------------------------
+    def load(self):
+        """
+        The one Redis read of the connection (at its start); without Redis
+        the conversation starts empty.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if MEMORY_MODE == "semantic":
+                self.turn, self.messages = memory_breaker.call(semantic_memory.recent, self.session_id)
+            else:
+                self.messages = memory_breaker.call(get_chat_history, self.session_id)
+            self.history_loaded = True
+        except CircuitOpenError:
+            pass
+        except Exception:
+            logger.exception("Session memory load failed")
+
+    def memory_text(self, query_vector: Optional[Sequence[float]]) -> Dict:
+        """
+        Same shape as semantic_memory.compose() plus "complete" (False when
+        part of the memory could not be read), from the in-process messages;
+        only exchanges older than the recent window are searched (semantic mode).
+        """
+        if MEMORY_MODE != "semantic":
+            text = "\n".join(self.messages) if self.messages else None
+            return {"text": text, "relevant": 0, "recent": len(self.messages), "complete": self.history_loaded}
+
+        relevant, complete = [], self.history_loaded
+        before_turn = self.turn - MEMORY_RECENT_TURNS + 1
+        if query_vector is not None and MEMORY_TOP_K > 0 and before_turn > 1:
+            try:
+                relevant = memory_index_breaker.call(
+                    semantic_memory.search, self.session_id, query_vector, MEMORY_TOP_K, before_turn
+                )
+            except CircuitOpenError:
+                complete = False
+            except Exception:
+                logger.exception("Session memory search failed")
+                complete = False
+        return {**semantic_memory.compose(relevant, self.messages[-2 * MEMORY_RECENT_TURNS:]), "complete": complete}
+
+    def add_turn(self, query: str, answer: str, index: bool = True):
+        """
+        Record an exchange locally and queue it for Redis (call on the event loop).
+        """
+        self.turn += 1
+        self.messages += [f"user: {query}", f"assistant: {answer}"]
+        if MEMORY_MODE == "semantic":
+            del self.messages[:-2 * MEMORY_RECENT_TURNS]
+        self._pending.put_nowait((query, answer, index))
+
+    # -----------------------------
+    # Retrievals (in process)
+    # -----------------------------
+    @staticmethod
+    def retrieval_scope(top_k: int, mode: Optional[str], precision: Optional[str], *filters) -> str:
+        return json.dumps([top_k, mode, precision, *filters])
+
+    def cached_retrieval(self, query: str, vector: Sequence[float], scope: str) -> Optional[List[Dict]]:
+        """
+        Hits of the same question (same scope) asked earlier on this
+        connection, or of the last one when its query embedding is within
+        WS_RETRIEVAL_REUSE_SIMILARITY.
+        """
+        hits = self._retrievals.get((scope, " ".join(query.lower().split())))
+        if hits is not None or self._last_retrieval is None:
+            return hits
+        last_scope, last_vector, last_hits = self._last_retrieval
+        if last_scope != scope or WS_RETRIEVAL_REUSE_SIMILARITY >= 1:
+            return None
+        current = np.asarray(vector, dtype=np.float32)
+        norms = float(np.linalg.norm(current) * np.linalg.norm(last_vector))
+        if norms and float(current @ last_vector) / norms >= WS_RETRIEVAL_REUSE_SIMILARITY:
+            return last_hits
+        return None
+
+    def remember_retrieval(self, query: str, vector: Sequence[float], scope: str, hits: List[Dict]):
+        if any(hit.get("cached") for hit in hits):
+            return   # a Qdrant-outage fallback is not worth keeping
+        self._retrievals.set((scope, " ".join(query.lower().split())), hits)
+        self._last_retrieval = (scope, np.asarray(vector, dtype=np.float32), hits)
+
+    # -----------------------------
+    # Write-behind
+    # -----------------------------
+    def start(self):
+        self._writer = asyncio.create_task(self._write_behind())
+
+    async def close(self):
+        """
+        Flush the turns still queued (bounded by WS_WRITE_BEHIND_FLUSH_TIMEOUT).
+        """
+        if self._writer is None:
+            return
+        self._pending.put_nowait(_CLOSE)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._writer), WS_WRITE_BEHIND_FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Session %s: %d turns not flushed to Redis", self.session_id, self._pending.qsize())
+
+    async def _write_behind(self):
+        while True:
+            batch = [await self._pending.get()]
+            while not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            turns = [item for item in batch if item is not _CLOSE]
+            if turns:
+                await anyio.to_thread.run_sync(self._persist, turns)
+            if len(turns) < len(batch):
+                return
+
+    def _persist(self, turns: List[Tuple[str, str, bool]]):
+        """
+        All queued exchanges in one RPUSH, then the semantic memory index.
+        """
+        try:
+            length = memory_breaker.call(
+                save_messages, self.session_id, [m for q, a, _ in turns for m in (("user", q), ("assistant", a))]
+            )
+        except CircuitOpenError:
+            return
+        except Exception:
+            logger.exception("Session memory write-behind failed")
+            return
+
+        if MEMORY_MODE == "semantic":
+            # The pushed exchanges are the last len(turns) of the list
+            first_turn = semantic_memory.turn_of(length) - len(turns) + 1
+            for turn, (query, answer, index) in enumerate(turns, start=first_turn):
+                if not index:
+                    continue
+                try:
+                    memory_index_breaker.call(semantic_memory.index_turn, self.session_id, turn, query, answer)
+                except CircuitOpenError:
+                    pass
+                except Exception:
+                    logger.exception("Semantic memory indexing failed")
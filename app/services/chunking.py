@@ -1,12 +1,228 @@
+# app/services/chunking.py
+import logging
 import re
-from typing import List
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator, List, Optional, Sequence, Tuple
 
+from app.utils.config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SENTENCE_BOUNDARY,
+    CHUNK_TOKENIZER,
+    SMALL_TO_BIG_CHILD_OVERLAP,
+    SMALL_TO_BIG_CHILD_TOKENS,
+    SMALL_TO_BIG_PARENT_TOKENS,
+)
+
+logger = logging.getLogger("chunking")
+
+Span = Tuple[int, int]   # [start, end) character offsets into the source text
+
+WORD_RE = re.compile(r"\S+")
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+FALLBACK_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]")   # ~WordPiece granularity
+
+SEGMENTS_PER_BATCH = 64   # sentences tokenized per encode_batch call
+
+
+# -----------------------------
+# Tokenizer
+# -----------------------------
+class RegexTokenizer:
+    """
+    Offline stand-in for the embedding tokenizer: word pieces of at most
+    six characters plus punctuation, which slightly over-counts WordPiece.
+    """
+
+    def offsets(self, segments: Sequence[str]) -> List[List[Span]]:
+        return [[m.span() for m in FALLBACK_TOKEN_RE.finditer(s)] for s in segments]
+
+
+class HFTokenizer:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def offsets(self, segments: Sequence[str]) -> List[List[Span]]:
+        encodings = self.tokenizer.encode_batch(list(segments), add_special_tokens=False)
+        return [[span for span in e.offsets if span[1] > span[0]] for e in encodings]
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(name: str = CHUNK_TOKENIZER):
+    """
+    The embedding model's fast tokenizer (Rust `tokenizers`, no model
+    weights), once per process. Falls back to RegexTokenizer when it
+    cannot be loaded, e.g. offline without a local copy.
+    """
+    try:
+        from tokenizers import Tokenizer
+
+        return HFTokenizer(Tokenizer.from_pretrained(name))
+    except Exception as e:
+        logger.warning("Tokenizer %s unavailable (%s); using approximate token counts", name, e)
+        return RegexTokenizer()
+
+
+# -----------------------------
+# Spans
+# -----------------------------
+def _segments(text: str, pattern: re.Pattern) -> Iterator[Span]:
+    """
+    Non-blank stretches of `text` between matches of `pattern`, whitespace trimmed.
+    """
+    start = 0
+    for match in pattern.finditer(text):
+        yield from _trimmed(text, start, match.start())
+        start = match.end()
+    yield from _trimmed(text, start, len(text))
+
+
+def _trimmed(text: str, start: int, end: int) -> Iterator[Span]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+
+def fixed_length_spans(text: str, chunk_size: int = 500) -> Iterator[Span]:
+    start = end = None
+    count = 0
+    for match in WORD_RE.finditer(text):
+        if start is None:
+            start = match.start()
+        end = match.end()
+        count += 1
+        if count == chunk_size:
+            yield start, end
+            start, count = None, 0
+    if start is not None:
+        yield start, end
+
+
+def paragraph_spans(text: str) -> Iterator[Span]:
+    return _segments(text, PARAGRAPH_BREAK_RE)
+
+
+def _tokens(text: str, tokenizer) -> Iterator[Tuple[int, int, bool]]:
+    """
+    (start, end, ends_sentence) for every token, tokenizing a batch of
+    sentences at a time so only a window of the document is held.
+    """
+    sentences = _segments(text, SENTENCE_BREAK_RE)
+    while True:
+        batch = list(islice(sentences, SEGMENTS_PER_BATCH))
+        if not batch:
+            return
+        for (base, end), offsets in zip(batch, tokenizer.offsets([text[s:e] for s, e in batch])):
+            for i, (s, e) in enumerate(offsets):
+                yield base + s, base + e, i == len(offsets) - 1
+
+
+def token_window_spans(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap: int = CHUNK_OVERLAP_TOKENS,
+    sentence_boundary: bool = CHUNK_SENTENCE_BOUNDARY,
+    tokenizer=None,
+) -> Iterator[Span]:
+    """
+    Sliding token windows of at most `max_tokens` tokens, consecutive
+    windows sharing up to `overlap` tokens (capped below half a window).
+
+    With `sentence_boundary`, a window ends after the last complete sentence
+    that fits (if that keeps it at least half full) and the overlap starts
+    at a sentence start when one falls inside it. Sentences longer than a
+    window are cut at token boundaries. Every token lands in some window.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    max_tokens = max(1, max_tokens)
+    overlap = min(max(0, overlap), (max_tokens - 1) // 2)
+
+    window: deque = deque()   # (start, end, ends_sentence)
+    fresh = 0                 # tokens in the window not yet emitted
+
+    def emit() -> Span:
+        nonlocal fresh
+        cut = len(window)
+        if sentence_boundary and cut == max_tokens:
+            ends = [i + 1 for i, token in enumerate(window) if token[2] and i + 1 >= max_tokens // 2]
+            if ends:
+                cut = ends[-1]
+        span = (window[0][0], window[cut - 1][1])
+
+        # Next window: the last `overlap` tokens of this one, moved up to a sentence start if possible
+        keep_from = max(cut - overlap, 1)
+        if sentence_boundary and overlap:
+            starts = [i for i in range(keep_from, cut) if window[i - 1][2]]
+            if starts:
+                keep_from = starts[0]
+        for _ in range(keep_from):
+            window.popleft()
+        fresh = len(window) - (cut - keep_from)
+        return span
+
+    for token in _tokens(text, tokenizer):
+        window.append(token)
+        fresh += 1
+        if len(window) == max_tokens:
+            yield emit()
+    if fresh:
+        yield window[0][0], window[-1][1]
+
+
+def small_to_big_spans(
+    text: str,
+    parent_tokens: int = SMALL_TO_BIG_PARENT_TOKENS,
+    child_tokens: int = SMALL_TO_BIG_CHILD_TOKENS,
+    child_overlap: int = SMALL_TO_BIG_CHILD_OVERLAP,
+) -> Iterator[Tuple[Span, Span]]:
+    """
+    (child, parent) spans: parents are sentence-aligned token windows
+    without overlap, children are small overlapping windows inside them.
+    Children are embedded and searched; parents are what the LLM reads.
+    """
+    tokenizer = get_tokenizer()
+    for parent_start, parent_end in token_window_spans(text, parent_tokens, 0, True, tokenizer):
+        section = text[parent_start:parent_end]
+        for start, end in token_window_spans(section, child_tokens, child_overlap, True, tokenizer):
+            yield (parent_start + start, parent_start + end), (parent_start, parent_end)
+
+
+def chunk_layout(text: str, chunk_strategy: str) -> Tuple[List[Span], Optional[List[Span]]]:
+    """
+    Chunk spans plus, for small_to_big, each chunk's parent span (else None).
+    """
+    if chunk_strategy == "small_to_big":
+        pairs = list(small_to_big_spans(text))
+        return [child for child, _ in pairs], [parent for _, parent in pairs]
+    if chunk_strategy == "fixed":
+        return list(fixed_length_spans(text)), None
+    if chunk_strategy == "token":
+        return list(token_window_spans(text)), None
+    return list(paragraph_spans(text)), None
+
+
+def chunk_spans(text: str, chunk_strategy: str) -> List[Span]:
+    return chunk_layout(text, chunk_strategy)[0]
+
+
+# -----------------------------
+# Text
+# -----------------------------
 def fixed_length_chunking(text: str, chunk_size: int = 500) -> List[str]:
-    words = text.split()
-    chunks = [" ".join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
-    return chunks
+    return [text[s:e] for s, e in fixed_length_spans(text, chunk_size)]
+
 
 def paragraph_chunking(text: str) -> List[str]:
     # Split by paragraph or new lines
-    paragraphs = re.split(r'\n\s*\n', text)
-    return [p.strip() for p in paragraphs if p.strip()]
+    return [text[s:e] for s, e in paragraph_spans(text)]
+
+
+def chunk_text(text: str, chunk_strategy: str, spans: Optional[List[Span]] = None) -> List[str]:
+    spans = spans if spans is not None else chunk_spans(text, chunk_strategy)
+    return [text[s:e] for s, e in spans]
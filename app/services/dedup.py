@@ -0,0 +1,418 @@
+# app/services/dedup.py
+import hashlib
+import json
+import re
+import uuid
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qdrant_models
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.models import ChunkDuplicate, ChunkSignature, Document, LshBucket
+from app.services.embedding import generate_embeddings
+from app.services.vector_db import client, upsert_vectors
+from app.utils.config import DEDUP_BANDS, DEDUP_NUM_PERM, DEDUP_SHINGLE, DEDUP_THRESHOLD
+from app.utils.metrics import DEDUP_CHUNKS
+
+_PRIME = (1 << 31) - 1        # hash values stay below 2^31, products fit in uint64
+_TOKEN_RE = re.compile(r"\w+")
+_SQL_IN_LIMIT = 500
+
+
+class PendingIndex:
+    """
+    Canonical chunks planned in this batch but not persisted yet, so
+    duplicates inside one document (or one bulk batch) are caught too.
+    Refs are (plan token, chunk index) until `resolve` maps them to point ids.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[str, List[Hashable]] = defaultdict(list)
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.point_ids: Dict[Hashable, str] = {}
+        self.vectors: Dict[Hashable, Sequence[float]] = {}
+
+    def add(self, ref: Hashable, signature: np.ndarray, keys: List[str]):
+        self.signatures[ref] = signature
+        for key in keys:
+            self.buckets[key].append(ref)
+
+    def set_vectors(self, plan: "DedupPlan", embeddings: Sequence[Sequence[float]]):
+        """
+        Embeddings of a plan's kept chunks (in `keep` order), reused by the duplicates linked to them.
+        """
+        for idx, vector in zip(plan.keep, embeddings):
+            self.vectors[(plan.token, idx)] = vector
+
+    def resolve(self, ref: Hashable) -> Optional[str]:
+        return self.point_ids.get(ref, ref if isinstance(ref, str) else None)
+
+
+class DedupPlan:
+    """
+    Result of checking one document's chunks: which to embed (`keep`) and
+    which are near-duplicates of an existing or earlier canonical chunk.
+    Duplicates are still stored as points of their own document (so payload
+    filters find them), but with their canonical chunk's vector.
+    """
+
+    def __init__(self, signatures: np.ndarray, tenant_id: Optional[str] = None):
+        self.token = object()
+        self.signatures = signatures
+        self.tenant_id = tenant_id
+        self.keep: List[int] = []
+        self.duplicates: Dict[int, Tuple[Hashable, float]] = {}   # index -> (canonical ref, similarity)
+        self.stored_vectors: Dict[str, Sequence[float]] = {}     # canonical point id -> its vector
+
+    def chunk_vectors(self, pending: PendingIndex) -> List[Sequence[float]]:
+        """
+        One vector per chunk, in chunk order: kept chunks their own embedding
+        (see PendingIndex.set_vectors), duplicates their canonical chunk's.
+        """
+        vectors = []
+        for idx in range(len(self.signatures)):
+            if idx not in self.duplicates:
+                vectors.append(pending.vectors[(self.token, idx)])
+                continue
+            ref = self.duplicates[idx][0]
+            vectors.append(self.stored_vectors[ref] if isinstance(ref, str) else pending.vectors[ref])
+        return vectors
+
+
+class DedupIndex:
+    """
+    MinHash signatures over word shingles plus a banded LSH index stored in
+    SQLite, shared by every document in the corpus.
+
+    Permutations come from a fixed seed: signatures must stay comparable
+    across processes and restarts.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS,
+        threshold: float = DEDUP_THRESHOLD,
+        shingle: int = DEDUP_SHINGLE,
+    ):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS")
+        rng = np.random.default_rng(20240601)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle = shingle
+
+    # -----------------------------
+    # Signatures
+    # -----------------------------
+    def signature(self, text: str) -> np.ndarray:
+        words = _TOKEN_RE.findall(text.lower())
+        if not words:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint32)
+
+        k = min(self.shingle, len(words))
+        shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((hashes[:, None] * self.a + self.b) % _PRIME).min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray, tenant_id: Optional[str] = None) -> List[str]:
+        """
+        Bucket keys are per tenant: a chunk is never linked to another
+        tenant's chunk, which that tenant's searches could not see.
+        """
+        prefix = f"{tenant_id}|" if tenant_id else ""
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8)
+            keys.append(f"{prefix}{band}:{digest.hexdigest()}")
+        return keys
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+    @staticmethod
+    def _unpack(raw: bytes) -> np.ndarray:
+        return np.frombuffer(raw, dtype=np.uint32)
+
+    # -----------------------------
+    # Lookup
+    # -----------------------------
+    def _stored_candidates(
+        self, db: Session, keys: Sequence[str], exclude_document_id: Optional[int]
+    ) -> Tuple[Dict[str, List[str]], Dict[str, np.ndarray]]:
+        """
+        bucket -> point ids, and point id -> signature, for every bucket key given.
+        """
+        buckets: Dict[str, List[str]] = defaultdict(list)
+        unique_keys = list(set(keys))
+        for i in range(0, len(unique_keys), _SQL_IN_LIMIT):
+            rows = db.query(LshBucket.bucket, LshBucket.point_id).filter(
+                LshBucket.bucket.in_(unique_keys[i:i + _SQL_IN_LIMIT])
+            ).all()
+            for bucket, point_id in rows:
+                buckets[bucket].append(point_id)
+
+        point_ids = list({p for ids in buckets.values() for p in ids})
+        signatures: Dict[str, np.ndarray] = {}
+        for i in range(0, len(point_ids), _SQL_IN_LIMIT):
+            query = db.query(ChunkSignature).filter(ChunkSignature.point_id.in_(point_ids[i:i + _SQL_IN_LIMIT]))
+            if exclude_document_id is not None:
+                # replacing a document: its old revision is about to be deleted
+                query = query.filter(ChunkSignature.document_id != exclude_document_id)
+            for row in query.all():
+                signatures[row.point_id] = self._unpack(row.signature)
+        return buckets, signatures
+
+    def plan(
+        self,
+        db: Session,
+        chunks: Sequence[str],
+        pending: Optional[PendingIndex] = None,
+        exclude_document_id: Optional[int] = None,
+        signatures: Optional[np.ndarray] = None,
+        tenant_id: Optional[str] = None,
+        collection: Optional[str] = None,
+    ) -> DedupPlan:
+        """
+        Decide per chunk: keep (embed + store) or link to the most similar
+        canonical chunk with estimated Jaccard >= threshold.
+        Vectors of stored canonical chunks are read from `collection`; a
+        chunk whose canonical point is not there (any more) is kept.
+        """
+        pending = pending if pending is not None else PendingIndex()
+        if signatures is None:
+            signatures = np.stack([self.signature(c) for c in chunks]) if chunks else np.zeros((0, self.num_perm), np.uint32)
+        plan = DedupPlan(signatures, tenant_id)
+
+        keys = [self.band_keys(sig, tenant_id) for sig in signatures]
+        stored_buckets, stored_signatures = self._stored_candidates(
+            db, [k for ks in keys for k in ks], exclude_document_id
+        )
+
+        for idx, (chunk, signature) in enumerate(zip(chunks, signatures)):
+            if not chunk.strip():
+                plan.keep.append(idx)
+                continue
+
+            candidates = set()
+            for key in keys[idx]:
+                candidates.update(p for p in stored_buckets.get(key, ()) if p in stored_signatures)
+                candidates.update(pending.buckets.get(key, ()))
+
+            best, best_score = None, 0.0
+            for ref in candidates:
+                other = stored_signatures[ref] if ref in stored_signatures else pending.signatures[ref]
+                score = self.similarity(signature, other)
+                if score > best_score:
+                    best, best_score = ref, score
+
+            if best is not None and best_score >= self.threshold:
+                plan.duplicates[idx] = (best, best_score)
+            else:
+                plan.keep.append(idx)
+                pending.add((plan.token, idx), signature, keys[idx])
+
+        stored = {ref for ref, _ in plan.duplicates.values() if isinstance(ref, str)}
+        if stored:
+            plan.stored_vectors = _read_vectors(collection, list(stored)) if collection else {}
+            missing = [
+                idx for idx, (ref, _) in plan.duplicates.items() if ref in stored and ref not in plan.stored_vectors
+            ]
+            for idx in missing:
+                del plan.duplicates[idx]
+                plan.keep.append(idx)
+                pending.add((plan.token, idx), signatures[idx], keys[idx])
+            plan.keep.sort()
+
+        DEDUP_CHUNKS.labels("unique").inc(len(plan.keep))
+        DEDUP_CHUNKS.labels("duplicate").inc(len(plan.duplicates))
+        return plan
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def record(
+        self,
+        db: Session,
+        plan: DedupPlan,
+        point_ids: Dict[int, str],
+        payloads: Dict[int, dict],
+        pending: PendingIndex,
+    ):
+        """
+        Persist a plan once its points are upserted (caller commits).
+        `point_ids` maps every chunk index to its Qdrant id; `payloads` holds
+        their payloads (kept with duplicates for promotion).
+        """
+        for idx in plan.keep:
+            pending.point_ids[(plan.token, idx)] = point_ids[idx]
+            payload = payloads[idx]
+            self.add_canonical(
+                db, point_ids[idx], plan.signatures[idx], payload["document_id"], payload.get("revision"), plan.tenant_id
+            )
+
+        for idx, (ref, score) in plan.duplicates.items():
+            payload = payloads[idx]
+            db.add(ChunkDuplicate(
+                document_id=payload["document_id"],
+                revision=payload.get("revision"),
+                chunk_id=payload.get("chunk_id"),
+                point_id=point_ids[idx],
+                canonical_point_id=pending.resolve(ref),
+                similarity=round(score, 4),
+                signature=plan.signatures[idx].tobytes(),
+                payload=json.dumps(payload),
+            ))
+
+    def add_canonical(
+        self,
+        db: Session,
+        point_id: str,
+        signature: np.ndarray,
+        document_id: int,
+        revision: Optional[str],
+        tenant_id: Optional[str] = None,
+    ):
+        db.add(ChunkSignature(
+            point_id=point_id, document_id=document_id, revision=revision, signature=signature.tobytes()
+        ))
+        for key in self.band_keys(signature, tenant_id):
+            db.add(LshBucket(bucket=key, point_id=point_id))
+
+    def remove_document(self, db: Session, document_id: int, keep_revision: Optional[str] = None) -> List[ChunkDuplicate]:
+        """
+        Forget a document's chunks (or only its old revisions). Returns the
+        other documents' duplicates whose canonical chunk was removed; they
+        are detached and must be promoted by the caller (caller commits).
+        """
+        sig_query = db.query(ChunkSignature).filter(ChunkSignature.document_id == document_id)
+        dup_query = db.query(ChunkDuplicate).filter(ChunkDuplicate.document_id == document_id)
+        if keep_revision is not None:
+            sig_query = sig_query.filter(ChunkSignature.revision != keep_revision)
+            dup_query = dup_query.filter(ChunkDuplicate.revision != keep_revision)
+
+        removed = [row.point_id for row in sig_query.all()]
+        dup_query.delete(synchronize_session=False)
+
+        orphans: List[ChunkDuplicate] = []
+        for i in range(0, len(removed), _SQL_IN_LIMIT):
+            batch = removed[i:i + _SQL_IN_LIMIT]
+            db.query(LshBucket).filter(LshBucket.point_id.in_(batch)).delete(synchronize_session=False)
+            orphans.extend(db.query(ChunkDuplicate).filter(ChunkDuplicate.canonical_point_id.in_(batch)).all())
+        sig_query.delete(synchronize_session=False)
+
+        for orphan in orphans:
+            db.delete(orphan)
+        return orphans
+
+    def stats(self, db: Session) -> Dict:
+        canonical = db.query(func.count(ChunkSignature.point_id)).scalar() or 0
+        duplicates = db.query(func.count(ChunkDuplicate.id)).scalar() or 0
+        total = canonical + duplicates
+        return {
+            "canonical_chunks": canonical,
+            "duplicate_chunks": duplicates,
+            "duplicate_ratio": round(duplicates / total, 4) if total else 0.0,
+            "embeddings_saved": duplicates,
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+        }
+
+
+dedup_index = DedupIndex()
+
+
+def _read_vectors(collection: str, point_ids: Sequence[str]) -> Dict[str, Sequence[float]]:
+    vectors = {}
+    for i in range(0, len(point_ids), _SQL_IN_LIMIT):
+        records = client.retrieve(
+            collection_name=collection, ids=list(point_ids[i:i + _SQL_IN_LIMIT]), with_vectors=True, with_payload=False
+        )
+        vectors.update((str(r.id), r.vector) for r in records if r.vector is not None)
+    return vectors
+
+
+def _append_vector_ids(db: Session, added: Dict[int, List[str]]):
+    for doc in db.query(Document).filter(Document.id.in_(list(added))).all():
+        doc.vector_ids = json.dumps(json.loads(doc.vector_ids or "[]") + added[doc.id])
+
+
+def promote_orphans(
+    db: Session,
+    orphans: Sequence[ChunkDuplicate],
+    collection: str,
+    model_id: str,
+):
+    """
+    Duplicates whose canonical chunk was deleted get their own vector again.
+    They are re-checked against the index first (and each other), so a
+    group of identical orphans ends up as one new canonical chunk.
+    """
+    if not orphans:
+        return
+    db.flush()   # the caller's freshly recorded chunks must be visible as candidates
+
+    payloads = [json.loads(o.payload) for o in orphans]
+    texts = [p.get("chunk") or "" for p in payloads]
+    signatures = np.stack([DedupIndex._unpack(o.signature) for o in orphans])
+
+    # A canonical chunk only ever has duplicates from its own tenant
+    pending = PendingIndex()
+    plan = dedup_index.plan(
+        db, texts, pending=pending, signatures=signatures, tenant_id=payloads[0].get("tenant_id"), collection=collection
+    )
+    if plan.keep:
+        pending.set_vectors(
+            plan, generate_embeddings([texts[i] for i in plan.keep], use_cache=False, model_id=model_id)
+        )
+
+    # Duplicates recorded before they were stored as points get one now
+    point_ids = {idx: o.point_id or str(uuid.uuid4()) for idx, o in enumerate(orphans)}
+    upsert_vectors(collection, [
+        qdrant_models.PointStruct(id=point_ids[idx], vector=vector, payload=payloads[idx])
+        for idx, vector in enumerate(plan.chunk_vectors(pending))
+    ])
+    dedup_index.record(db, plan, point_ids, dict(enumerate(payloads)), pending)
+
+    added = defaultdict(list)
+    for idx, orphan in enumerate(orphans):
+        if not orphan.point_id:
+            added[payloads[idx]["document_id"]].append(point_ids[idx])
+    _append_vector_ids(db, added)
+
+
+def materialize_duplicates(db: Session, collection: str) -> int:
+    """
+    Duplicates recorded before they were stored as points (only linked to
+    their canonical chunk) get a point of their own in `collection`, with
+    the canonical vector, so scoped searches and re-indexing see them.
+    Those whose canonical chunk is not in `collection` are left alone
+    (caller commits). Returns the number of points written.
+    """
+    rows = db.query(ChunkDuplicate).filter(ChunkDuplicate.point_id.is_(None)).all()
+    vectors = _read_vectors(collection, list({row.canonical_point_id for row in rows}))
+
+    points = []
+    added = defaultdict(list)
+    for row in rows:
+        vector = vectors.get(row.canonical_point_id)
+        if vector is None:
+            continue
+        row.point_id = str(uuid.uuid4())
+        points.append(qdrant_models.PointStruct(id=row.point_id, vector=vector, payload=json.loads(row.payload)))
+        added[row.document_id].append(row.point_id)
+
+    for i in range(0, len(points), _SQL_IN_LIMIT):
+        upsert_vectors(collection, points[i:i + _SQL_IN_LIMIT])
+    _append_vector_ids(db, added)
+    return len(points)
@@ -0,0 +1,180 @@
+# app/services/document_index.py
+"""
+Document-level vectors for two-stage (hierarchical) retrieval.
+
+Every chunk collection gets a small sibling collection `<collection>_docs`
+with one point per document: the normalized mean of its chunk embeddings.
+Hierarchical search picks the top documents there, then searches chunks
+only within them (payload-filtered on the indexed document_id).
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from qdrant_client.http import models
+
+from app.services.vector_db import client, create_payload_indexes
+from app.utils.config import REINDEX_SCROLL_PAGE
+
+DOC_COLLECTION_SUFFIX = "_docs"
+
+
+def doc_collection(collection: str) -> str:
+    return f"{collection}{DOC_COLLECTION_SUFFIX}"
+
+
+def ensure_doc_collection(collection: str, size: int) -> str:
+    name = doc_collection(collection)
+    if not client.collection_exists(name):
+        client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=size, distance=models.Distance.COSINE),
+        )
+        create_payload_indexes(name)
+    return name
+
+
+def drop_doc_collection(collection: str):
+    name = doc_collection(collection)
+    if client.collection_exists(name):
+        client.delete_collection(name)
+
+
+def mean_vector(vectors: Sequence[Sequence[float]]) -> Optional[List[float]]:
+    if len(vectors) == 0:
+        return None
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
+
+
+def doc_payload(
+    document_id: int,
+    filename: Optional[str],
+    revision: Optional[str],
+    tags: Optional[List[str]],
+    chunks: int,
+    tenant_id: Optional[str] = None,
+) -> Dict:
+    payload = {
+        "document_id": document_id,
+        "filename": filename,
+        "revision": revision,
+        "tags": tags or [],
+        "chunks": chunks,
+    }
+    if tenant_id:
+        payload["tenant_id"] = tenant_id
+    return payload
+
+
+def upsert_document_vectors(collection: str, size: int, entries: List[models.PointStruct]):
+    """
+    `entries` are points with id = document_id (one per document).
+    """
+    if entries:
+        client.upsert(collection_name=ensure_doc_collection(collection, size), points=entries)
+
+
+def upsert_document_vector(
+    collection: str,
+    document_id: int,
+    vectors: Sequence[Sequence[float]],
+    payload: Dict,
+):
+    vector = mean_vector(vectors)
+    if vector is None:
+        return
+    upsert_document_vectors(collection, len(vector), [
+        models.PointStruct(id=document_id, vector=vector, payload=payload)
+    ])
+
+
+def delete_document_vector(collection: str, document_id: int):
+    name = doc_collection(collection)
+    if client.collection_exists(name):
+        client.delete(collection_name=name, points_selector=models.PointIdsList(points=[document_id]))
+
+
+def search_documents(
+    collection: str,
+    vector: List[float],
+    limit: int,
+    query_filter: Optional[models.Filter] = None,
+    search_params: Optional[models.SearchParams] = None,
+) -> Optional[List[int]]:
+    """
+    Ids of the `limit` best documents, or None when the collection has no
+    document index yet (callers fall back to a flat search).
+    """
+    name = doc_collection(collection)
+    if not client.collection_exists(name):
+        return None
+    results = client.search(
+        collection_name=name, query_vector=vector, query_filter=query_filter, limit=limit, search_params=search_params
+    )
+    return [int(hit.id) for hit in results]
+
+
+def rebuild_document_index(collection: str, batch_size: int = 256) -> int:
+    """
+    Backfill: one scroll over the chunk collection (vectors included),
+    averaged per document. Document vectors are overwritten in place, then
+    those of documents no longer present are deleted, so searches keep
+    working during a rebuild. Returns the number of documents indexed.
+    """
+    sums: Dict[int, np.ndarray] = {}
+    counts: Dict[int, int] = defaultdict(int)
+    payloads: Dict[int, Dict] = {}
+
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=REINDEX_SCROLL_PAGE,
+            offset=offset,
+            with_payload=["document_id", "filename", "revision", "tags", "tenant_id"],
+            with_vectors=True,
+        )
+        for point in points:
+            payload = point.payload or {}
+            document_id = payload.get("document_id")
+            if document_id is None or point.vector is None:
+                continue
+            if document_id not in sums:
+                sums[document_id] = np.zeros(len(point.vector), dtype=np.float32)
+                payloads[document_id] = payload
+            sums[document_id] += np.asarray(point.vector, dtype=np.float32)
+            counts[document_id] += 1
+        if offset is None:
+            break
+
+    size = client.get_collection(collection).config.params.vectors.size
+    name = ensure_doc_collection(collection, size)
+    entries = []
+    for document_id, total in sums.items():
+        p = payloads[document_id]
+        entries.append(models.PointStruct(
+            id=document_id,
+            vector=mean_vector([total]),
+            payload=doc_payload(
+                document_id, p.get("filename"), p.get("revision"), p.get("tags"), counts[document_id],
+                p.get("tenant_id"),
+            ),
+        ))
+        if len(entries) >= batch_size:
+            upsert_document_vectors(collection, size, entries)
+            entries = []
+    upsert_document_vectors(collection, size, entries)
+
+    stale, offset = [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=name, limit=REINDEX_SCROLL_PAGE, offset=offset, with_payload=False, with_vectors=False
+        )
+        stale.extend(p.id for p in points if int(p.id) not in sums)
+        if offset is None:
+            break
+    if stale:
+        client.delete(collection_name=name, points_selector=models.PointIdsList(points=stale))
+    return len(sums)
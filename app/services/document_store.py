@@ -0,0 +1,83 @@
+# app/services/document_store.py
+import os
+import shutil
+import threading
+from typing import Optional
+
+from app.utils.config import DOCUMENT_TEXT_CACHE_SIZE, DOCUMENT_TEXT_DIR
+from app.utils.lru_cache import LRUCache
+
+
+class DocumentTextStore:
+    """
+    Extracted text of every document revision on disk:
+    <root>/<document_id>/<revision>.txt.
+
+    Chunk payloads only hold character offsets into it, so parent sections
+    (small-to-big retrieval) are sliced from here instead of being copied
+    into Qdrant, and a re-chunking reindex can start from the source text.
+    Recently read documents stay in an in-process LRU.
+    """
+
+    def __init__(self, root: str = DOCUMENT_TEXT_DIR, cache_size: int = DOCUMENT_TEXT_CACHE_SIZE):
+        self.root = root
+        self._cache = LRUCache(maxsize=max(1, cache_size))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _dir(self, document_id: int) -> str:
+        return os.path.join(self.root, str(document_id))
+
+    def _path(self, document_id: int, revision: str) -> str:
+        return os.path.join(self._dir(document_id), f"{revision}.txt")
+
+    def save(self, document_id: int, revision: str, text: str):
+        if not self.enabled:
+            return
+        os.makedirs(self._dir(document_id), exist_ok=True)
+        path = self._path(document_id, revision)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp_path, path)
+
+    def load(self, document_id: int, revision: Optional[str]) -> Optional[str]:
+        if not self.enabled or document_id is None or not revision:
+            return None
+        key = (document_id, revision)
+        text = self._cache.get(key)
+        if text is not None:
+            return text
+        try:
+            with open(self._path(document_id, revision), "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except FileNotFoundError:
+            return None
+        self._cache.set(key, text)
+        return text
+
+    def prune(self, document_id: int, keep_revision: str):
+        """
+        Drop the text of older revisions once a replacement is live.
+        """
+        if not self.enabled:
+            return
+        try:
+            names = os.listdir(self._dir(document_id))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name != f"{keep_revision}.txt":
+                try:
+                    os.remove(os.path.join(self._dir(document_id), name))
+                except FileNotFoundError:
+                    pass
+
+    def delete(self, document_id: int):
+        if self.enabled:
+            shutil.rmtree(self._dir(document_id), ignore_errors=True)
+
+
+document_text_store = DocumentTextStore()
@@ -1,12 +1,78 @@
 # app/services/embedding.py
+import threading
+from typing import Dict, List, Optional
+
 from sentence_transformers import SentenceTransformer
-from typing import List
+
+from app.services.embedding_cache import EmbeddingCache
+from app.utils.config import EMBEDDING_CACHE_CASE_FOLD, EMBEDDING_MODEL
+
+MODEL_ID = EMBEDDING_MODEL
+
+
+def _case_fold(encoder: SentenceTransformer) -> bool:
+    """
+    Whether queries differing only in case embed identically (uncased tokenizer).
+    """
+    if EMBEDDING_CACHE_CASE_FOLD in ("true", "false"):
+        return EMBEDDING_CACHE_CASE_FOLD == "true"
+    return bool(getattr(getattr(encoder, "tokenizer", None), "do_lower_case", False))
+
 
 # Load the embedding model once
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = SentenceTransformer(MODEL_ID)
+
+# Shared query-embedding cache (document chunks bypass it)
+embedding_cache = EmbeddingCache(MODEL_ID, lowercase=_case_fold(model))
 
-def generate_embeddings(chunks: List[str]) -> List[List[float]]:
+# Other models are loaded on demand (a re-index to a new model, or a live
+# collection that was built with one)
+_models: Dict[str, SentenceTransformer] = {MODEL_ID: model}
+_caches: Dict[str, EmbeddingCache] = {MODEL_ID: embedding_cache}
+_models_lock = threading.Lock()
+
+
+def get_model(model_id: Optional[str] = None) -> SentenceTransformer:
+    model_id = model_id or MODEL_ID
+    if model_id not in _models:
+        with _models_lock:
+            if model_id not in _models:
+                encoder = SentenceTransformer(model_id)
+                _caches[model_id] = EmbeddingCache(model_id, lowercase=_case_fold(encoder))
+                _models[model_id] = encoder
+    return _models[model_id]
+
+
+def vector_size(model_id: Optional[str] = None) -> int:
+    return get_model(model_id).get_sentence_embedding_dimension()
+
+
+def generate_embeddings(
+    chunks: List[str],
+    use_cache: bool = True,
+    batch_size: int = 32,
+    model_id: Optional[str] = None,
+) -> List[List[float]]:
     """
     Generate embeddings for a list of text chunks.
+    With use_cache, cached vectors (in-process or Redis) are reused and only
+    the misses go through the model. Ingestion passes use_cache=False.
     """
-    return model.encode(chunks).tolist()
+    encoder = get_model(model_id)
+    if not use_cache or not chunks:
+        return encoder.encode(chunks, batch_size=batch_size).tolist()
+
+    cache = _caches[model_id or MODEL_ID]
+    vectors = cache.get_many(chunks)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        texts = [chunks[i] for i in missing]
+        encoded = encoder.encode(texts, batch_size=batch_size).tolist()
+        cache.set_many(texts, encoded)
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+    return vectors
+
+
+def embed_query(query: str, model_id: Optional[str] = None) -> List[float]:
+    return generate_embeddings([query], model_id=model_id)[0]
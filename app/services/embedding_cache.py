@@ -0,0 +1,150 @@
+# app/services/embedding_cache.py
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.config import (
+    BREAKER_REDIS_SLOW_MS,
+    EMBEDDING_CACHE_REDIS,
+    EMBEDDING_CACHE_REDIS_TTL,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+)
+from app.utils.lru_cache import LRUCache
+from app.utils.metrics import EMBEDDING_CACHE_BYTES, EMBEDDING_CACHE_LOOKUPS, EMBEDDING_CACHE_REDIS_BYTES
+from app.utils.redis_client import get_redis_binary_client
+
+logger = logging.getLogger("embedding_cache")
+
+# Shared by every model's cache; while open the Redis tier is skipped
+redis_tier_breaker = get_breaker("redis_embedding_cache", BREAKER_REDIS_SLOW_MS)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str, lowercase: bool = False) -> str:
+    # Spacing never changes the vector; case only doesn't for uncased tokenizers
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text.lower() if lowercase else text
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def unpack_vector(raw: bytes) -> List[float]:
+    return np.frombuffer(raw, dtype=np.float32).tolist()
+
+
+class EmbeddingCache:
+    """
+    Query embedding cache keyed by sha1(model id + normalized text, lower-cased
+    only when `lowercase`, i.e. the model is uncased):
+      1) in-process LRU of packed float32 bytes (per worker)
+      2) Redis, same packed bytes with a TTL (shared by all workers), behind
+         its own circuit breaker so a down Redis costs no timeouts
+    Misses are encoded by the caller and written back with `set_many`.
+    """
+
+    def __init__(self, model_id: str, lowercase: bool = False):
+        self.model_id = model_id
+        self.lowercase = lowercase
+        self.local = LRUCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+        self.use_redis = EMBEDDING_CACHE_REDIS
+        self._entry_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_bytes_written": 0}
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(f"{self.model_id}\x00{normalize_query(text, self.lowercase)}".encode("utf-8")).hexdigest()
+        return f"emb:{digest}"
+
+    def _count(self, name: str, amount: int = 1):
+        if amount:
+            with self._lock:
+                self._stats[name] += amount
+
+    def _local_bytes(self) -> int:
+        # every vector of one model packs to the same size
+        return len(self.local) * self._entry_bytes
+
+    def _set_local(self, key: str, raw: bytes):
+        self._entry_bytes = len(raw)
+        self.local.set(key, raw)
+        EMBEDDING_CACHE_BYTES.labels(self.model_id).set(self._local_bytes())
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Cached vector per text, None where neither tier has it.
+        """
+        keys = [self.key(t) for t in texts]
+        found: List[Optional[bytes]] = [self.local.get(k) for k in keys]
+        local_hits = sum(1 for raw in found if raw is not None)
+
+        missing = [i for i, raw in enumerate(found) if raw is None]
+        redis_hits = 0
+        if missing and self.use_redis:
+            try:
+                values = redis_tier_breaker.call(get_redis_binary_client().mget, [keys[i] for i in missing])
+                for i, raw in zip(missing, values):
+                    if raw is not None:
+                        found[i] = raw
+                        self._set_local(keys[i], raw)
+                        redis_hits += 1
+            except CircuitOpenError:
+                pass
+            except Exception:
+                logger.warning("Redis embedding cache read failed", exc_info=True)
+
+        misses = len(texts) - local_hits - redis_hits
+        self._count("local_hits", local_hits)
+        self._count("redis_hits", redis_hits)
+        self._count("misses", misses)
+        EMBEDDING_CACHE_LOOKUPS.labels("local").inc(local_hits)
+        EMBEDDING_CACHE_LOOKUPS.labels("redis").inc(redis_hits)
+        EMBEDDING_CACHE_LOOKUPS.labels("miss").inc(misses)
+
+        return [unpack_vector(raw) if raw is not None else None for raw in found]
+
+    def set_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        packed = [(self.key(t), pack_vector(v)) for t, v in zip(texts, vectors)]
+        for key, raw in packed:
+            self._set_local(key, raw)
+
+        if self.use_redis and packed:
+            try:
+                redis_tier_breaker.call(self._write_redis, packed)
+                written = sum(len(raw) for _, raw in packed)
+                self._count("redis_bytes_written", written)
+                EMBEDDING_CACHE_REDIS_BYTES.inc(written)
+            except CircuitOpenError:
+                pass
+            except Exception:
+                logger.warning("Redis embedding cache write failed", exc_info=True)
+
+    @staticmethod
+    def _write_redis(packed: List[tuple]):
+        pipe = get_redis_binary_client().pipeline(transaction=False)
+        for key, raw in packed:
+            pipe.set(key, raw, ex=EMBEDDING_CACHE_REDIS_TTL)
+        pipe.execute()
+
+    def clear_local(self):
+        self.local.clear()
+        EMBEDDING_CACHE_BYTES.labels(self.model_id).set(0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        stats["local_bytes"] = self._local_bytes()
+        stats["model_id"] = self.model_id
+        stats["redis"] = self.use_redis
+        return stats
@@ -0,0 +1,178 @@
+# app/services/index_versions.py
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client.http import models
+
+from app.db.database import SessionLocal
+from app.db.models import CollectionVersion
+from app.services.document_index import ensure_doc_collection
+from app.services.vector_db import DOCUMENTS_COLLECTION, client, create_payload_indexes, hnsw_config
+from app.utils.config import DOCUMENTS_ALIAS, EMBEDDING_MODEL, INDEX_ALIAS_CACHE_TTL
+from app.utils.lru_cache import LRUCache
+
+# alias -> (collection, model_id) or _NO_ALIAS; short TTL so every worker follows a swap quickly
+_live_cache = LRUCache(maxsize=1024, ttl=INDEX_ALIAS_CACHE_TTL)
+_NO_ALIAS = ("", "")
+
+
+def new_collection_name(base: str = DOCUMENTS_COLLECTION) -> str:
+    return f"{base}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def get_alias_target(alias: str = DOCUMENTS_ALIAS) -> Optional[str]:
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def _set_status(name: str, status: str, **fields):
+    db = SessionLocal()
+    try:
+        row = db.query(CollectionVersion).filter(CollectionVersion.name == name).first()
+        if row is None:
+            return
+        row.status = status
+        for key, value in fields.items():
+            setattr(row, key, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def collection_model_id(name: str) -> str:
+    """
+    Model a collection was embedded with; unregistered (legacy) collections
+    were built with the default model.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(CollectionVersion).filter(CollectionVersion.name == name).first()
+        return row.model_id if row and row.model_id else EMBEDDING_MODEL
+    finally:
+        db.close()
+
+
+def create_versioned_collection(
+    name: str,
+    model_id: str,
+    size: int,
+    chunk_strategy: Optional[str] = None,
+    status: str = "building",
+):
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=size, distance=models.Distance.COSINE),
+        hnsw_config=hnsw_config(),
+    )
+    create_payload_indexes(name)
+    ensure_doc_collection(name, size)
+
+    db = SessionLocal()
+    try:
+        db.merge(CollectionVersion(
+            name=name,
+            model_id=model_id,
+            vector_size=size,
+            chunk_strategy=chunk_strategy,
+            status=status,
+            points=0,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def swap_alias(collection_name: str, alias: str = DOCUMENTS_ALIAS) -> Optional[str]:
+    """
+    Point `alias` at `collection_name` in one atomic alias update.
+    Returns the previous target.
+    """
+    previous = get_alias_target(alias)
+    operations = []
+    if previous:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+    if previous and previous != collection_name:
+        _set_status(previous, "retired")
+    _set_status(collection_name, "live")
+    _live_cache.clear()
+    return previous
+
+
+def ensure_documents_alias(alias: str = DOCUMENTS_ALIAS) -> str:
+    """
+    Startup: make sure the alias exists. Existing deployments get it pointed
+    at the legacy `documents` collection; fresh ones get that collection created.
+    """
+    target = get_alias_target(alias)
+    if target:
+        return target
+
+    if not client.collection_exists(DOCUMENTS_COLLECTION):
+        from app.services.embedding import MODEL_ID, vector_size
+
+        create_versioned_collection(DOCUMENTS_COLLECTION, MODEL_ID, vector_size(MODEL_ID), status="live")
+
+    swap_alias(DOCUMENTS_COLLECTION, alias)
+    return DOCUMENTS_COLLECTION
+
+
+def live_index(alias: str = DOCUMENTS_ALIAS) -> Tuple[str, str]:
+    """
+    (physical collection, model id) behind the alias, cached for
+    INDEX_ALIAS_CACHE_TTL seconds.
+
+    Callers search / write the physical collection, not the alias, so the
+    vector they embed always matches the collection even while the alias
+    is being swapped. A swapped-out collection is kept for at least one TTL.
+    """
+    cached = _live_cache.get(alias)
+    if cached is not None:
+        return cached
+
+    collection = get_alias_target(alias) or ensure_documents_alias(alias)
+    live = (collection, collection_model_id(collection))
+    _live_cache.set(alias, live)
+    return live
+
+
+def resolve_alias(alias: str) -> Optional[Tuple[str, str]]:
+    """
+    Like live_index, for aliases that may not exist (tenant collections):
+    None when missing, and that answer is cached for the same TTL too.
+    """
+    cached = _live_cache.get(alias)
+    if cached is not None:
+        return None if cached == _NO_ALIAS else cached
+
+    collection = get_alias_target(alias)
+    resolved = (collection, collection_model_id(collection)) if collection else _NO_ALIAS
+    _live_cache.set(alias, resolved)
+    return None if resolved == _NO_ALIAS else resolved
+
+
+def list_versions() -> List[Dict]:
+    db = SessionLocal()
+    try:
+        rows = db.query(CollectionVersion).order_by(CollectionVersion.created_at.desc()).all()
+        return [
+            {
+                "name": r.name,
+                "model_id": r.model_id,
+                "vector_size": r.vector_size,
+                "chunk_strategy": r.chunk_strategy,
+                "status": r.status,
+                "points": r.points,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,274 @@
+# app/services/ingestion.py
+import json
+import uuid
+from typing import List, Optional, Tuple
+
+from qdrant_client.http import models as qdrant_models
+from sqlalchemy.orm import Session
+
+from app.db.models import Document
+from app.services.chunking import Span, chunk_layout, chunk_text
+from app.services.dedup import PendingIndex, dedup_index, promote_orphans
+from app.services.document_index import delete_document_vector, doc_payload, upsert_document_vector
+from app.services.document_store import document_text_store
+from app.services.embedding import generate_embeddings
+from app.services.pdf_extraction import file_sha256
+from app.services.text_extraction import extract_text_from_pdf, extract_text_from_txt
+from app.services.tenants import route
+from app.services.vector_db import chunk_payload, delete_document_vectors, upsert_vectors
+from app.utils.config import DEDUP_ENABLED
+from app.utils.metrics import stage_timer, INGESTION_CHUNKS
+
+UPLOAD_DIR = "uploaded_docs"
+
+
+class IngestionError(Exception):
+    """
+    Raised by the ingestion pipeline; carries the HTTP status the API should return.
+    """
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def extract_text(file_path: str, filename: str) -> Tuple[str, str]:
+    filename_lower = filename.lower()
+    if filename_lower.endswith(".pdf"):
+        return extract_text_from_pdf(file_path), "pdf"
+    if filename_lower.endswith(".txt"):
+        return extract_text_from_txt(file_path), "txt"
+    raise IngestionError("Unsupported file type. Only .pdf and .txt allowed.")
+
+
+def build_points(
+    chunks: List[str],
+    embeddings: List[List[float]],
+    filename: str,
+    document_id: int,
+    revision: str,
+    tags: Optional[List[str]] = None,
+    spans: Optional[List[Span]] = None,
+    parents: Optional[List[Span]] = None,
+    tenant_id: Optional[str] = None,
+) -> Tuple[List[qdrant_models.PointStruct], List[str]]:
+    """
+    Qdrant points (and their ids) for one document revision.
+    `spans` are the chunks' character offsets in the extracted text and
+    `parents` those of their parent sections (small_to_big).
+    """
+    points: List[qdrant_models.PointStruct] = []
+    vector_ids: List[str] = []
+
+    for idx, (chunk, vector) in enumerate(zip(chunks, embeddings)):
+        vector_id = str(uuid.uuid4())
+        vector_ids.append(vector_id)
+
+        points.append(
+            qdrant_models.PointStruct(
+                id=vector_id,
+                vector=vector,
+                payload=chunk_payload(
+                    chunk, filename, idx, document_id, revision, tags,
+                    span=spans[idx] if spans else None,
+                    parent=parents[idx] if parents else None,
+                    tenant_id=tenant_id,
+                ),
+            )
+        )
+
+    return points, vector_ids
+
+
+def ingest_document(
+    db: Session,
+    file_path: str,
+    filename: str,
+    chunk_strategy: str,
+    document: Optional[Document] = None,
+    tags: Optional[List[str]] = None,
+    tenant_id: Optional[str] = None,
+) -> dict:
+    """
+    Extract -> chunk -> dedup -> embed -> upsert -> document vector ->
+    persist metadata.
+    Vectors go to the tenant's collection (see app/services/tenants.py);
+    a replaced document keeps the tenant it was created with.
+    Near-duplicates of chunks already in the corpus (or earlier in this
+    document) are linked to that canonical chunk instead of being embedded:
+    their points reuse its vector.
+    The document vector (mean of all its chunk vectors) feeds hierarchical search.
+    When `document` is given its content is replaced in place: the new
+    revision is upserted first, then older points are filter-deleted, so
+    the document never disappears from search.
+    """
+    with stage_timer("ingestion", "extract"):
+        text, filetype = extract_text(file_path, filename)
+    if not text or not text.strip():
+        raise IngestionError("No readable text found in document.")
+
+    with stage_timer("ingestion", "chunk"):
+        spans, parents = chunk_layout(text, chunk_strategy)
+        chunks = chunk_text(text, chunk_strategy, spans)
+    if not chunks:
+        raise IngestionError("Chunking produced 0 chunks. Document may be empty.")
+
+    # Write to the tenant's collection (behind its alias), with the model it was built with
+    if document is not None:
+        tenant_id = document.tenant_id
+    tenant_route = route(tenant_id)
+    collection, model_id = tenant_route.collection, tenant_route.model_id
+
+    pending = PendingIndex()
+    plan = None
+    keep = list(range(len(chunks)))
+    if DEDUP_ENABLED:
+        with stage_timer("ingestion", "dedup"):
+            plan = dedup_index.plan(
+                db, chunks, pending,
+                exclude_document_id=document.id if document is not None else None,
+                tenant_id=tenant_id,
+                collection=collection,
+            )
+        keep = plan.keep
+
+    try:
+        with stage_timer("ingestion", "embed"):
+            embeddings = generate_embeddings([chunks[i] for i in keep], use_cache=False, model_id=model_id)
+    except Exception as e:
+        raise IngestionError(f"Embedding generation failed: {e}", status_code=500)
+
+    if len(embeddings) != len(keep):
+        raise IngestionError("Embedding count mismatch with chunks.", status_code=500)
+
+    vectors = embeddings
+    if plan is not None:
+        pending.set_vectors(plan, embeddings)
+        vectors = plan.chunk_vectors(pending)
+
+    # Create the DB entry first so we have an id (replacements keep theirs)
+    doc = document
+    if doc is None:
+        doc = Document(
+            filename=filename,
+            filetype=filetype,
+            chunk_strategy=chunk_strategy,
+            number_of_chunks=len(chunks),
+            vector_ids="[]",
+            tenant_id=tenant_id,
+        )
+        db.add(doc)
+        db.commit()
+        db.refresh(doc)
+
+    revision = uuid.uuid4().hex
+    points, vector_ids = build_points(
+        chunks, vectors, filename, doc.id, revision, tags, spans=spans, parents=parents, tenant_id=tenant_id,
+    )
+
+    # Offsets in the payloads point into this revision's text
+    document_text_store.save(doc.id, revision, text)
+
+    try:
+        with stage_timer("ingestion", "upsert"):
+            if points:
+                upsert_vectors(collection_name=collection, points=points)
+            if document is not None:
+                delete_document_vectors(doc.id, collection_name=collection, exclude_revision=revision)
+    except Exception as e:
+        # If upsert fails, keep DB entry but inform user
+        raise IngestionError(f"Qdrant upsert failed: {e}", status_code=500)
+
+    try:
+        orphans = dedup_index.remove_document(db, doc.id, keep_revision=revision) if document is not None else []
+        if plan is not None:
+            dedup_index.record(
+                db,
+                plan,
+                dict(enumerate(vector_ids)),
+                {
+                    i: chunk_payload(
+                        c, filename, i, doc.id, revision, tags,
+                        span=spans[i], parent=parents[i] if parents else None, tenant_id=tenant_id,
+                    )
+                    for i, c in enumerate(chunks)
+                },
+                pending,
+            )
+        promote_orphans(db, orphans, collection, model_id)
+    except Exception as e:
+        db.rollback()
+        raise IngestionError(f"Duplicate index update failed: {e}", status_code=500)
+
+    try:
+        with stage_timer("ingestion", "doc_vector"):
+            upsert_document_vector(
+                collection,
+                doc.id,
+                vectors,
+                doc_payload(doc.id, filename, revision, tags, len(chunks), tenant_id),
+            )
+    except Exception as e:
+        db.rollback()
+        raise IngestionError(f"Document vector upsert failed: {e}", status_code=500)
+
+    INGESTION_CHUNKS.labels(chunk_strategy).observe(len(chunks))
+
+    doc.filename = filename
+    doc.filetype = filetype
+    doc.chunk_strategy = chunk_strategy
+    doc.number_of_chunks = len(chunks)
+    doc.vector_ids = json.dumps(vector_ids)
+    doc.content_hash = file_sha256(file_path)
+    db.add(doc)
+    db.commit()
+    db.refresh(doc)
+
+    if document is not None:
+        document_text_store.prune(doc.id, keep_revision=revision)
+
+    return {
+        "document_id": doc.id,
+        "filename": doc.filename,
+        "filetype": doc.filetype,
+        "chunk_strategy": doc.chunk_strategy,
+        "total_chunks": doc.number_of_chunks,
+        "duplicate_chunks": len(plan.duplicates) if plan is not None else 0,
+        "tags": tags or [],
+        "tenant_id": doc.tenant_id,
+        "vector_ids": vector_ids,
+    }
+
+
+def parse_tags(raw: Optional[str]) -> List[str]:
+    """
+    "a, b,,c" -> ["a", "b", "c"]
+    """
+    if not raw:
+        return []
+    return [t.strip() for t in raw.split(",") if t.strip()]
+
+
+def delete_document(db: Session, document: Document) -> dict:
+    """
+    Remove a document's vectors (one filter-delete) and its SQLite row.
+    Vectors go first so a failed Qdrant call leaves the row for a retry.
+    """
+    document_id = document.id
+    filename = document.filename
+
+    tenant_route = route(document.tenant_id)
+    collection, model_id = tenant_route.collection, tenant_route.model_id
+    delete_document_vectors(document_id, collection_name=collection)
+    delete_document_vector(collection, document_id)
+    document_text_store.delete(document_id)
+
+    # Other documents' duplicates that pointed at this document's chunks become real points
+    orphans = dedup_index.remove_document(db, document_id)
+    promote_orphans(db, orphans, collection, model_id)
+
+    db.delete(document)
+    db.commit()
+
+    return {"status": "deleted", "document_id": document_id, "filename": filename}
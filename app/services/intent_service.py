@@ -1,19 +1,133 @@
 # app/services/intent_service.py
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.config import INTENT_EMBEDDINGS, INTENT_SIM_THRESHOLD
+
+GREETING = "greeting"
+SMALL_TALK = "small_talk"
+INTERVIEW_BOOKING = "interview_booking"
+DOCUMENT_QUERY = "document_query"
+GENERAL_QUERY = "general_query"
+
+# Messages that are *only* a greeting / small talk (whole-message match),
+# so "hi, what does the pdf say about X?" still goes to retrieval.
+_CHITCHAT_PATTERNS = {
+    GREETING: r"(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening))( there)?",
+    SMALL_TALK: (
+        r"(thanks|thank you|thx|ok|okay|cool|great|nice|bye|goodbye|see you|"
+        r"how are you( doing)?|what'?s up|who are you|are you there)"
+    ),
+}
+
+# Searched anywhere in the message; earlier entries win.
+_TOPIC_PATTERNS = {
+    INTERVIEW_BOOKING: (
+        r"\b(book|schedule|reschedule|set up|arrange)\b.{0,40}?\b(interview|meeting|call|appointment|slot)s?\b"
+        r"|\binterview (slot|booking|appointment)s?\b"
+    ),
+    DOCUMENT_QUERY: r"\b(documents?|pdfs?|files?|content|uploaded|excerpts?)\b",
+}
+
+# One compiled alternation per family: a single regex pass classifies a message.
+_CHITCHAT_RE = re.compile(
+    r"^\s*(?:" + "|".join(f"(?P<{name}>{pat})" for name, pat in _CHITCHAT_PATTERNS.items()) + r")[\s!.?,:)]*$",
+    re.IGNORECASE,
+)
+_TOPIC_RE = re.compile(
+    "|".join(f"(?P<{name}>{pat})" for name, pat in _TOPIC_PATTERNS.items()),
+    re.IGNORECASE,
+)
+_TOPIC_PRIORITY = list(_TOPIC_PATTERNS)
+
+# Example phrases per intent for the optional embedding fallback
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    GREETING: ["hello there", "hi, good morning", "hey, nice to meet you"],
+    SMALL_TALK: ["thanks a lot", "how is your day going", "that's all, goodbye"],
+    INTERVIEW_BOOKING: [
+        "I'd like to set up a meeting with the recruiter",
+        "can I get a slot next tuesday at 3pm",
+        "please reserve a time for my interview",
+    ],
+    DOCUMENT_QUERY: [
+        "what does the uploaded report say about revenue",
+        "summarize the attached paper",
+        "find the section about warranty in the manual",
+    ],
+}
+
 
 class IntentService:
+    """
+    Fast intent classifier for routing /conversate:
+      1) precompiled multi-pattern regex (microseconds, no model call)
+      2) optional: cosine similarity against cached intent centroids,
+         only when the regex has no opinion and a query embedding exists
+    """
+
+    _centroids: Optional[Tuple[List[str], np.ndarray]] = None
+    _centroid_lock = threading.Lock()
 
     @staticmethod
-    def detect_intent(user_message: str):
-        text = user_message.lower()
+    def match_patterns(user_message: str) -> Optional[str]:
+        chitchat = _CHITCHAT_RE.match(user_message)
+        if chitchat:
+            return chitchat.lastgroup
+
+        found = {m.lastgroup for m in _TOPIC_RE.finditer(user_message)}
+        for intent in _TOPIC_PRIORITY:
+            if intent in found:
+                return intent
+        return None
+
+    @classmethod
+    def centroids(cls) -> Tuple[List[str], np.ndarray]:
+        """
+        Unit-normalized mean embedding of each intent's examples (computed once).
+        """
+        if cls._centroids is None:
+            with cls._centroid_lock:
+                if cls._centroids is None:
+                    from app.services.embedding import generate_embeddings
+
+                    names, rows = [], []
+                    for intent, examples in INTENT_EXAMPLES.items():
+                        vectors = np.asarray(generate_embeddings(examples), dtype=np.float32)
+                        centroid = vectors.mean(axis=0)
+                        names.append(intent)
+                        rows.append(centroid / (np.linalg.norm(centroid) or 1.0))
+                    cls._centroids = (names, np.stack(rows))
+        return cls._centroids
+
+    @classmethod
+    def match_centroids(cls, embedding: Sequence[float]) -> Tuple[Optional[str], float]:
+        names, matrix = cls.centroids()
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (names[best] if score >= INTENT_SIM_THRESHOLD else None), score
 
-        if any(w in text for w in ["hello", "hi", "hey"]):
-            return "greeting"
+    @classmethod
+    def classify(cls, user_message: str, embedding: Optional[Sequence[float]] = None) -> Tuple[str, str]:
+        """
+        Returns (intent, method) where method is "pattern", "centroid" or "default".
+        """
+        intent = cls.match_patterns(user_message)
+        if intent:
+            return intent, "pattern"
 
-        if any(w in text for w in ["book interview", "schedule", "interview"]):
-            return "interview_booking"
+        if INTENT_EMBEDDINGS and embedding is not None:
+            intent, _ = cls.match_centroids(embedding)
+            if intent:
+                return intent, "centroid"
 
-        if any(w in text for w in ["document", "pdf", "file", "content"]):
-            return "document_query"
+        return GENERAL_QUERY, "default"
 
-        # default fallback
-        return "general_query"
\ No newline at end of file
+    @classmethod
+    def detect_intent(cls, user_message: str, embedding: Optional[Sequence[float]] = None) -> str:
+        return cls.classify(user_message, embedding)[0]
@@ -1,30 +1,490 @@
+import hashlib
 import os
-from groq import Groq
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Generator, Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from app.utils.circuit_breaker import CircuitBreaker, get_breaker
+from app.utils.config import (
+    BREAKER_LLM_SLOW_MS,
+    LLM_BACKEND,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_QUEUE_TIMEOUT,
+    LLM_SESSION_CONCURRENCY,
+    LLM_STUB_COMPLETION_TOKENS,
+    LLM_STUB_LATENCY_MS,
+    LLM_STUB_TOKENS_PER_SEC,
+    LLM_TIMEOUT,
+)
+from app.utils.metrics import (
+    LLM_COALESCED,
+    LLM_IN_FLIGHT,
+    LLM_QUEUED,
+    LLM_QUEUE_WAIT,
+    LLM_REJECTED,
+    LLM_RETRIES,
+)
+
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY is missing in .env file")
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+
+class LLMOverloadedError(Exception):
+    """
+    No LLM slot became free within LLM_QUEUE_TIMEOUT.
+    """
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """
+    The caller's deadline ran out before the LLM answered; says nothing
+    about the health of the upstream API.
+    """
+
+
+class _LeaderGaveUp(Exception):
+    """
+    Handed to coalesced callers when the leading call failed for its own
+    reasons (its deadline, cancellation) rather than the LLM's: they retry.
+    """
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 chars per token) when the API reports no usage.
+    """
+    return max(1, len(text) // 4)
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class GroqBackend:
+    """
+    Groq chat completions over one pooled HTTP/2 httpx client.
+    Retries are done by the gateway, so the SDK's own retries are off.
+    """
+
+    def __init__(self, api_key: Optional[str] = GROQ_API_KEY):
+        if not api_key:
+            raise ValueError("GROQ_API_KEY is missing in .env file")
+
+        import groq
+
+        self.http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+        )
+        self.client = groq.Groq(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.retryable = (
+            groq.APITimeoutError,
+            groq.APIConnectionError,
+            groq.RateLimitError,
+            groq.InternalServerError,
+        )
+
+    def complete(self, prompt: str, model: str, max_tokens: int, timeout: float) -> dict:
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
+
+        text = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+
+        return {
+            "text": text,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt),
+                "completion_tokens": getattr(usage, "completion_tokens", None) or estimate_tokens(text or ""),
+            },
+        }
+
+    def stream(self, prompt: str, model: str, max_tokens: int, timeout: float) -> Generator[str, None, Dict]:
+        """
+        Yields the answer's text deltas; returns the usage.
+        """
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True,
+        )
+
+        chars, usage = 0, None
+        for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                chars += len(delta)
+                yield delta
+            x_groq = getattr(chunk, "x_groq", None)   # the last chunk carries the usage
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage = x_groq.usage
+
+        return {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt),
+            "completion_tokens": getattr(usage, "completion_tokens", None) or max(1, chars // 4),
+        }
+
+
+class StubBackend:
+    """
+    Offline stand-in: fixed latency plus completion_tokens / tokens_per_sec.
+    """
+
+    retryable = (TimeoutError,)
+
+    def __init__(
+        self,
+        latency_ms: float = LLM_STUB_LATENCY_MS,
+        tokens_per_sec: float = LLM_STUB_TOKENS_PER_SEC,
+        completion_tokens: int = LLM_STUB_COMPLETION_TOKENS,
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+
+    def complete(self, prompt: str, model: str, max_tokens: int, timeout: float) -> dict:
+        tokens = min(self.completion_tokens, max_tokens)
+        duration = self.latency_ms / 1000 + (tokens / self.tokens_per_sec if self.tokens_per_sec else 0.0)
+        if duration > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub LLM exceeded {timeout}s")
+
+        time.sleep(duration)
+        return {
+            "text": " ".join(["token"] * tokens),
+            "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": tokens},
+        }
+
+    def stream(self, prompt: str, model: str, max_tokens: int, timeout: float) -> Generator[str, None, Dict]:
+        tokens = min(self.completion_tokens, max_tokens)
+        if self.latency_ms / 1000 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub LLM exceeded {timeout}s")
+
+        time.sleep(self.latency_ms / 1000)
+        for i in range(tokens):
+            if self.tokens_per_sec:
+                time.sleep(1 / self.tokens_per_sec)
+            yield "token" if i == 0 else " token"
+        return {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": tokens}
+
+
+def create_backend(name: str = LLM_BACKEND):
+    if name == "stub":
+        return StubBackend()
+    if name == "groq":
+        return GroqBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+# ---------------------------
+# Gateway
+# ---------------------------
+class LLMGateway:
+    """
+    Single entry point for completions:
+      - identical in-flight requests (model, max_tokens, prompt) share one upstream call;
+        when it fails on its caller's own deadline the others try again
+      - global and per-session concurrency limits, with queue metrics
+      - per-attempt timeout and jittered exponential backoff retries
+      - an optional absolute deadline (time.monotonic()) bounds queueing,
+        every attempt and the retries together
+      - an optional circuit breaker around the upstream work only: a
+        coalesced call is one outcome, recorded by its leader
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        session_concurrency: int = LLM_SESSION_CONCURRENCY,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.backend = backend
+        self.breaker = breaker
+        self.session_concurrency = session_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._global_slots = threading.BoundedSemaphore(max_concurrency)
+        self._session_slots: "weakref.WeakValueDictionary[str, threading.BoundedSemaphore]" = weakref.WeakValueDictionary()
+        self._inflight: dict = {}
+        self._lock = threading.Lock()
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def _guarded(self):
+        return self.breaker.guarded() if self.breaker is not None else nullcontext()
+
+    @staticmethod
+    def _key(prompt: str, model: str, max_tokens: int) -> str:
+        return hashlib.sha256(f"{model}\x00{max_tokens}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _session_semaphore(self, session_id: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._session_slots.get(session_id)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.session_concurrency)
+                self._session_slots[session_id] = semaphore
+            return semaphore
+
+    def _acquire(self, semaphore: threading.BoundedSemaphore, deadline: float):
+        if not semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            LLM_REJECTED.inc()
+            raise LLMOverloadedError("LLM is overloaded, try again shortly")
+
+    @staticmethod
+    def _attempt_timeout(timeout: float, deadline: Optional[float]) -> float:
+        attempt_timeout = timeout if deadline is None else min(timeout, deadline - time.monotonic())
+        if attempt_timeout <= 0:
+            raise LLMDeadlineExceeded("LLM deadline reached")
+        return attempt_timeout
+
+    def _backoff(
+        self, error: Exception, attempt: int, attempt_timeout: float, timeout: float, deadline: Optional[float]
+    ):
+        """
+        Sleep before the next attempt, or re-raise `error` when out of attempts or time.
+        """
+        if attempt_timeout < timeout and time.monotonic() >= deadline:
+            # the attempt was cut short by the caller's deadline, not by LLM_TIMEOUT
+            raise LLMDeadlineExceeded("LLM deadline reached") from error
+        # full jitter: uniform(0, min(cap, base * 2^attempt))
+        backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+        if attempt >= self.max_retries or (deadline is not None and time.monotonic() + backoff >= deadline):
+            raise error
+        LLM_RETRIES.labels(type(error).__name__).inc()
+        time.sleep(backoff)
+
+    def _call_with_retries(
+        self, prompt: str, model: str, max_tokens: int, timeout: float, deadline: Optional[float] = None
+    ) -> dict:
+        attempt = 0
+        while True:
+            attempt_timeout = self._attempt_timeout(timeout, deadline)
+            try:
+                return self.backend.complete(prompt, model=model, max_tokens=max_tokens, timeout=attempt_timeout)
+            except self.backend.retryable as e:
+                self._backoff(e, attempt, attempt_timeout, timeout, deadline)
+                attempt += 1
+
+    @contextmanager
+    def _slot(self, session_id: Optional[str], deadline: Optional[float] = None):
+        """
+        Hold a global (and per-session) LLM slot for the block.
+        """
+        session_semaphore = self._session_semaphore(session_id) if session_id else None
+        queue_deadline = time.monotonic() + self.queue_timeout
+        if deadline is not None and deadline < queue_deadline:
+            queue_deadline = deadline
+
+        queued_at = time.perf_counter()
+        LLM_QUEUED.inc()
+        try:
+            if session_semaphore is not None:
+                self._acquire(session_semaphore, queue_deadline)
+            try:
+                self._acquire(self._global_slots, queue_deadline)
+            except Exception:
+                if session_semaphore is not None:
+                    session_semaphore.release()
+                raise
+        except LLMOverloadedError:
+            if queue_deadline == deadline:
+                raise LLMDeadlineExceeded("LLM deadline reached while waiting for a slot") from None
+            raise
+        finally:
+            LLM_QUEUED.dec()
+            LLM_QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+
+        LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            LLM_IN_FLIGHT.dec()
+            self._global_slots.release()
+            if session_semaphore is not None:
+                session_semaphore.release()
+
+    def _limited_call(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        session_id: Optional[str],
+        timeout: float,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        with self._guarded(), self._slot(session_id, deadline):
+            return self._call_with_retries(prompt, model, max_tokens, timeout, deadline)
+
+    def complete(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 200,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        key = self._key(prompt, model, max_tokens)
+
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._inflight[key] = future
+            if leader:
+                break
+
+            LLM_COALESCED.inc()
+            try:
+                result = future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                raise LLMDeadlineExceeded("LLM deadline reached waiting for an identical call") from None
+            except _LeaderGaveUp:
+                continue   # lead (or join) a new call with this caller's own deadline
+            return {**result, "coalesced": True}
+
+        try:
+            result = self._limited_call(prompt, model, max_tokens, session_id, timeout or self.timeout, deadline)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            caller_only = isinstance(e, LLMDeadlineExceeded) or not isinstance(e, Exception)
+            future.set_exception(_LeaderGaveUp() if caller_only else e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stream(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 200,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> Generator[str, None, Dict]:
+        """
+        Like complete(), token by token: yields text deltas, returns the usage.
+        The slot is held until the stream ends; an attempt is only retried
+        before its first token. Streams are never coalesced; the whole stream
+        is one breaker call.
+        """
+        timeout = timeout or self.timeout
+        with self._guarded(), self._slot(session_id, deadline):
+            attempt = 0
+            while True:
+                attempt_timeout = self._attempt_timeout(timeout, deadline)
+                chunks = self.backend.stream(prompt, model=model, max_tokens=max_tokens, timeout=attempt_timeout)
+                emitted = False
+                try:
+                    while True:
+                        try:
+                            delta = next(chunks)
+                        except StopIteration as done:
+                            return done.value
+                        emitted = True
+                        yield delta
+                except self.backend.retryable as e:
+                    if emitted:
+                        raise
+                    self._backoff(e, attempt, attempt_timeout, timeout, deadline)
+                    attempt += 1
+                finally:
+                    chunks.close()
+
+
+# Open after repeated upstream errors / slow answers; local overload and
+# caller deadlines are not the upstream's fault and do not count
+llm_breaker = get_breaker("llm", BREAKER_LLM_SLOW_MS, ignore=(LLMOverloadedError, LLMDeadlineExceeded))
+
+gateway = LLMGateway(create_backend(), breaker=llm_breaker)
 
-client = Groq(api_key=GROQ_API_KEY)
 
 # ---------------------------
 # Groq LLM Response Generator
 # ---------------------------
-def generate_response(user_message: str) -> str:
+def complete(
+    user_message: str,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 200,
+    session_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> dict:
     """
-    Sends user message to Groq Llama model and returns the response text.
+    Sends user message to the LLM through the gateway.
+    Returns {"text": ..., "usage": {"prompt_tokens": ..., "completion_tokens": ...}}.
+    `deadline` (time.monotonic()) caps queueing + attempts + retries; LLMDeadlineExceeded past it.
+    Raises CircuitOpenError without calling the LLM while its breaker is open
+    (callers coalesced onto that call get it too).
     """
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": "You are a helpful AI assistant."},
-            {"role": "user", "content": user_message}
-        ],
-        max_tokens=200
+    return gateway.complete(
+        user_message, model=model, max_tokens=max_tokens, session_id=session_id, timeout=timeout, deadline=deadline,
     )
 
-    return response.choices[0].message.content
\ No newline at end of file
+
+def stream(
+    user_message: str,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 200,
+    session_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> Generator[str, None, Dict]:
+    """
+    Streams the answer through the gateway: yields text deltas, returns
+    {"prompt_tokens": ..., "completion_tokens": ...}. The whole stream is one
+    call of the LLM circuit breaker (CircuitOpenError on the first next()).
+    """
+    return (yield from gateway.stream(
+        user_message, model=model, max_tokens=max_tokens, session_id=session_id, timeout=timeout, deadline=deadline
+    ))
+
+
+def generate_response(user_message: str) -> str:
+    """
+    Sends user message to Groq Llama model and returns the response text.
+    """
+    return complete(user_message)["text"]
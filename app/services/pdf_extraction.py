@@ -0,0 +1,239 @@
+# app/services/pdf_extraction.py
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+
+from app.utils.config import (
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_PAGE_CACHE_DIR,
+    PDF_PAGE_CACHE_MAX_MB,
+    PDF_PARALLEL_MIN_PAGES,
+)
+
+logger = logging.getLogger("pdf_extraction")
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# -----------------------------
+# Per-page cache (file hash + page index)
+# -----------------------------
+class PageCache:
+    """
+    Extracted page text on disk: <root>/<sha256[:2]>/<sha256>/<page>.txt.
+    Re-ingesting the same bytes (replace, retries, bulk re-runs) skips PyMuPDF.
+    Bounded to `max_mb`: whole files are evicted least recently used first
+    (a file's directory mtime is bumped on every use).
+    """
+
+    def __init__(self, root: str = PDF_PAGE_CACHE_DIR, max_mb: int = PDF_PAGE_CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _dir(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash[:2], file_hash)
+
+    def _path(self, file_hash: str, page: int) -> str:
+        return os.path.join(self._dir(file_hash), f"{page:06d}.txt")
+
+    def pages(self, file_hash: str) -> Set[int]:
+        """
+        Cached page indexes of a file (marks it as used).
+        """
+        try:
+            names = os.listdir(self._dir(file_hash))
+            os.utime(self._dir(file_hash))
+        except FileNotFoundError:
+            return set()
+        return {int(name[:-4]) for name in names if name.endswith(".txt") and name[:-4].isdigit()}
+
+    def get(self, file_hash: str, page: int) -> Optional[str]:
+        try:
+            with open(self._path(file_hash, page), "r", encoding="utf-8") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, file_hash: str, page: int, text: str):
+        os.makedirs(self._dir(file_hash), exist_ok=True)
+        path = self._path(file_hash, page)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp_path, path)
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove least recently used files until the cache fits in max_bytes.
+        """
+        if self.max_bytes <= 0 or not os.path.isdir(self.root):
+            return
+        entries = []   # (last used, bytes, hash dir)
+        total = 0
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry))
+                except OSError:
+                    continue   # evicted concurrently
+                total += size
+        if total <= self.max_bytes:
+            return
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= size
+            if total <= self.max_bytes:
+                return
+
+
+page_cache = PageCache()
+
+
+# -----------------------------
+# Extraction workers
+# -----------------------------
+def _extract_pages(file_path: str, pages: List[int]) -> List[str]:
+    """
+    Runs in a pool worker: opens the PDF itself, so only the path and the
+    page texts cross the process boundary.
+    """
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text("text") for i in pages]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    One long-lived pool per process. "spawn" keeps workers free of the
+    parent's threads and loaded models; they only import this module.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _batches(pages: List[int], size: int) -> List[List[int]]:
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def iter_pdf_pages(
+    file_path: str,
+    workers: Optional[int] = None,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    cache: Optional[PageCache] = page_cache,
+) -> Iterator[str]:
+    """
+    Yield the text of every page, in page order.
+
+    Cached pages are read from disk when their turn comes (a page evicted in
+    the meantime is extracted again). The rest are read in-process for small
+    documents, or split into page batches across the process pool for large
+    ones. At most 2 x workers batches are in flight, so memory stays bounded
+    while pages stream out as soon as their batch is done.
+    """
+    workers = workers or PDF_EXTRACT_WORKERS
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+    use_cache = cache is not None and cache.enabled
+    file_hash = file_sha256(file_path) if use_cache else None
+
+    cached = {page for page in cache.pages(file_hash) if page < page_count} if use_cache else set()
+
+    def cached_page(page: int) -> str:
+        text = cache.get(file_hash, page)
+        return text if text is not None else _extract_pages(file_path, [page])[0]
+
+    missing = [page for page in range(page_count) if page not in cached]
+    batches = _batches(missing, max(1, pages_per_task))
+    parallel = workers > 1 and len(missing) >= PDF_PARALLEL_MIN_PAGES
+
+    def store(batch: List[int], texts: List[str]):
+        if use_cache:
+            for page, text in zip(batch, texts):
+                try:
+                    cache.set(file_hash, page, text)
+                except OSError:
+                    logger.warning("Page cache write failed", exc_info=True)
+
+    def extracted() -> Iterator[Tuple[List[int], List[str]]]:
+        if not parallel:
+            for batch in batches:
+                yield batch, _extract_pages(file_path, batch)
+            return
+
+        pool = get_pool()
+        pending = deque()
+        queued = iter(batches)
+        for batch in queued:
+            pending.append((batch, pool.submit(_extract_pages, file_path, batch)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            batch, future = pending.popleft()
+            texts = future.result()
+            next_batch = next(queued, None)
+            if next_batch is not None:
+                pending.append((next_batch, pool.submit(_extract_pages, file_path, next_batch)))
+            yield batch, texts
+
+    next_page = 0
+    for batch, texts in extracted():
+        store(batch, texts)
+        for page, text in zip(batch, texts):
+            # emit cached pages that sit before this batch
+            while next_page < page:
+                yield cached_page(next_page)
+                next_page += 1
+            yield text
+            next_page = page + 1
+
+    while next_page < page_count:
+        yield cached_page(next_page)
+        next_page += 1
+
+    if use_cache and missing:
+        try:
+            cache.evict(keep=file_hash)
+        except OSError:
+            logger.warning("Page cache eviction failed", exc_info=True)
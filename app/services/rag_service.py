@@ -1,30 +1,178 @@
 # app/services/rag_service.py
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.services.document_index import search_documents
+from app.services.document_store import document_text_store
+from app.services.embedding import MODEL_ID, embed_query
+from app.services.tenants import record_query, route
+from app.services.vector_db import client, build_search_filter, has_parent_chunks, search_params
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.config import (
+    BREAKER_QDRANT_SLOW_MS,
+    HIERARCHICAL_TOP_DOCS,
+    RETRIEVAL_MODE,
+    SEARCH_FALLBACK_CACHE_SIZE,
+    SEARCH_FALLBACK_CACHE_TTL,
+    SMALL_TO_BIG_FETCH_FACTOR,
+    SMALL_TO_BIG_MAX_CHARS,
+    SMALL_TO_BIG_PROBE_TTL,
+)
+from app.utils.lru_cache import LRUCache
+
+logger = logging.getLogger("rag_service")
+
+qdrant_breaker = get_breaker("qdrant", BREAKER_QDRANT_SLOW_MS)
+
+
+class SearchUnavailable(Exception):
+    """
+    Qdrant is failing (or its breaker is open) and no recent result for
+    the same search is cached.
+    """
+
+
+def _clip(parent_start: int, parent_end: int, lo: int, hi: int, max_chars: int):
+    """
+    At most `max_chars` of the parent span, centred on the matched children [lo, hi).
+    """
+    if parent_end - parent_start <= max_chars:
+        return parent_start, parent_end
+    if hi - lo >= max_chars:
+        return lo, lo + max_chars
+    start = max(parent_start, lo - (max_chars - (hi - lo)) // 2)
+    end = min(parent_end, start + max_chars)
+    return max(parent_start, end - max_chars), end
+
+
+def expand_to_parents(hits: List[Dict], limit: int, max_chars: int = SMALL_TO_BIG_MAX_CHARS) -> List[Dict]:
+    """
+    Small-to-big: child hits of one document revision are replaced by their
+    parent sections, overlapping or adjacent sections merged into one span,
+    sliced from the stored document text. Each span scores as its best child.
+    Hits without a parent (or whose text is not stored) pass through.
+    """
+    merged: List[Dict] = []
+    groups: Dict[tuple, List[Dict]] = {}
+    texts: Dict[tuple, str] = {}
+
+    for hit in hits:
+        key = (hit.get("document_id"), hit.get("revision"))
+        if hit.get("parent_start") is None:
+            merged.append(hit)
+            continue
+        if key not in texts:
+            texts[key] = document_text_store.load(*key)
+        if texts[key] is None:
+            merged.append(hit)
+            continue
+        groups.setdefault(key, []).append(hit)
+
+    for key, children in groups.items():
+        text = texts[key]
+        children.sort(key=lambda h: (h["parent_start"], h.get("start") or 0))
+        spans: List[List] = []   # [parent_start, parent_end, children]
+        for hit in children:
+            if spans and (hit["parent_start"] <= spans[-1][1] or text[spans[-1][1]:hit["parent_start"]].isspace()):
+                spans[-1][1] = max(spans[-1][1], hit["parent_end"])
+                spans[-1][2].append(hit)
+            else:
+                spans.append([hit["parent_start"], hit["parent_end"], [hit]])
+
+        for parent_start, parent_end, members in spans:
+            lo = min(parent_start if h.get("start") is None else h["start"] for h in members)
+            hi = max(parent_end if h.get("end") is None else h["end"] for h in members)
+            start, end = _clip(parent_start, parent_end, lo, hi, max_chars)
+            best = max(members, key=lambda h: h["score"])
+            merged.append({
+                **best,
+                "chunk": text[start:end],
+                "chunk_id": min(h.get("chunk_id") or 0 for h in members),
+                "children": len(members),
+                "start": start,
+                "end": end,
+            })
+
+    merged.sort(key=lambda h: h["score"], reverse=True)
+    return merged[:limit]
+
+
+def _fallback_key(query: str, limit: int, mode: str, tenant_id: Optional[str], *scopes) -> str:
+    return json.dumps([" ".join(query.lower().split()), limit, mode, tenant_id, *scopes])
 
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
 
 class RAGService:
     def __init__(self):
-        self.client = QdrantClient(url="http://localhost:6333")
-        self.encoder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        self.collection = "documents"
+        self.client = client
+        # Last good hits per (query, scope): served while Qdrant is unavailable
+        self.recent_results = LRUCache(SEARCH_FALLBACK_CACHE_SIZE, ttl=SEARCH_FALLBACK_CACHE_TTL)
+        # collection -> whether it holds small_to_big children (probed, cached briefly)
+        self.parent_collections = LRUCache(1024, ttl=SMALL_TO_BIG_PROBE_TTL)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        document_ids: Optional[List[int]] = None,
+        filenames: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        precision: Optional[str] = None,
+    ):
+        """
+        mode "semantic": one ANN search over every chunk.
+        mode "hierarchical": pick the HIERARCHICAL_TOP_DOCS best documents
+        from the document-vector index, then search chunks only within them.
+        Falls back to "semantic" while the live collection has no document index.
 
-    def search(self, query: str, limit: int = 5):
-        vector = self.encoder.encode(query).tolist()
+        Chunks indexed with parent sections (small_to_big) are expanded:
+        SMALL_TO_BIG_FETCH_FACTOR x limit children are retrieved, merged into
+        parent spans read from the document text store, and the best `limit`
+        spans returned. Searches over collections without any small_to_big
+        children fetch just `limit` points.
 
+        Only the tenant's documents are searched: its dedicated collection,
+        or its tenant_id partition of the shared one (untenanted callers see
+        the untenanted corpus).
+
+        precision ("fast" / "balanced" / "accurate" / "exact", default
+        SEARCH_PRECISION) trades recall for latency via hnsw_ef.
+
+        The Qdrant calls go through the "qdrant" circuit breaker. When they
+        fail, or the breaker is open, the last hits of the same search are
+        returned with "cached": True; without any, SearchUnavailable.
+        """
+        started = time.perf_counter()
+        mode = mode or RETRIEVAL_MODE
+        fallback_key = _fallback_key(query, limit, mode, tenant_id, document_ids, filenames, tags)
+
+        # The tenant's collection (behind its alias) decides which model embeds the query
         try:
-            # Newer versions of Qdrant client (limit as keyword)
-            results = self.client.search(
-                collection_name=self.collection,
-                query_vector=vector,
-                limit=limit
+            tenant_route = route(tenant_id)
+        except Exception as e:
+            return self._fallback(fallback_key, e)
+        collection, model_id = tenant_route.collection, tenant_route.model_id
+
+        # Shared model + query embedding cache; callers that already embedded pass the vector
+        if query_vector is not None and model_id == MODEL_ID:
+            vector = query_vector
+        else:
+            vector = embed_query(query, model_id)
+
+        # Scoped queries only touch the matching points (indexed payload filter)
+        query_filter = tenant_route.scope(build_search_filter(document_ids, filenames, tags))
+        params = search_params(precision)
+
+        try:
+            results = qdrant_breaker.call(
+                self._query, collection, vector, query_filter, params, mode, tenant_route, filenames, tags, limit
             )
-        except TypeError:
-            # Older versions (limit as positional argument)
-            results = self.client.search(
-                collection_name=self.collection,
-                query_vector=vector
-            )[:limit]
+        except Exception as e:
+            return self._fallback(fallback_key, e)
 
         hits = []
         for hit in results:
@@ -33,7 +181,72 @@ class RAGService:
                 "chunk": payload.get("chunk") or payload.get("text") or "",
                 "filename": payload.get("filename"),
                 "chunk_id": payload.get("chunk_id"),
-                "score": hit.score
+                "document_id": payload.get("document_id"),
+                "score": hit.score,
+                "revision": payload.get("revision"),
+                "start": payload.get("start"),
+                "end": payload.get("end"),
+                "parent_start": payload.get("parent_start"),
+                "parent_end": payload.get("parent_end"),
             })
 
-        return hits
\ No newline at end of file
+        hits = expand_to_parents(hits, limit)
+        self.recent_results.set(fallback_key, hits)
+        record_query(tenant_route, (time.perf_counter() - started) * 1000, len(hits))
+        return hits
+
+    def _fallback(self, fallback_key: str, error: Exception) -> List[Dict]:
+        cached = self.recent_results.get(fallback_key)
+        outcome = "serving cached results" if cached is not None else "no cached results"
+        if isinstance(error, CircuitOpenError):
+            logger.info("Qdrant circuit open, %s", outcome)
+        else:
+            logger.warning("Qdrant search failed (%s), %s", error, outcome)
+        if cached is None:
+            raise SearchUnavailable(f"Search is temporarily unavailable: {error}") from error
+        return [{**hit, "cached": True} for hit in cached]
+
+    def _query(self, collection, vector, query_filter, params, mode, tenant_route, filenames, tags, limit) -> List:
+        """
+        The Qdrant round trips of one search: scored chunk points.
+        """
+        if mode == "hierarchical":
+            top_docs = search_documents(collection, vector, HIERARCHICAL_TOP_DOCS, query_filter, params)
+            if top_docs is not None:
+                if not top_docs:
+                    return []
+                query_filter = tenant_route.scope(build_search_filter(top_docs, filenames, tags))
+
+        fetch = limit * max(1, SMALL_TO_BIG_FETCH_FACTOR) if self._has_parents(collection) else limit
+        return self._search_points(collection, vector, query_filter, params, fetch)
+
+    def _has_parents(self, collection: str) -> bool:
+        """
+        Over-fetch for any collection holding small_to_big children (the chunk
+        strategy is per document, so they may be mixed with other chunks).
+        """
+        cached = self.parent_collections.get(collection)
+        if cached is None:
+            cached = has_parent_chunks(collection)
+            self.parent_collections.set(collection, cached)
+        return cached
+
+    def _search_points(self, collection, vector, query_filter, params, fetch: int) -> List:
+        try:
+            # Newer versions of Qdrant client (limit as keyword)
+            results = self.client.search(
+                collection_name=collection,
+                query_vector=vector,
+                query_filter=query_filter,
+                search_params=params,
+                limit=fetch
+            )
+        except TypeError:
+            # Older versions (limit as positional argument)
+            results = self.client.search(
+                collection_name=collection,
+                query_vector=vector,
+                query_filter=query_filter,
+                search_params=params
+            )[:fetch]
+        return results
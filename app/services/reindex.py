@@ -0,0 +1,489 @@
+# app/services/reindex.py
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http import models
+
+from app.db.database import SessionLocal
+from app.db.models import Document
+from app.services.chunking import chunk_layout
+from app.services.dedup import dedup_index, materialize_duplicates, promote_orphans
+from app.services.document_index import (
+    delete_document_vector,
+    doc_collection,
+    doc_payload,
+    drop_doc_collection,
+    mean_vector,
+    upsert_document_vectors,
+)
+from app.services.embedding import MODEL_ID, generate_embeddings, vector_size
+from app.services.index_versions import (
+    _set_status,
+    collection_model_id,
+    create_versioned_collection,
+    ensure_documents_alias,
+    get_alias_target,
+    new_collection_name,
+    swap_alias,
+)
+from app.services.document_store import document_text_store
+from app.services.vector_db import (
+    DOCUMENTS_COLLECTION,
+    chunk_payload,
+    client,
+    delete_document_vectors,
+    document_filter,
+    tenant_condition,
+    upsert_vectors,
+)
+from app.utils.config import (
+    DEDUP_ENABLED,
+    DOCUMENTS_ALIAS,
+    INDEX_ALIAS_CACHE_TTL,
+    REINDEX_BATCH,
+    REINDEX_MAX_CATCHUP_PASSES,
+    REINDEX_SCROLL_PAGE,
+)
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger("reindex")
+
+REINDEX_REDIS_TTL = 7 * 86400
+
+
+class ReindexInProgress(Exception):
+    pass
+
+
+def scan_revisions(
+    collection: str, scroll_filter: Optional[models.Filter] = None
+) -> Dict[int, FrozenSet[Optional[str]]]:
+    """
+    document_id -> revisions present, from one payload-only scroll.
+    """
+    revisions = defaultdict(set)
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=scroll_filter,
+            limit=REINDEX_SCROLL_PAGE,
+            offset=offset,
+            with_payload=["document_id", "revision"],
+            with_vectors=False,
+        )
+        for point in points:
+            payload = point.payload or {}
+            if payload.get("document_id") is not None:
+                revisions[payload["document_id"]].add(payload.get("revision"))
+        if offset is None:
+            break
+    return {doc_id: frozenset(revs) for doc_id, revs in revisions.items()}
+
+
+def scroll_document(collection: str, document_id: int, with_vectors: bool = False) -> List[models.Record]:
+    points, offset = [], None
+    while True:
+        page, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=document_filter(document_id),
+            limit=REINDEX_SCROLL_PAGE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        points.extend(page)
+        if offset is None:
+            break
+    return sorted(points, key=lambda p: (p.payload or {}).get("chunk_id") or 0)
+
+
+class ReindexJob:
+    """
+    Blue/green rebuild of the document collection from stored chunk text:
+      1) create a new versioned collection (optionally with another model)
+      2) copy every document, re-embedding its chunks in large batches
+         (point ids are kept unless the job re-chunks)
+      3) catch-up passes: documents added, replaced or deleted in the live
+         collection meanwhile are re-copied / removed
+      4) swap the alias atomically, wait for workers' cached alias to expire,
+         then catch up once more for writes that still hit the old collection
+    Document vectors (hierarchical search) are averaged from the vectors
+    written for each document, so they match the new model.
+    Without re-chunking or a model change, stored vectors are copied as-is.
+    Re-chunked documents get new point ids: their near-duplicate index
+    entries are rebuilt from the new chunks once the alias is swapped.
+    The old collection is kept (rollback = swap back) unless drop_old is set.
+
+    With source_alias != alias the job moves one tenant instead: only its
+    points are copied from the source (the shared collection) into a new
+    collection behind `alias`, and removed from the source after the swap.
+    """
+
+    def __init__(
+        self,
+        model_id: Optional[str] = None,
+        chunk_strategy: Optional[str] = None,
+        batch_size: int = REINDEX_BATCH,
+        drop_old: bool = False,
+        alias: str = DOCUMENTS_ALIAS,
+        source_alias: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.model_id = model_id or MODEL_ID
+        self.chunk_strategy = chunk_strategy
+        self.batch_size = max(1, batch_size)
+        self.drop_old = drop_old
+        self.alias = alias
+        self.source_alias = source_alias or alias
+        self.tenant_id = tenant_id
+        self.moving = self.source_alias != self.alias
+        # Moving a tenant: only its partition of the source is copied
+        self._scope = models.Filter(must=[tenant_condition(tenant_id)]) if self.moving else None
+        self._reuse_vectors = False
+
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.source: Optional[str] = None
+        self.target: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.progress = {
+            "documents_total": 0,
+            "documents_done": 0,
+            "points_written": 0,
+            "catchup_passes": 0,
+            "catchup_documents": 0,
+            "removed_documents": 0,
+            "points_per_s": 0.0,
+        }
+
+        self._copied: Dict[int, FrozenSet[Optional[str]]] = {}
+        self._rechunked: Dict[int, List[str]] = {}   # document_id -> new vector ids
+        # document_id -> (MinHash signatures of the new chunks, revision, tenant_id)
+        self._signatures: Dict[int, Tuple[np.ndarray, Optional[str], Optional[str]]] = {}
+        self._buffer: List[Tuple[str, str, Dict, Optional[List[float]]]] = []   # (point id, text, payload, vector)
+        self._doc_sums: Dict[int, List] = {}   # document_id -> [vector sum, chunks, payload]
+        self._started: Optional[float] = None
+        self._last_publish = 0.0
+
+    # -----------------------------
+    # Progress
+    # -----------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "alias": self.alias,
+            "tenant_id": self.tenant_id,
+            "model_id": self.model_id,
+            "chunk_strategy": self.chunk_strategy,
+            "source": self.source,
+            "target": self.target,
+            "drop_old": self.drop_old,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": dict(self.progress),
+        }
+
+    def _publish(self, force: bool = False):
+        """
+        Mirror progress to Redis so every worker can answer status requests.
+        """
+        now = time.monotonic()
+        if self._started:
+            elapsed = time.perf_counter() - self._started
+            self.progress["points_per_s"] = round(self.progress["points_written"] / elapsed, 1) if elapsed else 0.0
+        if not force and now - self._last_publish < 1.0:
+            return
+        self._last_publish = now
+        try:
+            get_redis_client().set(f"reindex:{self.job_id}", json.dumps(self.to_dict()), ex=REINDEX_REDIS_TTL)
+        except Exception:
+            logger.warning("Reindex progress publish failed", exc_info=True)
+
+    def _set_status(self, status: str):
+        self.status = status
+        self._publish(force=True)
+
+    # -----------------------------
+    # Copy
+    # -----------------------------
+    def _flush(self):
+        if not self._buffer:
+            return
+        ids, texts, payloads, vectors = (list(column) for column in zip(*self._buffer))
+        self._buffer = []
+
+        # Only points without a reusable stored vector are embedded
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = generate_embeddings(
+                [texts[i] for i in missing], use_cache=False, batch_size=64, model_id=self.model_id
+            )
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        upsert_vectors(self.target, [
+            models.PointStruct(id=point_id, vector=vector, payload=payload)
+            for point_id, vector, payload in zip(ids, vectors, payloads)
+        ])
+        for vector, payload in zip(vectors, payloads):
+            entry = self._doc_sums.setdefault(payload["document_id"], [np.zeros(len(vector), np.float32), 0, payload])
+            entry[0] += np.asarray(vector, dtype=np.float32)
+            entry[1] += 1
+        self.progress["points_written"] += len(ids)
+        self._publish()
+
+    def _queue_document(self, document_id: int) -> FrozenSet[Optional[str]]:
+        points = scroll_document(self.source, document_id, with_vectors=self._reuse_vectors)
+        revisions = frozenset((p.payload or {}).get("revision") for p in points)
+
+        if not self.chunk_strategy:
+            for point in points:
+                payload = point.payload or {}
+                vector = point.vector if self._reuse_vectors else None
+                self._buffer.append((str(point.id), payload.get("chunk") or payload.get("text") or "", payload, vector))
+        elif points:
+            first = points[0].payload or {}
+            # Re-chunk the stored source text; offsets then stay valid for it.
+            # Documents ingested before the text store existed are rebuilt
+            # from their chunks (no offsets: they would not match any text).
+            text = document_text_store.load(document_id, first.get("revision"))
+            has_source = text is not None
+            if not has_source:
+                text = "\n\n".join((p.payload or {}).get("chunk") or "" for p in points)
+            spans, parents = chunk_layout(text, self.chunk_strategy)
+            new_ids = []
+            for idx, (start, end) in enumerate(spans):
+                new_ids.append(str(uuid.uuid4()))
+                chunk = text[start:end]
+                self._buffer.append((new_ids[-1], chunk, chunk_payload(
+                    chunk,
+                    first.get("filename"),
+                    idx,
+                    document_id,
+                    first.get("revision"),
+                    first.get("tags"),
+                    span=(start, end) if has_source else None,
+                    parent=parents[idx] if parents and has_source else None,
+                    tenant_id=first.get("tenant_id"),
+                ), None))
+            self._rechunked[document_id] = new_ids
+            if DEDUP_ENABLED:
+                self._signatures[document_id] = (
+                    np.stack([dedup_index.signature(text[start:end]) for start, end in spans]),
+                    first.get("revision"),
+                    first.get("tenant_id"),
+                )
+
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+        return revisions
+
+    def _copy(self, document_ids: List[int], replace: bool = False):
+        for document_id in document_ids:
+            if replace:
+                self._flush()
+                delete_document_vectors(document_id, collection_name=self.target)
+                delete_document_vector(self.target, document_id)
+            self._doc_sums.pop(document_id, None)
+            self._copied[document_id] = self._queue_document(document_id)
+            self.progress["documents_done"] += 1
+        self._flush()
+        self._write_document_vectors()
+
+    def _write_document_vectors(self):
+        points = []
+        for document_id, (total, chunks, payload) in self._doc_sums.items():
+            points.append(models.PointStruct(
+                id=document_id,
+                vector=mean_vector([total]),
+                payload=doc_payload(
+                    document_id, payload.get("filename"), payload.get("revision"), payload.get("tags"), chunks,
+                    payload.get("tenant_id"),
+                ),
+            ))
+        self._doc_sums = {}
+        for start in range(0, len(points), self.batch_size):
+            upsert_document_vectors(self.target, len(points[0].vector), points[start:start + self.batch_size])
+
+    def _catch_up(self) -> bool:
+        """
+        One diff of the live collection against what was copied.
+        Returns True when nothing changed.
+        """
+        current = scan_revisions(self.source, self._scope)
+        changed = [d for d, revs in current.items() if self._copied.get(d) != revs]
+        removed = [d for d in self._copied if d not in current]
+
+        for document_id in removed:
+            delete_document_vectors(document_id, collection_name=self.target)
+            delete_document_vector(self.target, document_id)
+            self._copied.pop(document_id, None)
+            self._rechunked.pop(document_id, None)
+            self._signatures.pop(document_id, None)
+
+        self.progress["catchup_passes"] += 1
+        self.progress["catchup_documents"] += len(changed)
+        self.progress["removed_documents"] += len(removed)
+        self.progress["documents_total"] += len(changed)
+        self._copy(changed, replace=True)
+        return not changed and not removed
+
+    def _update_documents(self):
+        """
+        Re-chunked documents get their new point ids / chunk counts, and
+        near-duplicate index entries for their new chunks (every one of them
+        was embedded, so each is canonical). Duplicates of other documents
+        linked to their old chunks are promoted.
+        """
+        if not self._rechunked:
+            return
+        db = SessionLocal()
+        try:
+            orphans = []
+            for doc in db.query(Document).filter(Document.id.in_(list(self._rechunked))).all():
+                ids = self._rechunked[doc.id]
+                doc.vector_ids = json.dumps(ids)
+                doc.number_of_chunks = len(ids)
+                doc.chunk_strategy = self.chunk_strategy
+
+                # The old entries point at chunk ids that are not in the new collection
+                orphans.extend(dedup_index.remove_document(db, doc.id))
+                db.flush()
+                if doc.id in self._signatures:
+                    signatures, revision, tenant_id = self._signatures[doc.id]
+                    for point_id, signature in zip(ids, signatures):
+                        dedup_index.add_canonical(db, point_id, signature, doc.id, revision, tenant_id)
+
+            orphans = [o for o in orphans if o.document_id not in self._rechunked]
+            promote_orphans(db, orphans, self.target, self.model_id)
+            db.commit()
+        finally:
+            db.close()
+
+    def _materialize_duplicates(self):
+        """
+        Near-duplicates recorded before they were stored as points get one
+        in the source first, so they are copied like every other chunk.
+        """
+        db = SessionLocal()
+        try:
+            if materialize_duplicates(db, self.source):
+                db.commit()
+        finally:
+            db.close()
+
+    def _resolve_source(self) -> str:
+        if self.source_alias == DOCUMENTS_ALIAS:
+            return ensure_documents_alias()
+        source = get_alias_target(self.source_alias)
+        if source is None:
+            raise ValueError(f"Alias {self.source_alias!r} does not exist")
+        return source
+
+    def _remove_moved_points(self):
+        """
+        The tenant now lives behind its own alias: drop its points (and
+        document vectors) from the shared source collection.
+        """
+        selector = models.FilterSelector(filter=self._scope)
+        client.delete(collection_name=self.source, points_selector=selector)
+        if client.collection_exists(doc_collection(self.source)):
+            client.delete(collection_name=doc_collection(self.source), points_selector=selector)
+        _set_status(self.source, "live", points=client.count(self.source).count)
+
+    # -----------------------------
+    # Run
+    # -----------------------------
+    def run(self):
+        self._started = time.perf_counter()
+        try:
+            self._set_status("building")
+            self.source = self._resolve_source()
+            self._materialize_duplicates()
+            self._reuse_vectors = not self.chunk_strategy and collection_model_id(self.source) == self.model_id
+            base = f"{DOCUMENTS_COLLECTION}_t_{self.tenant_id}" if self.tenant_id else DOCUMENTS_COLLECTION
+            self.target = new_collection_name(base)
+            create_versioned_collection(
+                self.target, self.model_id, vector_size(self.model_id), chunk_strategy=self.chunk_strategy
+            )
+
+            documents = sorted(scan_revisions(self.source, self._scope))
+            self.progress["documents_total"] = len(documents)
+            self._copy(documents)
+
+            self._set_status("catching_up")
+            for _ in range(REINDEX_MAX_CATCHUP_PASSES):
+                if self._catch_up():
+                    break
+
+            self._set_status("swapping")
+            swap_alias(self.target, self.alias)
+
+            # Workers may write to the old collection until their cached alias expires
+            time.sleep(INDEX_ALIAS_CACHE_TTL)
+            self._catch_up()
+            self._update_documents()
+            _set_status(self.target, "live", points=client.count(self.target).count)
+
+            if self.moving:
+                self._remove_moved_points()
+            elif self.drop_old and self.source != self.target:
+                client.delete_collection(self.source)
+                drop_doc_collection(self.source)
+                _set_status(self.source, "dropped")
+
+            self._set_status("done")
+        except Exception as e:
+            logger.exception("Reindex %s failed", self.job_id)
+            self.error = f"{type(e).__name__}: {e}"
+            if self.target and self.status != "swapping":
+                _set_status(self.target, "failed")
+            self._set_status("failed")
+        finally:
+            self.finished_at = time.time()
+            self._publish(force=True)
+
+
+# -----------------------------
+# Job registry (one re-index at a time per process)
+# -----------------------------
+_jobs: Dict[str, ReindexJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def start_reindex(**kwargs) -> ReindexJob:
+    with _jobs_lock:
+        running = [j for j in _jobs.values() if j.status not in ("done", "failed")]
+        if running:
+            raise ReindexInProgress(f"Reindex {running[0].job_id} is still {running[0].status}")
+        job = ReindexJob(**kwargs)
+        _jobs[job.job_id] = job
+
+    threading.Thread(target=job.run, name=f"reindex-{job.job_id[:8]}", daemon=True).start()
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    try:
+        raw = get_redis_client().get(f"reindex:{job_id}")
+        return json.loads(raw) if raw else None
+    except Exception:
+        logger.warning("Reindex progress read failed", exc_info=True)
+        return None
+
+
+def list_jobs() -> List[Dict]:
+    return sorted((j.to_dict() for j in _jobs.values()), key=lambda j: j["created_at"], reverse=True)
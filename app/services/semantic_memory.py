@@ -0,0 +1,207 @@
+# app/services/semantic_memory.py
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from qdrant_client.http import models
+
+from app.services.embedding import generate_embeddings
+from app.services.vector_db import client
+from app.utils.config import (
+    MEMORY_COLLECTION,
+    MEMORY_MAX_TURN_CHARS,
+    MEMORY_PRUNE_INTERVAL,
+    MEMORY_RECENT_TURNS,
+    MEMORY_RETENTION_DAYS,
+    MEMORY_TOP_K,
+)
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+MEMORY_PAYLOAD_INDEXES = {
+    "session_id": models.PayloadSchemaType.KEYWORD,
+    "turn": models.PayloadSchemaType.INTEGER,
+    "created_at": models.PayloadSchemaType.FLOAT,
+}
+
+
+def _clip(text: str, limit: int = MEMORY_MAX_TURN_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class SemanticMemory:
+    """
+    Long-term conversation memory per session.
+
+    Every exchange (user message + assistant answer) is embedded once at
+    save time and stored in a Qdrant collection indexed by session_id.
+    A prompt then gets the top-k past exchanges most similar to the current
+    query plus the last few exchanges (read from the Redis chat list), so
+    memory cost stays flat no matter how long the session is.
+
+    The turn number is derived from the Redis chat list itself (two
+    messages per exchange), so it cannot drift from the list. Indexed
+    exchanges older than MEMORY_RETENTION_DAYS are pruned.
+
+    The Redis calls (recent messages) and the index calls (embedding +
+    Qdrant) are separate methods, so callers can guard each with its own
+    circuit breaker.
+    """
+
+    def __init__(self, collection: str = MEMORY_COLLECTION):
+        self.client = client
+        self.collection = collection
+        self._ready = False
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _ensure_collection(self, vector_size: int):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            if not self.client.collection_exists(self.collection):
+                self.client.create_collection(
+                    collection_name=self.collection,
+                    vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+                )
+            for field_name, field_schema in MEMORY_PAYLOAD_INDEXES.items():
+                self.client.create_payload_index(
+                    collection_name=self.collection,
+                    field_name=field_name,
+                    field_schema=field_schema,
+                )
+            self._ready = True
+
+    @staticmethod
+    def turn_of(list_length: int) -> int:
+        """
+        Turn number (1-based) of the last exchange in a chat list of this
+        length, e.g. the length returned by the RPUSH that saved it.
+        """
+        return list_length // 2
+
+    def index_turn(self, session_id: str, turn: int, user_message: str, assistant_message: str):
+        """
+        Embed one exchange and store it in the memory collection
+        (and prune expired exchanges, at most every MEMORY_PRUNE_INTERVAL).
+        """
+        vector = generate_embeddings([f"user: {user_message}\nassistant: {assistant_message}"], use_cache=False)[0]
+        self._ensure_collection(len(vector))
+
+        self.client.upsert(
+            collection_name=self.collection,
+            points=[
+                models.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=vector,
+                    payload={
+                        "session_id": session_id,
+                        "turn": turn,
+                        "user": user_message,
+                        "assistant": assistant_message,
+                        "created_at": time.time(),
+                    },
+                )
+            ],
+        )
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        if MEMORY_RETENTION_DAYS <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + MEMORY_PRUNE_INTERVAL
+        try:
+            self.prune()
+        except Exception:
+            logger.exception("Semantic memory prune failed")
+
+    def prune(self, retention_days: float = MEMORY_RETENTION_DAYS):
+        """
+        Delete indexed exchanges older than `retention_days` (all sessions).
+        """
+        if retention_days <= 0 or not self.client.collection_exists(self.collection):
+            return
+        cutoff = time.time() - retention_days * 86400
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="created_at", range=models.Range(lt=cutoff)),
+            ])),
+            wait=False,
+        )
+
+    def search(self, session_id: str, query_vector: Sequence[float], limit: int, before_turn: int) -> List[Dict]:
+        """
+        Most similar exchanges of this session with turn < before_turn.
+        """
+        if limit <= 0 or before_turn <= 1 or not self.client.collection_exists(self.collection):
+            return []
+
+        results = self.client.search(
+            collection_name=self.collection,
+            query_vector=list(query_vector),
+            query_filter=models.Filter(must=[
+                models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id)),
+                models.FieldCondition(key="turn", range=models.Range(lt=before_turn)),
+            ]),
+            limit=limit,
+        )
+        return [{**(hit.payload or {}), "score": hit.score} for hit in results]
+
+    def recent(self, session_id: str, recent_turns: int = MEMORY_RECENT_TURNS) -> Tuple[int, List[str]]:
+        """
+        (latest turn number, messages of the last `recent_turns` exchanges).
+        """
+        key = f"chat:{session_id}"
+        if recent_turns <= 0:
+            return self.turn_of(int(get_redis_client().llen(key))), []
+        pipe = get_redis_client().pipeline(transaction=True)
+        pipe.llen(key)
+        # The Redis chat list holds two messages per exchange
+        pipe.lrange(key, -2 * recent_turns, -1)
+        length, recent = pipe.execute()
+        return self.turn_of(int(length)), recent
+
+    @staticmethod
+    def compose(relevant: List[Dict], recent: Sequence[str]) -> Dict:
+        """
+        Prompt-ready memory from recalled exchanges (search) and the latest
+        messages (recent): {"text": ... or None, "relevant": n, "recent": n}.
+        """
+        relevant = sorted(relevant, key=lambda hit: hit.get("turn", 0))
+        parts = []
+        if relevant:
+            parts.append("Earlier, related:")
+            for hit in relevant:
+                parts.append(f"user: {_clip(hit.get('user', ''))}")
+                parts.append(f"assistant: {_clip(hit.get('assistant', ''))}")
+        if recent:
+            parts.append("Most recent:")
+            parts.extend(_clip(message) for message in recent)
+
+        return {
+            "text": "\n".join(parts) if parts else None,
+            "relevant": len(relevant),
+            "recent": len(recent),
+        }
+
+    def clear(self, session_id: str):
+        if self.client.collection_exists(self.collection):
+            self.client.delete(
+                collection_name=self.collection,
+                points_selector=models.FilterSelector(filter=models.Filter(must=[
+                    models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id)),
+                ])),
+            )
+
+
+semantic_memory = SemanticMemory()
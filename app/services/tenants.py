@@ -0,0 +1,248 @@
+# app/services/tenants.py
+"""
+Tenant routing for ingestion and retrieval.
+
+  - small tenants live in the shared live collection; their points carry a
+    tenant_id payload field (is_tenant keyword index) and every search is
+    filtered on it. Untenanted documents form the default corpus (no field).
+  - large tenants get a dedicated collection behind the alias
+    TENANT_ALIAS_PREFIX + tenant_id, so their searches only touch their
+    own corpus. A tenant is moved there by a blue/green copy
+    (see ReindexJob with alias=tenant_alias(...)).
+
+The tenant of a request comes from its API key (TENANT_API_KEYS); a
+tenant_id named by the client is only accepted when it is the key's own.
+"""
+import atexit
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from qdrant_client.http import models
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.models import Document
+from app.services.index_versions import live_index, resolve_alias
+from app.services.vector_db import client, tenant_condition, with_tenant
+from app.utils.auth import token_matches
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.config import (
+    BREAKER_REDIS_SLOW_MS,
+    TENANT_ALIAS_PREFIX,
+    TENANT_API_KEYS,
+    TENANT_DEDICATED_MIN_POINTS,
+    TENANT_STATS_FLUSH_SECONDS,
+    TENANT_STATS_TTL,
+)
+from app.utils.metrics import TENANT_SEARCHES
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger("tenants")
+
+TENANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DEFAULT_TENANT = "default"   # stats key of the untenanted corpus
+
+
+class InvalidTenant(ValueError):
+    pass
+
+
+def validate_tenant_id(tenant_id: Optional[str]) -> Optional[str]:
+    if tenant_id is None or tenant_id == "":
+        return None
+    if not TENANT_ID_RE.match(tenant_id) or tenant_id == DEFAULT_TENANT:
+        raise InvalidTenant(f"Invalid tenant_id: {tenant_id!r}")
+    return tenant_id
+
+
+class TenantForbidden(InvalidTenant):
+    pass
+
+
+def _parse_api_keys(spec: str) -> List[Tuple[str, str]]:
+    keys = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        key, _, tenant_id = entry.rpartition(":")
+        if not key or not tenant_id:
+            raise ValueError(f"TENANT_API_KEYS entry must be key:tenant, got {entry!r}")
+        keys.append((key, validate_tenant_id(tenant_id)))
+    return keys
+
+
+_api_keys = _parse_api_keys(TENANT_API_KEYS)
+
+
+def tenant_for_key(api_key: Optional[str]) -> Optional[str]:
+    """
+    Tenant an API key belongs to (None for an unknown or missing key). Every
+    configured key is compared, in constant time, so the lookup does not
+    leak which keys exist.
+    """
+    owner = None
+    for key, tenant_id in _api_keys:
+        if token_matches(key, api_key) and owner is None:
+            owner = tenant_id
+    return owner
+
+
+def authorize_tenant(tenant_id: Optional[str], api_key: Optional[str]) -> Optional[str]:
+    """
+    Tenant a request may search or write: the one its API key belongs to.
+    A client-supplied tenant_id is validated and must name that same
+    tenant; naming one without its key raises TenantForbidden. Requests
+    without a tenant key (and no tenant_id) get the default corpus.
+    """
+    tenant_id = validate_tenant_id(tenant_id)
+    owner = tenant_for_key(api_key)
+    if tenant_id is not None and tenant_id != owner:
+        raise TenantForbidden(f"API key is not authorized for tenant {tenant_id!r}")
+    return owner
+
+
+def tenant_alias(tenant_id: str) -> str:
+    return f"{TENANT_ALIAS_PREFIX}{tenant_id}"
+
+
+class TenantRoute(NamedTuple):
+    tenant_id: Optional[str]
+    collection: str
+    model_id: str
+    dedicated: bool
+
+    def scope(self, query_filter: Optional[models.Filter] = None) -> Optional[models.Filter]:
+        """
+        Search filter restricted to this tenant (a dedicated collection
+        holds nothing else, so it needs no extra condition).
+        """
+        return query_filter if self.dedicated else with_tenant(query_filter, self.tenant_id)
+
+
+def route(tenant_id: Optional[str] = None) -> TenantRoute:
+    """
+    Physical collection (and its model) that holds a tenant's vectors.
+    Both lookups are cached for INDEX_ALIAS_CACHE_TTL seconds.
+    """
+    if tenant_id:
+        dedicated = resolve_alias(tenant_alias(tenant_id))
+        if dedicated is not None:
+            return TenantRoute(tenant_id, dedicated[0], dedicated[1], True)
+    collection, model_id = live_index()
+    return TenantRoute(tenant_id, collection, model_id, False)
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+def _stats_key(tenant_id: Optional[str]) -> str:
+    return f"tenant:{tenant_id or DEFAULT_TENANT}:queries"
+
+
+# Best effort, off the search path: counters accumulate in process and a
+# background thread adds them to Redis every TENANT_STATS_FLUSH_SECONDS
+stats_breaker = get_breaker("redis_stats", BREAKER_REDIS_SLOW_MS)
+_pending: Dict[str, List] = {}   # stats key -> [queries, latency_ms_sum, hits, last_query_at]
+_pending_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def record_query(tenant_route: TenantRoute, latency_ms: float, hits: int):
+    global _flusher
+    TENANT_SEARCHES.labels("dedicated" if tenant_route.dedicated else "shared").inc()
+    key = _stats_key(tenant_route.tenant_id)
+    with _pending_lock:
+        counters = _pending.setdefault(key, [0, 0.0, 0, 0])
+        counters[0] += 1
+        counters[1] += latency_ms
+        counters[2] += hits
+        counters[3] = int(time.time())
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="tenant-stats-flush", daemon=True)
+            _flusher.start()
+
+
+def _write_stats(pending: Dict[str, List]):
+    pipe = get_redis_client().pipeline(transaction=False)
+    for key, (queries, latency, hits, last_query_at) in pending.items():
+        pipe.hincrby(key, "queries", queries)
+        pipe.hincrbyfloat(key, "latency_ms_sum", round(latency, 3))
+        pipe.hincrby(key, "hits", hits)
+        pipe.hset(key, "last_query_at", last_query_at)
+        pipe.expire(key, TENANT_STATS_TTL)
+    pipe.execute()
+
+
+def flush_query_stats():
+    """
+    Add the counters gathered since the last flush to Redis; dropped if
+    Redis is unavailable (they are statistics, not state).
+    """
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return
+    try:
+        stats_breaker.call(_write_stats, pending)
+    except CircuitOpenError:
+        pass
+    except Exception:
+        logger.warning("Tenant query stats flush failed, dropped %d tenant(s)", len(pending), exc_info=True)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(TENANT_STATS_FLUSH_SECONDS)
+        flush_query_stats()
+
+
+atexit.register(flush_query_stats)
+
+
+def _query_stats(tenant_id: Optional[str]) -> Dict:
+    try:
+        raw = get_redis_client().hgetall(_stats_key(tenant_id)) or {}
+    except Exception:
+        logger.warning("Tenant query stats read failed", exc_info=True)
+        raw = {}
+    queries = int(raw.get("queries", 0))
+    latency = float(raw.get("latency_ms_sum", 0.0))
+    return {
+        "queries": queries,
+        "avg_search_ms": round(latency / queries, 3) if queries else None,
+        "avg_hits": round(int(raw.get("hits", 0)) / queries, 2) if queries else None,
+        "last_query_at": int(raw["last_query_at"]) if raw.get("last_query_at") else None,
+    }
+
+
+def tenant_stats(db: Session, tenant_id: Optional[str]) -> Dict:
+    tenant_route = route(tenant_id)
+    documents, chunks = db.query(func.count(Document.id), func.sum(Document.number_of_chunks)).filter(
+        Document.tenant_id == tenant_id if tenant_id else Document.tenant_id.is_(None)
+    ).one()
+
+    if tenant_route.dedicated:
+        points = client.count(tenant_route.collection, exact=True).count
+    else:
+        points = client.count(
+            tenant_route.collection, count_filter=models.Filter(must=[tenant_condition(tenant_id)]), exact=True
+        ).count
+
+    return {
+        "tenant_id": tenant_id or DEFAULT_TENANT,
+        "placement": "dedicated" if tenant_route.dedicated else "shared",
+        "collection": tenant_route.collection,
+        "model_id": tenant_route.model_id,
+        "documents": documents or 0,
+        "chunks": int(chunks or 0),
+        "points": points,
+        "suggest_dedicated": bool(tenant_id) and not tenant_route.dedicated and points >= TENANT_DEDICATED_MIN_POINTS,
+        **_query_stats(tenant_id),
+    }
+
+
+def list_tenants(db: Session) -> List[Optional[str]]:
+    rows = db.query(Document.tenant_id).distinct().all()
+    return sorted((r[0] for r in rows), key=lambda t: (t is not None, t or ""))
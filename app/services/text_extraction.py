@@ -1,11 +1,8 @@
-import fitz  # PyMuPDF
+from app.services.pdf_extraction import iter_pdf_pages
 
 def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
-    with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text("text")
-    return text
+    # Large PDFs are split across a process pool; pages come back in order
+    return "".join(iter_pdf_pages(file_path))
 
 def extract_text_from_txt(file_path: str) -> str:
     with open(file_path, "r", encoding="utf-8") as f:
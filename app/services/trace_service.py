@@ -0,0 +1,127 @@
+# app/services/trace_service.py
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import TRACE_BUFFER_SIZE, TRACE_REDIS, TRACE_REDIS_TTL
+from app.utils.metrics import stage_timer
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger("trace_service")
+
+
+class RequestTrace:
+    """
+    Timing record for one request. `trace_id` is returned to the client
+    as round_trip_id so a slow request can be looked up later.
+    """
+
+    def __init__(self, pipeline: str):
+        self.trace_id = uuid.uuid4().hex
+        self.pipeline = pipeline
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.attrs: Dict[str, Any] = {}
+        self.status = "ok"
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage: recorded on the trace (ms) and in the Prometheus histogram.
+        """
+        start = time.perf_counter()
+        try:
+            with stage_timer(self.pipeline, name):
+                yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 3)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "pipeline": self.pipeline,
+            "started_at": self.started_at,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "status": self.status,
+            "stages_ms": dict(self.stages),
+            **self.attrs,
+        }
+
+
+class TraceStore:
+    """
+    Bounded ring buffer of finished traces (oldest evicted first),
+    optionally mirrored to Redis so any worker can serve a lookup.
+    """
+
+    REDIS_LIST = "traces:recent"
+
+    def __init__(self, maxsize: int = TRACE_BUFFER_SIZE, use_redis: bool = TRACE_REDIS):
+        self.maxsize = maxsize
+        self.use_redis = use_redis
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(trace_id: str) -> str:
+        return f"trace:{trace_id}"
+
+    def save(self, trace: RequestTrace) -> Dict[str, Any]:
+        record = trace.to_dict()
+
+        with self._lock:
+            self._records[trace.trace_id] = record
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+        if self.use_redis:
+            try:
+                pipe = get_redis_client().pipeline(transaction=False)
+                pipe.set(self._key(trace.trace_id), json.dumps(record), ex=TRACE_REDIS_TTL)
+                pipe.lpush(self.REDIS_LIST, trace.trace_id)
+                pipe.ltrim(self.REDIS_LIST, 0, self.maxsize - 1)
+                pipe.execute()
+            except Exception:
+                logger.warning("Redis trace write failed", exc_info=True)
+
+        return record
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(trace_id)
+        if record is not None or not self.use_redis:
+            return record
+
+        try:
+            raw = get_redis_client().get(self._key(trace_id))
+            return json.loads(raw) if raw else None
+        except Exception:
+            logger.warning("Redis trace read failed", exc_info=True)
+            return None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        if self.use_redis:
+            try:
+                client = get_redis_client()
+                ids = client.lrange(self.REDIS_LIST, 0, limit - 1)
+                raws = client.mget([self._key(i) for i in ids]) if ids else []
+                return [json.loads(r) for r in raws if r]
+            except Exception:
+                logger.warning("Redis trace read failed", exc_info=True)
+
+        with self._lock:
+            records = list(self._records.values())
+        return records[::-1][:limit]
+
+
+trace_store = TraceStore()
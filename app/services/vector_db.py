@@ -1,10 +1,95 @@
 # app/services/vector_db.py
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from app.utils.config import QDRANT_URL
+from app.utils.config import (
+    DOCUMENTS_ALIAS,
+    HNSW_EF_CONSTRUCT,
+    HNSW_M,
+    QDRANT_URL,
+    SEARCH_EF_ACCURATE,
+    SEARCH_EF_BALANCED,
+    SEARCH_EF_FAST,
+    SEARCH_PRECISION,
+)
+
+# Initialize Qdrant client (QDRANT_URL=":memory:" gives a local in-process store)
+client = QdrantClient(location=QDRANT_URL)
+
+# Legacy physical collection. Reads and writes go through DOCUMENTS_ALIAS
+# (see app/services/index_versions.py), which a re-index can swap atomically.
+DOCUMENTS_COLLECTION = "documents"
+
+# Payload fields we filter on; each gets a payload index so filtered
+# operations use the index instead of scanning every point.
+PAYLOAD_INDEXES = {
+    "document_id": models.PayloadSchemaType.INTEGER,
+    "filename": models.PayloadSchemaType.KEYWORD,
+    "tags": models.PayloadSchemaType.KEYWORD,
+    # is_tenant: Qdrant co-locates each tenant's points, so a tenant-filtered
+    # search in the shared collection only walks that tenant's part
+    "tenant_id": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    # set on small_to_big children only; lets has_parent_chunks() answer from the index
+    "parent_start": models.PayloadSchemaType.INTEGER,
+}
+
+# Search precision -> hnsw_ef (size of the candidate list walked per query;
+# higher = better recall, slower). 0 keeps the collection's default.
+SEARCH_EF = {
+    "fast": SEARCH_EF_FAST,
+    "balanced": SEARCH_EF_BALANCED,
+    "accurate": SEARCH_EF_ACCURATE,
+}
+SEARCH_PRECISIONS = (*SEARCH_EF, "exact")
+
+
+def hnsw_config() -> models.HnswConfigDiff | None:
+    """
+    HNSW parameters for new collections (None = Qdrant defaults).
+    """
+    if not (HNSW_M or HNSW_EF_CONSTRUCT):
+        return None
+    return models.HnswConfigDiff(m=HNSW_M or None, ef_construct=HNSW_EF_CONSTRUCT or None)
+
+
+def search_params(precision: str | None = None) -> models.SearchParams | None:
+    precision = precision or SEARCH_PRECISION
+    if precision == "exact":
+        return models.SearchParams(exact=True)
+    if precision not in SEARCH_EF:
+        raise ValueError(f"Unknown search precision: {precision!r}")
+    ef = SEARCH_EF[precision]
+    return models.SearchParams(hnsw_ef=ef) if ef else None
+
+
+def chunk_payload(
+    chunk: str,
+    filename: str,
+    chunk_id: int,
+    document_id: int,
+    revision: str,
+    tags: list[str] | None = None,
+    span: tuple[int, int] | None = None,
+    parent: tuple[int, int] | None = None,
+    tenant_id: str | None = None,
+) -> dict:
+    payload = {
+        "chunk": chunk,
+        "filename": filename,
+        "chunk_id": chunk_id,
+        "document_id": document_id,
+        "revision": revision,
+        "tags": tags or [],
+    }
+    if span is not None:
+        # character offsets of the chunk in the extracted document text
+        payload["start"], payload["end"] = span
+    if parent is not None:
+        # small-to-big: the section the LLM gets instead of this chunk
+        payload["parent_start"], payload["parent_end"] = parent
+    if tenant_id:
+        payload["tenant_id"] = tenant_id
+    return payload
 
-# Initialize Qdrant client
-client = QdrantClient(url=QDRANT_URL)
 
 def upsert_vectors(collection_name: str, points: list[models.PointStruct]):
     """
@@ -13,18 +98,139 @@ def upsert_vectors(collection_name: str, points: list[models.PointStruct]):
     client.upsert(collection_name=collection_name, points=points)
 
 
+def create_payload_indexes(collection_name: str = DOCUMENTS_COLLECTION):
+    """
+    Create payload indexes (idempotent on the Qdrant side).
+    """
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema,
+        )
+
+
+def ensure_payload_indexes(collection_name: str = DOCUMENTS_COLLECTION):
+    """
+    Add missing payload indexes to an already existing collection.
+    """
+    if client.collection_exists(collection_name):
+        create_payload_indexes(collection_name)
+
+
+def has_parent_chunks(collection_name: str) -> bool:
+    """
+    Whether any point of the collection is a small_to_big child.
+    """
+    points, _ = client.scroll(
+        collection_name=collection_name,
+        scroll_filter=models.Filter(must_not=[
+            models.IsEmptyCondition(is_empty=models.PayloadField(key="parent_start")),
+        ]),
+        limit=1,
+        with_payload=False,
+        with_vectors=False,
+    )
+    return bool(points)
+
+
+def document_filter(document_id: int, exclude_revision: str | None = None) -> models.Filter:
+    must_not = None
+    if exclude_revision:
+        must_not = [models.FieldCondition(key="revision", match=models.MatchValue(value=exclude_revision))]
+
+    return models.Filter(
+        must=[models.FieldCondition(key="document_id", match=models.MatchValue(value=document_id))],
+        must_not=must_not,
+    )
+
+
+def build_search_filter(
+    document_ids: list[int] | None = None,
+    filenames: list[str] | None = None,
+    tags: list[str] | None = None,
+) -> models.Filter | None:
+    """
+    Translate request scoping into a Qdrant payload filter.
+    Every condition hits an indexed field, so Qdrant can use the payload
+    index / filtered HNSW graph instead of post-filtering the whole collection.
+    """
+    must = []
+    if document_ids:
+        must.append(models.FieldCondition(key="document_id", match=models.MatchAny(any=list(document_ids))))
+    if filenames:
+        must.append(models.FieldCondition(key="filename", match=models.MatchAny(any=list(filenames))))
+    if tags:
+        must.append(models.FieldCondition(key="tags", match=models.MatchAny(any=list(tags))))
+
+    return models.Filter(must=must) if must else None
+
+
+def tenant_condition(tenant_id: str | None) -> models.Condition:
+    """
+    Points of one tenant; no tenant = the default corpus (points without tenant_id).
+    """
+    if tenant_id:
+        return models.FieldCondition(key="tenant_id", match=models.MatchValue(value=tenant_id))
+    return models.IsEmptyCondition(is_empty=models.PayloadField(key="tenant_id"))
+
+
+def with_tenant(query_filter: models.Filter | None, tenant_id: str | None) -> models.Filter:
+    """
+    Add tenant isolation to a search filter on the shared collection.
+    """
+    condition = tenant_condition(tenant_id)
+    if query_filter is None:
+        return models.Filter(must=[condition])
+    return models.Filter(
+        must=[*(query_filter.must or []), condition],
+        must_not=query_filter.must_not,
+        should=query_filter.should,
+    )
+
+
+def delete_document_vectors(
+    document_id: int,
+    collection_name: str = DOCUMENTS_ALIAS,
+    exclude_revision: str | None = None,
+):
+    """
+    Delete every vector of a document with a single filter-delete
+    (one round trip regardless of chunk count).
+    `exclude_revision` keeps the points of a freshly written revision.
+    """
+    client.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(
+            filter=document_filter(document_id, exclude_revision)
+        ),
+        wait=True,
+    )
+
+
 # Create a collection (like a table for vectors)
 def create_collection():
-    client.recreate_collection(
-        collection_name="documents",
-        vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE),
-    )
-    return {"status": "collection created"}
+    """
+    Start over with an empty collection: a new version is created and the
+    alias swapped to it, then the previous one is dropped.
+    """
+    from app.services.embedding import MODEL_ID, vector_size
+    from app.services.index_versions import create_versioned_collection, new_collection_name, swap_alias
+
+    name = new_collection_name()
+    create_versioned_collection(name, MODEL_ID, vector_size(MODEL_ID))
+    previous = swap_alias(name)
+    if previous:
+        from app.services.document_index import drop_doc_collection
+
+        client.delete_collection(previous)
+        drop_doc_collection(previous)
+    return {"status": "collection created", "collection": name}
 
 # Add a sample vector (later will store embeddings here)
 def insert_sample_vector():
     client.upsert(
-        collection_name="documents",
+        collection_name=DOCUMENTS_ALIAS,
         points=[
             models.PointStruct(
                 id=1,
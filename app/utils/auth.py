@@ -0,0 +1,13 @@
+# app/utils/auth.py
+import hmac
+from typing import Optional
+
+
+def token_matches(expected: str, given: Optional[str]) -> bool:
+    """
+    Constant-time comparison of a shared-secret header; never matches while
+    no token is configured (the guarded endpoints fail closed).
+    """
+    if not expected or not given:
+        return False
+    return hmac.compare_digest(expected.encode("utf-8"), given.encode("utf-8"))
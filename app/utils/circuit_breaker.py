@@ -0,0 +1,222 @@
+# app/utils/circuit_breaker.py
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from app.utils.config import (
+    BREAKER_FAILURE_RATE,
+    BREAKER_HALF_OPEN_CALLS,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_SLOW_RATE,
+    BREAKER_WINDOW,
+)
+from app.utils.metrics import BREAKER_REJECTED, BREAKER_STATE
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    The dependency's breaker is open: the call was not attempted.
+    """
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-process breaker around one dependency.
+
+    The outcomes of the last `window` calls are kept; once at least
+    `min_calls` were seen and the share of failures (exceptions) or of slow
+    calls (over `slow_call_ms`) reaches its threshold, the breaker opens and
+    every call fails fast with CircuitOpenError for `open_seconds`. Then up
+    to `half_open_calls` probes go through: all fast successes close it
+    again, any failure or slow call re-opens it.
+
+    Exceptions in `ignore` (caller errors, local overload, the caller's own
+    deadline) propagate without counting against the dependency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_ms: float,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_calls: int = BREAKER_HALF_OPEN_CALLS,
+        ignore: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.slow_call_ms = slow_call_ms
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.ignore = ignore
+
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=window)   # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0            # half-open calls in flight
+        self._probe_successes = 0
+        self._last_error: Optional[str] = None
+        self._rejected = 0
+        BREAKER_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        logger.warning("Circuit %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes = 0
+            self._probe_successes = 0
+        else:
+            self._outcomes.clear()
+
+    def _before_call(self) -> bool:
+        """
+        Admit a call (True when it is a half-open probe) or raise CircuitOpenError.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            retry_in = max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+        BREAKER_REJECTED.labels(self.name).inc()
+        raise CircuitOpenError(self.name, retry_in)
+
+    def _record(self, probe: bool, failed: bool, slow: bool, error: Optional[BaseException] = None):
+        with self._lock:
+            if error is not None:
+                self._last_error = f"{type(error).__name__}: {error}"[:200]
+            if probe:
+                self._probes -= 1
+                if self._state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+                return
+
+            if self._state != CLOSED:
+                return
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_rate:
+                self._transition(OPEN)
+
+    def _release_probe(self, probe: bool):
+        if probe:
+            with self._lock:
+                self._probes -= 1
+
+    @contextmanager
+    def guarded(self):
+        """
+        The block is one call (for work that is not a single function, e.g.
+        a token stream consumed by the caller).
+        """
+        probe = self._before_call()
+        started = time.perf_counter()
+        try:
+            yield
+        except self.ignore:
+            self._release_probe(probe)
+            raise
+        except Exception as e:
+            self._record(probe, failed=True, slow=False, error=e)
+            raise
+        except BaseException:
+            # cancelled / closed early: no verdict on the dependency
+            self._release_probe(probe)
+            raise
+        self._record(probe, failed=False, slow=(time.perf_counter() - started) * 1000 > self.slow_call_ms)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        with self.guarded():
+            return fn(*args, **kwargs)
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+            self._outcomes.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            return {
+                "state": state,
+                "calls": calls,
+                "failure_rate": round(sum(1 for f, _ in self._outcomes if f) / calls, 3) if calls else 0.0,
+                "slow_rate": round(sum(1 for _, s in self._outcomes if s) / calls, 3) if calls else 0.0,
+                "slow_call_ms": self.slow_call_ms,
+                "retry_in_s": (
+                    round(max(0.0, self._opened_at + self.open_seconds - time.monotonic()), 1)
+                    if state == OPEN else None
+                ),
+                "rejected": self._rejected,
+                "last_error": self._last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, slow_call_ms: float, **kwargs) -> CircuitBreaker:
+    """
+    The process-wide breaker of a dependency (created on first use).
+    """
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, slow_call_ms, **kwargs)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
@@ -8,3 +8,186 @@ QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+# Booking read-through cache
+BOOKING_CACHE_SIZE = int(os.getenv("BOOKING_CACHE_SIZE", 1024))
+BOOKING_CACHE_TTL = int(os.getenv("BOOKING_CACHE_TTL", 30))          # seconds, in-process tier
+BOOKING_CACHE_REDIS_TTL = int(os.getenv("BOOKING_CACHE_REDIS_TTL", 300))
+BOOKING_CACHE_REDIS = os.getenv("BOOKING_CACHE_REDIS", "true").lower() == "true"
+
+# Request trace records (round_trip_id)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 1000))
+TRACE_REDIS = os.getenv("TRACE_REDIS", "false").lower() == "true"
+TRACE_REDIS_TTL = int(os.getenv("TRACE_REDIS_TTL", 86400))
+
+# Debug endpoints (/api/debug, request profiling): disabled unless set; requests must send X-Debug-Token
+DEBUG_API_TOKEN = os.getenv("DEBUG_API_TOKEN", "")
+
+# Admin endpoints (/api/admin: re-index, tenant moves): disabled unless set; requests must send X-Admin-Token
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Opt-in per-request profiling (X-Profile: 1 header or ?profile=1)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 100))   # oldest profiles deleted beyond this
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+
+# Intent routing in /conversate
+INTENT_EMBEDDINGS = os.getenv("INTENT_EMBEDDINGS", "false").lower() == "true"
+INTENT_SIM_THRESHOLD = float(os.getenv("INTENT_SIM_THRESHOLD", 0.55))
+SMALL_TALK_MODEL = os.getenv("SMALL_TALK_MODEL", "")   # e.g. llama-3.1-8b-instant; empty = canned replies
+
+# LLM gateway
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")                 # "groq" or "stub"
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))              # seconds per attempt
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.25))  # seconds, full jitter
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 4))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+LLM_SESSION_CONCURRENCY = int(os.getenv("LLM_SESSION_CONCURRENCY", 2))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))  # max wait for a slot
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32))
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", 300))
+LLM_STUB_TOKENS_PER_SEC = float(os.getenv("LLM_STUB_TOKENS_PER_SEC", 250))
+LLM_STUB_COMPLETION_TOKENS = int(os.getenv("LLM_STUB_COMPLETION_TOKENS", 120))
+
+# Conversation memory in /conversate
+MEMORY_MODE = os.getenv("MEMORY_MODE", "semantic")            # "semantic" or "full" (whole Redis history)
+MEMORY_COLLECTION = os.getenv("MEMORY_COLLECTION", "chat_memory")
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", 4))                # similar past turns per prompt
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 2))  # latest turns always included
+MEMORY_MAX_TURN_CHARS = int(os.getenv("MEMORY_MAX_TURN_CHARS", 600))
+# Indexed exchanges older than this are deleted from the memory collection (0 = keep forever)
+MEMORY_RETENTION_DAYS = float(os.getenv("MEMORY_RETENTION_DAYS", 90))
+MEMORY_PRUNE_INTERVAL = int(os.getenv("MEMORY_PRUNE_INTERVAL", 3600))  # seconds between sweeps, per worker
+
+# Query embedding cache (in-process LRU + shared Redis tier)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", 3600))             # seconds, in-process tier
+EMBEDDING_CACHE_REDIS_TTL = int(os.getenv("EMBEDDING_CACHE_REDIS_TTL", 86400))
+EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "true").lower() == "true"
+# Case-insensitive keys: "auto" follows the model tokenizer's do_lower_case, "true" / "false" force it
+EMBEDDING_CACHE_CASE_FOLD = os.getenv("EMBEDDING_CACHE_CASE_FOLD", "auto").lower()
+
+# PDF text extraction
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 64))  # smaller PDFs are read in-process
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 32))
+PDF_PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", "")    # e.g. page_cache; empty = no per-page cache
+PDF_PAGE_CACHE_MAX_MB = int(os.getenv("PDF_PAGE_CACHE_MAX_MB", 1024))  # LRU-evicted beyond this; 0 = unbounded
+
+# Bulk ingestion CLI (python -m app.cli.bulk_ingest)
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", os.cpu_count() or 1))
+BULK_EMBED_BATCH = int(os.getenv("BULK_EMBED_BATCH", 1024))      # chunks per embedding call
+BULK_UPSERT_BATCH = int(os.getenv("BULK_UPSERT_BATCH", 256))     # points per Qdrant upsert
+BULK_UPSERT_CONCURRENCY = int(os.getenv("BULK_UPSERT_CONCURRENCY", 4))
+
+# Versioned document collections (blue/green reindex)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+DOCUMENTS_ALIAS = os.getenv("DOCUMENTS_ALIAS", "documents_live")
+INDEX_ALIAS_CACHE_TTL = float(os.getenv("INDEX_ALIAS_CACHE_TTL", 5))   # seconds
+REINDEX_BATCH = int(os.getenv("REINDEX_BATCH", 512))                  # chunks per embedding call
+REINDEX_SCROLL_PAGE = int(os.getenv("REINDEX_SCROLL_PAGE", 1024))
+REINDEX_MAX_CATCHUP_PASSES = int(os.getenv("REINDEX_MAX_CATCHUP_PASSES", 5))
+
+# Near-duplicate chunk suppression at ingestion (MinHash / LSH)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))   # estimated Jaccard of word shingles
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", 128))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", 16))               # 16 bands x 8 rows: candidates from ~0.7 similarity
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", 5))            # words per shingle
+
+# Token-window chunking (chunk_strategy="token")
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", EMBEDDING_MODEL)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 254))        # 256-token encoder window minus [CLS]/[SEP]
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+CHUNK_SENTENCE_BOUNDARY = os.getenv("CHUNK_SENTENCE_BOUNDARY", "true").lower() == "true"
+
+# Retrieval: "semantic" (flat chunk search) or "hierarchical" (documents first, then their chunks)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "semantic")
+HIERARCHICAL_TOP_DOCS = int(os.getenv("HIERARCHICAL_TOP_DOCS", 8))
+
+# Small-to-big retrieval (chunk_strategy="small_to_big"): small child chunks are
+# searched, their parent sections are read from the stored document text
+DOCUMENT_TEXT_DIR = os.getenv("DOCUMENT_TEXT_DIR", "document_text")
+DOCUMENT_TEXT_CACHE_SIZE = int(os.getenv("DOCUMENT_TEXT_CACHE_SIZE", 16))   # documents kept in memory
+SMALL_TO_BIG_PARENT_TOKENS = int(os.getenv("SMALL_TO_BIG_PARENT_TOKENS", 768))
+SMALL_TO_BIG_CHILD_TOKENS = int(os.getenv("SMALL_TO_BIG_CHILD_TOKENS", 96))
+SMALL_TO_BIG_CHILD_OVERLAP = int(os.getenv("SMALL_TO_BIG_CHILD_OVERLAP", 16))
+SMALL_TO_BIG_FETCH_FACTOR = int(os.getenv("SMALL_TO_BIG_FETCH_FACTOR", 3))   # children fetched per requested hit
+SMALL_TO_BIG_MAX_CHARS = int(os.getenv("SMALL_TO_BIG_MAX_CHARS", 4000))       # per merged parent span
+SMALL_TO_BIG_PROBE_TTL = float(os.getenv("SMALL_TO_BIG_PROBE_TTL", 30))   # seconds "has parent chunks" is cached
+
+# Multi-tenancy: small tenants share the live collection (tenant_id payload
+# partition), large ones are moved to a dedicated collection behind their own alias
+TENANT_ALIAS_PREFIX = os.getenv("TENANT_ALIAS_PREFIX", f"{DOCUMENTS_ALIAS}__")
+TENANT_DEDICATED_MIN_POINTS = int(os.getenv("TENANT_DEDICATED_MIN_POINTS", 200_000))   # suggested in stats
+TENANT_STATS_TTL = int(os.getenv("TENANT_STATS_TTL", 30 * 86400))   # Redis query counters, seconds
+TENANT_STATS_FLUSH_SECONDS = float(os.getenv("TENANT_STATS_FLUSH_SECONDS", 5))   # per-worker counters -> Redis
+TENANT_API_KEYS = os.getenv("TENANT_API_KEYS", "")   # "key:tenant,key2:tenant2"; a tenant is only served to its keys
+
+# HNSW index of new collections (0 = Qdrant default: m=16, ef_construct=100);
+# tune with python -m benchmarks.hnsw_tuning, then re-index to apply
+HNSW_M = int(os.getenv("HNSW_M", 0))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", 0))
+
+# Search precision per request: "fast" / "balanced" / "accurate" set hnsw_ef
+# (0 = Qdrant default), "exact" is a brute-force search
+SEARCH_PRECISION = os.getenv("SEARCH_PRECISION", "balanced")
+SEARCH_EF_FAST = int(os.getenv("SEARCH_EF_FAST", 32))
+SEARCH_EF_BALANCED = int(os.getenv("SEARCH_EF_BALANCED", 0))
+SEARCH_EF_ACCURATE = int(os.getenv("SEARCH_EF_ACCURATE", 256))
+
+# Latency budget of /conversate (X-Latency-Budget-Ms header or latency_budget_ms
+# field; 0 = unbounded). Below these remaining budgets the pipeline degrades:
+CONVERSATE_LATENCY_BUDGET_MS = float(os.getenv("CONVERSATE_LATENCY_BUDGET_MS", 0))
+BUDGET_DEGRADE_MS = float(os.getenv("BUDGET_DEGRADE_MS", 2500))     # halve top_k, fast search, recent memory only
+BUDGET_CRITICAL_MS = float(os.getenv("BUDGET_CRITICAL_MS", 1200))   # top_k 1, no memory
+BUDGET_LLM_MIN_MS = float(os.getenv("BUDGET_LLM_MIN_MS", 300))      # less left before the LLM call: give up
+BUDGET_RESERVE_MS = float(os.getenv("BUDGET_RESERVE_MS", 50))       # kept for saving the turn + response
+LLM_EXPECTED_TTFT_MS = float(os.getenv("LLM_EXPECTED_TTFT_MS", 350))           # sizes max_tokens to the budget
+LLM_EXPECTED_TOKENS_PER_SEC = float(os.getenv("LLM_EXPECTED_TOKENS_PER_SEC", 250))
+LLM_MIN_COMPLETION_TOKENS = int(os.getenv("LLM_MIN_COMPLETION_TOKENS", 32))
+
+# Circuit breakers (per process) around Qdrant search, Redis memory and the LLM:
+# over the last BREAKER_WINDOW calls, a failure or slow-call share at the rate
+# opens the breaker, calls then fail fast for BREAKER_OPEN_SECONDS before probes
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", 0.8))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", 2))
+BREAKER_QDRANT_SLOW_MS = float(os.getenv("BREAKER_QDRANT_SLOW_MS", 1000))
+BREAKER_REDIS_SLOW_MS = float(os.getenv("BREAKER_REDIS_SLOW_MS", 250))
+BREAKER_LLM_SLOW_MS = float(os.getenv("BREAKER_LLM_SLOW_MS", 15000))
+# Recent search results served while Qdrant is failing
+SEARCH_FALLBACK_CACHE_SIZE = int(os.getenv("SEARCH_FALLBACK_CACHE_SIZE", 2048))
+SEARCH_FALLBACK_CACHE_TTL = float(os.getenv("SEARCH_FALLBACK_CACHE_TTL", 900))   # seconds
+
+# Rate limiting: Redis token buckets shared by all workers, per route group
+# (chat / upload / batch) and caller (API key, session id, else client address)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CHAT_BURST = float(os.getenv("RATE_LIMIT_CHAT_BURST", 20))       # bucket capacity, 0 = unlimited
+RATE_LIMIT_CHAT_PER_MIN = float(os.getenv("RATE_LIMIT_CHAT_PER_MIN", 30))   # refill
+RATE_LIMIT_CHAT_COST = float(os.getenv("RATE_LIMIT_CHAT_COST", 1))
+RATE_LIMIT_UPLOAD_BURST = float(os.getenv("RATE_LIMIT_UPLOAD_BURST", 60))
+RATE_LIMIT_UPLOAD_PER_MIN = float(os.getenv("RATE_LIMIT_UPLOAD_PER_MIN", 20))
+RATE_LIMIT_UPLOAD_COST_PER_MB = float(os.getenv("RATE_LIMIT_UPLOAD_COST_PER_MB", 4))   # + 1 per upload
+RATE_LIMIT_BATCH_BURST = float(os.getenv("RATE_LIMIT_BATCH_BURST", 10))     # reindex / rebuild / dedicate jobs
+RATE_LIMIT_BATCH_PER_MIN = float(os.getenv("RATE_LIMIT_BATCH_PER_MIN", 5))
+RATE_LIMIT_BATCH_COST = float(os.getenv("RATE_LIMIT_BATCH_COST", 5))
+RATE_LIMIT_API_KEY_FACTOR = float(os.getenv("RATE_LIMIT_API_KEY_FACTOR", 10))   # an API key's bucket vs a session's
+RATE_LIMIT_CLIENT_FACTOR = float(os.getenv("RATE_LIMIT_CLIENT_FACTOR", 10))    # a client address vs a session
+# Admission: requests in flight per worker before new ones are shed with 429 (0 = unlimited)
+ADMISSION_MAX_CHAT = int(os.getenv("ADMISSION_MAX_CHAT", 32))
+ADMISSION_MAX_UPLOAD = int(os.getenv("ADMISSION_MAX_UPLOAD", 4))
+ADMISSION_MAX_BATCH = int(os.getenv("ADMISSION_MAX_BATCH", 2))
+
+# WebSocket conversations (/api/conversate/ws): memory and retrievals kept per
+# connection, turns written behind to Redis
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 200))                 # per worker, 0 = unlimited
+WS_RETRIEVAL_CACHE_SIZE = int(os.getenv("WS_RETRIEVAL_CACHE_SIZE", 16))        # retrievals kept per connection
+WS_RETRIEVAL_REUSE_SIMILARITY = float(os.getenv("WS_RETRIEVAL_REUSE_SIMILARITY", 0.95))   # vs the last query
+WS_WRITE_BEHIND_FLUSH_TIMEOUT = float(os.getenv("WS_WRITE_BEHIND_FLUSH_TIMEOUT", 5))      # seconds after disconnect
@@ -0,0 +1,62 @@
+# app/utils/deadline.py
+import math
+import time
+from typing import Callable, List, Optional
+
+
+class DeadlineExceeded(Exception):
+    """
+    The request's latency budget ran out before the named stage.
+    """
+
+
+class ClientDisconnected(Exception):
+    """
+    The client went away; the rest of the pipeline is not worth running.
+    """
+
+
+class Deadline:
+    """
+    Latency budget of one request, passed down through its stages.
+
+    `remaining()` is what a stage may still spend (inf without a budget),
+    `check(stage)` is called between stages to abandon the work once the
+    budget is spent or the client has disconnected, and `degrade(decision)`
+    records what was cut short so the response can report it.
+    """
+
+    def __init__(self, budget_ms: Optional[float] = None, is_disconnected: Optional[Callable[[], bool]] = None):
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget_ms / 1000 if self.budget_ms else None
+        self.degradations: List[str] = []
+        self._is_disconnected = is_disconnected
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """
+        Seconds left (never negative); inf when the request has no budget.
+        """
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def remaining_ms(self) -> float:
+        return self.remaining() * 1000
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    def check(self, stage: str):
+        if self._is_disconnected is not None and self._is_disconnected():
+            raise ClientDisconnected(f"Client disconnected before {stage}")
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f"Latency budget of {self.budget_ms:.0f} ms exhausted before {stage}")
+
+    def degrade(self, decision: str):
+        if decision not in self.degradations:
+            self.degradations.append(decision)
@@ -0,0 +1,193 @@
+# app/utils/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+# Stages range from sub-ms (prompt build) to multi-second (LLM, PDF extraction)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "Latency of a single pipeline stage",
+    ["pipeline", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUEST_LATENCY = Histogram(
+    "rag_request_latency_seconds",
+    "End-to-end latency of pipeline endpoints",
+    ["pipeline"],
+    buckets=LATENCY_BUCKETS,
+)
+
+IN_FLIGHT = Gauge(
+    "rag_in_flight_requests",
+    "Requests currently being processed",
+    ["pipeline"],
+    multiprocess_mode="livesum",
+)
+
+PROMPT_TOKENS = Counter("rag_prompt_tokens_total", "Prompt tokens sent to the LLM")
+COMPLETION_TOKENS = Counter("rag_completion_tokens_total", "Completion tokens returned by the LLM")
+CHUNKS_RETRIEVED = Counter("rag_chunks_retrieved_total", "Chunks retrieved from Qdrant for prompts")
+INTENT_ROUTES = Counter("rag_intent_routes_total", "Conversate requests by detected intent and route", ["intent", "route"])
+
+# LLM gateway
+LLM_QUEUE_WAIT = Histogram(
+    "rag_llm_queue_wait_seconds",
+    "Time spent waiting for a global / per-session LLM slot",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUED = Gauge("rag_llm_queued_requests", "LLM calls waiting for a slot", multiprocess_mode="livesum")
+LLM_IN_FLIGHT = Gauge("rag_llm_in_flight_requests", "Upstream LLM calls in progress", multiprocess_mode="livesum")
+LLM_COALESCED = Counter("rag_llm_coalesced_total", "LLM calls served by an identical in-flight call")
+LLM_RETRIES = Counter("rag_llm_retries_total", "LLM call retries", ["reason"])
+LLM_REJECTED = Counter("rag_llm_rejected_total", "LLM calls rejected after waiting too long for a slot")
+
+# Query embedding cache
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "rag_embedding_cache_lookups_total",
+    "Query embedding lookups by the tier that answered (local, redis or miss)",
+    ["result"],
+)
+EMBEDDING_CACHE_BYTES = Gauge(
+    "rag_embedding_cache_local_bytes",
+    "Packed vector bytes held in the in-process embedding cache, per model",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+EMBEDDING_CACHE_REDIS_BYTES = Counter(
+    "rag_embedding_cache_redis_bytes_written_total",
+    "Packed vector bytes written to the Redis embedding cache",
+)
+
+DEDUP_CHUNKS = Counter(
+    "rag_dedup_chunks_total",
+    "Ingested chunks by near-duplicate check result (unique or duplicate)",
+    ["result"],
+)
+
+TENANT_SEARCHES = Counter(
+    "rag_tenant_searches_total",
+    "RAG searches by tenant placement (shared collection or dedicated)",
+    ["placement"],
+)
+
+CONVERSATE_DEGRADED = Counter(
+    "rag_conversate_degraded_total",
+    "Latency-budget degradations applied in /conversate",
+    ["decision"],
+)
+
+CONVERSATE_ABANDONED = Counter(
+    "rag_conversate_abandoned_total",
+    "/conversate requests abandoned before completion",
+    ["reason"],
+)
+
+BREAKER_STATE = Gauge(
+    "rag_circuit_breaker_state",
+    "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)",
+    ["breaker"],
+    multiprocess_mode="livemax",
+)
+BREAKER_REJECTED = Counter(
+    "rag_circuit_breaker_rejected_total",
+    "Calls failed fast because the dependency's breaker was open",
+    ["breaker"],
+)
+
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total",
+    "Requests shed with 429 by route group and reason (rate or concurrency)",
+    ["group", "reason"],
+)
+
+WS_CONNECTIONS = Gauge("rag_ws_connections", "Open WebSocket conversations", multiprocess_mode="livesum")
+WS_SENT_BYTES = Counter("rag_ws_sent_bytes_total", "Bytes of frames sent on WebSocket conversations")
+WS_RETRIEVALS = Counter(
+    "rag_ws_retrievals_total",
+    "WebSocket turn retrievals by source (search, or reused from the connection)",
+    ["source"],
+)
+
+INGESTION_CHUNKS = Histogram(
+    "rag_ingestion_chunks",
+    "Chunks produced per ingested document",
+    ["chunk_strategy"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+
+# Routes whose in-flight count / total latency we track, by (method, route template)
+PIPELINE_ROUTES = {
+    ("POST", "/api/conversate"): "conversate",
+    ("POST", "/api/v1/conversate"): "conversate",
+    ("POST", "/api/doc/upload"): "ingestion",
+    ("PUT", "/api/doc/{document_id}"): "ingestion",
+}
+
+
+def pipeline_for(request: Request) -> Optional[str]:
+    """
+    The pipeline of the app route that will serve this request, if tracked
+    (the middleware runs before routing, so the route is matched here).
+    """
+    for route in request.app.router.routes:
+        pipeline = PIPELINE_ROUTES.get((request.method, getattr(route, "path", None)))
+        if pipeline is not None and route.matches(request.scope)[0] == Match.FULL:
+            return pipeline
+    return None
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(pipeline, stage).observe(time.perf_counter() - start)
+
+
+async def metrics_middleware(request: Request, call_next):
+    pipeline = pipeline_for(request)
+    if pipeline is None:
+        return await call_next(request)
+
+    gauge = IN_FLIGHT.labels(pipeline)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        REQUEST_LATENCY.labels(pipeline).observe(time.perf_counter() - start)
+        gauge.dec()
+
+
+def metrics_response() -> Response:
+    """
+    Prometheus exposition. With several uvicorn workers set
+    PROMETHEUS_MULTIPROC_DIR so every worker's samples are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,235 @@
+# app/utils/profiling.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from fastapi import Request
+
+from app.utils.auth import token_matches
+from app.utils.config import (
+    DEBUG_API_TOKEN,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_FILES,
+    PROFILING_ENABLED,
+    TRACEMALLOC_FRAMES,
+)
+
+logger = logging.getLogger("profiling")
+
+
+# -----------------------------
+# Sampling CPU profiler
+# -----------------------------
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread. Output is in collapsed-stack format
+    ("root;caller;leaf <count>"), readable by flamegraph.pl, inferno and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    def __init__(self, name: str, thread_id: Optional[int] = None):
+        self.profile_id = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(PROFILE_DIR, f"{self.profile_id}.collapsed")
+        self.sampler = StackSampler(thread_id or threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def prune_profiles(keep: int = PROFILE_MAX_FILES):
+    """
+    Delete all but the `keep` newest profiles.
+    """
+    for old in list_profiles()[max(0, keep):]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, f"{old['profile_id']}.collapsed"))
+        except FileNotFoundError:
+            pass
+
+
+def profiling_requested(request: Request) -> bool:
+    """
+    Guarded opt-in: PROFILING_ENABLED must be on, the request must ask for it
+    (X-Profile: 1 or ?profile=1) and carry X-Debug-Token (so a DEBUG_API_TOKEN
+    must be configured).
+    """
+    if not PROFILING_ENABLED:
+        return False
+
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if flag not in ("1", "true"):
+        return False
+
+    return token_matches(DEBUG_API_TOKEN, request.headers.get("x-debug-token"))
+
+
+@contextmanager
+def profile_request(request: Request, name: str):
+    """
+    Profile the calling thread for the duration of the block when the request
+    opted in; yields the RequestProfile (or None when profiling is off).
+    Call it from a sync endpoint (a threadpool worker): on the event loop's
+    thread the samples would mix every concurrent request, so it is skipped.
+    """
+    if not profiling_requested(request):
+        yield None
+        return
+    if _on_event_loop():
+        logger.warning("Profiling skipped: profile_request called on the event loop thread")
+        yield None
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile = RequestProfile(name)
+    profile.sampler.start()
+    try:
+        yield profile
+    finally:
+        profile.sampler.stop()
+        profile.sampler.write(profile.path)
+        prune_profiles()
+
+
+def list_profiles() -> List[Dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.is_file() and entry.name.endswith(".collapsed"):
+            stat = entry.stat()
+            profiles.append({
+                "profile_id": entry.name[: -len(".collapsed")],
+                "bytes": stat.st_size,
+                "created_at": stat.st_mtime,
+            })
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    return path if os.path.isfile(path) else None
+
+
+# -----------------------------
+# tracemalloc snapshot diffs
+# -----------------------------
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def memory_snapshot_diff(top: int = 25, key_type: str = "lineno") -> Dict:
+    """
+    First call starts tracemalloc and records a baseline. Each later call
+    returns the top allocation deltas since the previous snapshot.
+    Start the server with PYTHONTRACEMALLOC=<frames> to also capture
+    import-time allocations (embedding models, torch).
+    """
+    global _last_snapshot
+
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        previous, _last_snapshot = _last_snapshot, snapshot
+
+    current, peak = tracemalloc.get_traced_memory()
+    result = {
+        "traced_current_mb": round(current / 2**20, 2),
+        "traced_peak_mb": round(peak / 2**20, 2),
+        "key_type": key_type,
+    }
+
+    if previous is None:
+        top_stats = snapshot.statistics(key_type)[:top]
+        result["baseline"] = True
+        result["top"] = [
+            {"size_kb": round(s.size / 1024, 1), "count": s.count, "where": s.traceback.format()}
+            for s in top_stats
+        ]
+        return result
+
+    diffs = snapshot.compare_to(previous, key_type)[:top]
+    result["baseline"] = False
+    result["top"] = [
+        {
+            "size_diff_kb": round(d.size_diff / 1024, 1),
+            "size_kb": round(d.size / 1024, 1),
+            "count_diff": d.count_diff,
+            "where": d.traceback.format(),
+        }
+        for d in diffs
+    ]
+    return result
+
+
+def stop_memory_tracing() -> Dict:
+    global _last_snapshot
+
+    with _snapshot_lock:
+        was_tracing = tracemalloc.is_tracing()
+        tracemalloc.stop()
+        _last_snapshot = None
+    return {"stopped": was_tracing}
@@ -0,0 +1,273 @@
+# app/utils/rate_limit.py
+"""
+Request admission for the expensive routes, in front of every router:
+
+  1. concurrency: requests of a route group in flight in this worker; past
+     ADMISSION_MAX_* new ones are shed with 429 at once instead of queueing
+     in the threadpool until latency collapses.
+  2. rate: token buckets in Redis (one atomic Lua script, so every worker
+     shares them), per route group. A request always draws from its client
+     address's bucket, plus its API key's (X-API-Key) and its session's
+     (JSON body / X-Session-Id) when it sends them: the caller picks both,
+     so a new one per request must not buy a fresh bucket. A request costs
+     tokens by weight: chat calls, upload size, batch jobs.
+
+While Redis is unavailable (the limiter's own "redis_ratelimit" circuit
+breaker open) requests are let through: rate limiting must not become an
+outage of its own. The check runs in the threadpool, so a slow Redis does
+not stall the event loop.
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.utils.circuit_breaker import CircuitOpenError, get_breaker
+from app.utils.config import (
+    ADMISSION_MAX_BATCH,
+    ADMISSION_MAX_CHAT,
+    ADMISSION_MAX_UPLOAD,
+    BREAKER_REDIS_SLOW_MS,
+    RATE_LIMIT_API_KEY_FACTOR,
+    RATE_LIMIT_BATCH_BURST,
+    RATE_LIMIT_BATCH_COST,
+    RATE_LIMIT_BATCH_PER_MIN,
+    RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_CHAT_COST,
+    RATE_LIMIT_CHAT_PER_MIN,
+    RATE_LIMIT_CLIENT_FACTOR,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_UPLOAD_BURST,
+    RATE_LIMIT_UPLOAD_COST_PER_MB,
+    RATE_LIMIT_UPLOAD_PER_MIN,
+)
+from app.utils.metrics import ADMISSION_REJECTED
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger("rate_limit")
+
+API_KEY_HEADER = "X-API-Key"
+SESSION_HEADER = "X-Session-Id"
+MAX_SESSION_BODY = 64 * 1024   # larger chat bodies are not parsed for a session id
+
+# All-or-nothing take of `cost` tokens from every bucket in KEYS.
+# ARGV: cost, then capacity and refill rate (tokens/s) per key.
+# Returns {allowed, tokens left in the emptiest bucket, seconds until allowed}.
+TOKEN_BUCKET_LUA = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels, wait = {}, 0
+for i = 1, #KEYS do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local level, ts = tonumber(state[1]), tonumber(state[2])
+    if level == nil then
+        level, ts = capacity, now
+    end
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    levels[i] = level
+    local need = math.min(cost, capacity)
+    if level < need then
+        wait = math.max(wait, (need - level) / rate)
+    end
+end
+local allowed = 0
+if wait == 0 then
+    allowed = 1
+end
+local left = nil
+for i = 1, #KEYS do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local level = levels[i]
+    if allowed == 1 then
+        level = level - math.min(cost, capacity)
+    end
+    redis.call('HSET', KEYS[i], 'tokens', level, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000) + 1000)
+    if left == nil or level < left then
+        left = level
+    end
+end
+return {allowed, tostring(left), tostring(wait)}
+"""
+
+
+class RouteGroup(NamedTuple):
+    name: str
+    methods: Tuple[str, ...]
+    path: "re.Pattern"
+    burst: float           # bucket capacity (tokens), 0 = no rate limit
+    per_minute: float      # refill
+    max_in_flight: int     # per worker, 0 = unlimited
+
+
+ROUTE_GROUPS = (
+    RouteGroup(
+        "chat", ("POST",), re.compile(r"^/api(/v1)?/conversate$"),
+        RATE_LIMIT_CHAT_BURST, RATE_LIMIT_CHAT_PER_MIN, ADMISSION_MAX_CHAT,
+    ),
+    RouteGroup(
+        "upload", ("POST", "PUT"), re.compile(r"^/api/doc/(upload|\d+)$"),
+        RATE_LIMIT_UPLOAD_BURST, RATE_LIMIT_UPLOAD_PER_MIN, ADMISSION_MAX_UPLOAD,
+    ),
+    RouteGroup(
+        "batch", ("POST",), re.compile(r"^/api/admin/(reindex|document-index/rebuild|tenants/[^/]+/dedicate)$"),
+        RATE_LIMIT_BATCH_BURST, RATE_LIMIT_BATCH_PER_MIN, ADMISSION_MAX_BATCH,
+    ),
+)
+
+
+def route_group(method: str, path: str) -> Optional[RouteGroup]:
+    for group in ROUTE_GROUPS:
+        if method in group.methods and group.path.match(path):
+            return group
+    return None
+
+
+def request_cost(group: RouteGroup, content_length: Optional[int]) -> float:
+    """
+    Tokens a request takes: uploads pay per megabyte on top of the call.
+    """
+    if group.name == "chat":
+        return RATE_LIMIT_CHAT_COST
+    if group.name == "upload":
+        return 1 + RATE_LIMIT_UPLOAD_COST_PER_MB * (content_length or 0) / (1024 * 1024)
+    return RATE_LIMIT_BATCH_COST
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: float
+    retry_after: float   # seconds
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets in Redis shared by every worker (see TOKEN_BUCKET_LUA).
+    """
+
+    def __init__(self, prefix: str = "ratelimit"):
+        self.prefix = prefix
+        # Its own breaker: rate-limit traffic must not open (or be opened by) the memory paths' one
+        self.breaker = get_breaker("redis_ratelimit", BREAKER_REDIS_SLOW_MS)
+        self._script = None
+
+    def _take(self, keys: List[str], cost: float, limits: List[Tuple[float, float]]):
+        if self._script is None:
+            self._script = get_redis_client().register_script(TOKEN_BUCKET_LUA)
+        args = [cost]
+        for capacity, rate in limits:
+            args.extend((capacity, rate))
+        return self._script(keys=keys, args=args)
+
+    def buckets(self, group: RouteGroup, api_key: Optional[str], session_id: Optional[str], client: Optional[str]):
+        """
+        (key, capacity, refill per second) of every bucket the request draws
+        from. The client address's bucket always applies (API keys and
+        session ids are not authenticated); the others are limits on top.
+        """
+        capacity, rate = group.burst, group.per_minute / 60
+        factor = RATE_LIMIT_CLIENT_FACTOR
+        buckets = [(f"{self.prefix}:{group.name}:ip:{client or 'unknown'}", capacity * factor, rate * factor)]
+        if api_key:
+            digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+            factor = RATE_LIMIT_API_KEY_FACTOR
+            buckets.append((f"{self.prefix}:{group.name}:key:{digest}", capacity * factor, rate * factor))
+        if session_id:
+            buckets.append((f"{self.prefix}:{group.name}:session:{session_id}", capacity, rate))
+        return buckets
+
+    def hit(
+        self,
+        group: RouteGroup,
+        cost: float,
+        api_key: Optional[str] = None,
+        session_id: Optional[str] = None,
+        client: Optional[str] = None,
+    ) -> RateLimitResult:
+        if group.burst <= 0 or group.per_minute <= 0:
+            return RateLimitResult(True, math.inf, 0.0)
+        buckets = self.buckets(group, api_key, session_id, client)
+        try:
+            allowed, remaining, wait = self.breaker.call(
+                self._take, [b[0] for b in buckets], cost, [(b[1], b[2]) for b in buckets]
+            )
+        except CircuitOpenError:
+            return RateLimitResult(True, math.inf, 0.0)
+        except Exception:
+            logger.warning("Rate limit check failed, letting the request through", exc_info=True)
+            return RateLimitResult(True, math.inf, 0.0)
+        return RateLimitResult(bool(int(allowed)), float(remaining), float(wait))
+
+
+rate_limiter = TokenBucketLimiter()
+
+# In-flight requests per route group in this worker (only touched on the event loop)
+_in_flight: Dict[str, int] = {}
+
+
+async def _session_id(request: Request, group: RouteGroup) -> Optional[str]:
+    session_id = request.headers.get(SESSION_HEADER)
+    if session_id or group.name != "chat":
+        return session_id
+    if "json" not in request.headers.get("content-type", ""):
+        return None
+    try:
+        if int(request.headers.get("content-length") or 0) > MAX_SESSION_BODY:
+            return None
+        body = json.loads(await request.body() or b"{}")
+    except ValueError:
+        return None
+    session_id = body.get("session_id") if isinstance(body, dict) else None
+    return str(session_id) if session_id else None
+
+
+def _too_many(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def rate_limit_middleware(request: Request, call_next):
+    group = route_group(request.method, request.url.path)
+    if group is None:
+        return await call_next(request)
+
+    in_flight = _in_flight.get(group.name, 0)
+    if group.max_in_flight and in_flight >= group.max_in_flight:
+        ADMISSION_REJECTED.labels(group.name, "concurrency").inc()
+        return _too_many(f"Too many concurrent {group.name} requests, try again shortly", 1)
+
+    _in_flight[group.name] = in_flight + 1
+    try:
+        if RATE_LIMIT_ENABLED:
+            try:
+                content_length = int(request.headers.get("content-length") or 0)
+            except ValueError:
+                content_length = 0
+            # One Redis round trip, in the threadpool; the breaker stops calling a slow / failing Redis
+            result = await anyio.to_thread.run_sync(partial(
+                rate_limiter.hit,
+                group,
+                request_cost(group, content_length),
+                api_key=request.headers.get(API_KEY_HEADER),
+                session_id=await _session_id(request, group),
+                client=request.client.host if request.client else None,
+            ))
+            if not result.allowed:
+                ADMISSION_REJECTED.labels(group.name, "rate").inc()
+                return _too_many(f"Rate limit exceeded for {group.name} requests", result.retry_after)
+
+        return await call_next(request)
+    finally:
+        _in_flight[group.name] -= 1
@@ -10,24 +10,49 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+# Bounds every command, so a hung server fails the call (and trips its breaker) instead of blocking it
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5)) or None   # seconds, 0 = none
 
 _redis_client = None
+_redis_binary_client = None
 
 def get_redis_client():
     global _redis_client
     if _redis_client is None:
         if REDIS_URL:
-            _redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+            _redis_client = redis.from_url(REDIS_URL, decode_responses=True, socket_timeout=REDIS_SOCKET_TIMEOUT)
         else:
             _redis_client = redis.Redis(
                 host=REDIS_HOST,
                 port=REDIS_PORT,
                 db=REDIS_DB,
                 password=REDIS_PASSWORD,
-                decode_responses=True
+                decode_responses=True,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
             )
     return _redis_client
 
+def get_redis_binary_client():
+    """
+    Same server, but returns raw bytes (for packed vectors and other binary values).
+    """
+    global _redis_binary_client
+    if _redis_binary_client is None:
+        if REDIS_URL:
+            _redis_binary_client = redis.from_url(
+                REDIS_URL, decode_responses=False, socket_timeout=REDIS_SOCKET_TIMEOUT
+            )
+        else:
+            _redis_binary_client = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                password=REDIS_PASSWORD,
+                decode_responses=False,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+            )
+    return _redis_binary_client
+
 def get_chat_history(session_id: str) -> list[str]:
     client = get_redis_client()
     return client.lrange(f"chat:{session_id}", 0, -1) or []
@@ -36,6 +61,16 @@ def save_message(session_id: str, role: str, message: str):
     client = get_redis_client()
     client.rpush(f"chat:{session_id}", f"{role}: {message}")
 
+def save_messages(session_id: str, messages: list[tuple[str, str]]) -> int:
+    """
+    Several (role, message) pairs in one round trip; returns the list's
+    length after the push.
+    """
+    client = get_redis_client()
+    if not messages:
+        return int(client.llen(f"chat:{session_id}"))
+    return int(client.rpush(f"chat:{session_id}", *(f"{role}: {message}" for role, message in messages)))
+
 def clear_chat_history(session_id: str):
     client = get_redis_client()
     client.delete(f"chat:{session_id}")
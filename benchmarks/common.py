@@ -0,0 +1,89 @@
+# benchmarks/common.py
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples_ms: Iterable[float]) -> Dict[str, float]:
+    values = np.asarray(list(samples_ms), dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_metadata(args) -> dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+def save_results(name: str, results: dict, output: Optional[str] = None) -> str:
+    """
+    Write results to `output` or benchmarks/results/<name>-<commit>-<time>.json.
+    """
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        meta = results.get("meta", {})
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{name}-{meta.get('commit') or 'nogit'}-{stamp}.json")
+
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    return output
+
+
+def compare(current: dict, baseline_path: str, keys: List[str]) -> List[str]:
+    """
+    Human readable deltas for the flattened `keys` (e.g. "latency_ms.end_to_end.p95").
+    """
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+
+    def lookup(data, dotted):
+        for part in dotted.split("."):
+            if isinstance(data, list) and part.isdigit() and int(part) < len(data):
+                data = data[int(part)]
+            elif isinstance(data, dict) and part in data:
+                data = data[part]
+            else:
+                return None
+        return data
+
+    lines = []
+    for key in keys:
+        new, old = lookup(current, key), lookup(baseline, key)
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        delta = ((new - old) / old * 100) if old else 0.0
+        lines.append(f"{key:<45} {old:>12.3f} -> {new:>12.3f}  ({delta:+.1f}%)")
+    return lines
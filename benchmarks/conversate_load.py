@@ -0,0 +1,163 @@
+# benchmarks/conversate_load.py
+"""
+Offline load test for POST /api/conversate.
+
+Boots the real FastAPI app in-process against local stand-ins (see
+benchmarks/standins.py), drives it at a fixed concurrency and reports
+throughput plus p50/p95/p99 end-to-end and per stage (taken from the
+request traces behind round_trip_id).
+
+    python -m benchmarks.conversate_load --requests 500 --concurrency 16
+    python -m benchmarks.conversate_load --compare benchmarks/results/<old>.json
+    python -m benchmarks.conversate_load --latency-budget-ms 1500 --llm-latency-ms 800
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+
+from benchmarks import standins
+from benchmarks.common import compare, run_metadata, save_results, summarize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline /conversate load test")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=20, help="distinct session ids (0 = no memory)")
+    parser.add_argument("--distinct-queries", type=int, default=50, help="size of the query pool")
+    parser.add_argument("--docs", type=int, default=200, help="synthetic documents to seed")
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=120)
+    parser.add_argument("--latency-budget-ms", type=float, default=0, help="X-Latency-Budget-Ms per request (0 = none)")
+    parser.add_argument("--encoder", choices=["synthetic", "model"], default="synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/...)")
+    parser.add_argument("--compare", help="baseline result JSON to diff against")
+    return parser.parse_args()
+
+
+def build_queries(n: int, seed: int):
+    rng = random.Random(seed)
+    templates = ["What does the document say about {}?", "Explain {} and {}", "How is {} related to {}?", "{} {}"]
+    queries = []
+    for _ in range(max(1, n)):
+        template = rng.choice(templates)
+        words = [rng.choice(standins.VOCABULARY) for _ in range(template.count("{}"))]
+        queries.append(template.format(*words))
+    return queries
+
+
+async def drive(client, args, queries, n_requests):
+    rng = random.Random(args.seed + 1)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    headers = {"X-Latency-Budget-Ms": str(args.latency_budget_ms)} if args.latency_budget_ms else {}
+
+    async def one(i: int):
+        body = {"query": rng.choice(queries), "top_k": args.top_k}
+        if args.sessions:
+            body["session_id"] = f"bench-{i % args.sessions}"
+
+        async with semaphore:
+            start = time.perf_counter()
+            degraded, status = [], None
+            try:
+                resp = await client.post("/api/conversate", json=body, headers=headers)
+                status = resp.status_code
+                ok = status == 200
+                data = resp.json() if ok else {}
+                rt_id, degraded = data.get("round_trip_id"), data.get("degraded") or []
+            except Exception:
+                ok, rt_id = False, None
+            results.append(((time.perf_counter() - start) * 1000, ok, rt_id, status, degraded))
+
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return results
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.services.trace_service import trace_store
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if args.warmup:
+            await drive(client, args, build_queries(args.distinct_queries, args.seed), args.warmup)
+
+        queries = build_queries(args.distinct_queries, args.seed)
+        start = time.perf_counter()
+        results = await drive(client, args, queries, args.requests)
+        elapsed = time.perf_counter() - start
+
+    stages = defaultdict(list)
+    statuses, degradations = defaultdict(int), defaultdict(int)
+    for _, ok, rt_id, status, degraded in results:
+        statuses[str(status)] += 1
+        for decision in degraded:
+            degradations[decision.split(":")[0]] += 1   # e.g. "top_k:4->2" -> "top_k"
+        record = trace_store.get(rt_id) if rt_id else None
+        for stage, ms in (record or {}).get("stages_ms", {}).items():
+            stages[stage].append(ms)
+
+    ok_latencies = [ms for ms, ok, *_ in results if ok]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok, *_ in results if not ok),
+        "statuses": dict(statuses),
+        "degraded_requests": sum(1 for *_, degraded in results if degraded),
+        "degradations": dict(degradations),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok_latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "end_to_end": summarize(ok_latencies),
+            "stages": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        },
+    }
+
+
+def main():
+    args = parse_args()
+
+    # Keep every trace of the run in the ring buffer
+    os.environ.setdefault("TRACE_BUFFER_SIZE", str(args.requests + args.warmup + 100))
+    standins.install(encoder=args.encoder)
+    standins.install_llm(args.llm_latency_ms, args.llm_tokens_per_sec, args.llm_completion_tokens)
+
+    seeded = standins.seed_corpus(args.docs, args.chunks_per_doc, seed=args.seed)
+    print(f"seeded {seeded} synthetic chunks")
+
+    results = {"meta": run_metadata(args), **asyncio.run(run(args))}
+    path = save_results("conversate", results, args.output)
+
+    e2e = results["latency_ms"]["end_to_end"]
+    print(f"\n{results['requests']} requests, {results['errors']} errors, "
+          f"{results['throughput_rps']} req/s at concurrency {args.concurrency}")
+    print(f"{'stage':<15}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for stage, summary in [("end_to_end", e2e), *results["latency_ms"]["stages"].items()]:
+        if summary.get("count"):
+            print(f"{stage:<15}{summary['p50']:>10.2f}{summary['p95']:>10.2f}{summary['p99']:>10.2f}")
+    if args.latency_budget_ms:
+        print(f"\nbudget {args.latency_budget_ms:.0f} ms: statuses {results['statuses']}, "
+              f"{results['degraded_requests']} degraded responses {results['degradations']}")
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        keys = ["throughput_rps"] + [
+            f"latency_ms.{group}.{p}"
+            for group in ["end_to_end", *(f"stages.{s}" for s in results["latency_ms"]["stages"])]
+            for p in ("p50", "p95", "p99")
+        ]
+        print("\n".join(compare(results, args.compare, keys)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# benchmarks/hnsw_tuning.py
+"""
+HNSW recall-vs-latency sweep against a Qdrant server.
+
+Takes a corpus of vectors (exported from the live collection, or
+synthetic clustered vectors), computes the exact top-k of every query
+with NumPy, then builds one scratch collection per (m, ef_construct) and
+measures recall@k and latency for every hnsw_ef:
+
+    python -m benchmarks.hnsw_tuning --source live --queries 500
+    python -m benchmarks.hnsw_tuning --source live --queries-file queries.txt --k 10
+    python -m benchmarks.hnsw_tuning --source synthetic --points 200000 \\
+        --m 8,16,32 --ef-construct 64,128,256 --hnsw-ef 16,32,64,128,256
+
+Sampled queries are held out of the indexed corpus (a query never finds
+itself). Logged queries (one per line, or JSONL with a "query" field) are
+embedded with the collection's model. Memory is estimated from the HNSW
+layout (vectors + graph links), as Qdrant does not report it per collection.
+
+The result maps onto runtime settings: HNSW_M / HNSW_EF_CONSTRUCT for new
+collections (re-index to apply) and SEARCH_EF_FAST / _BALANCED / _ACCURATE
+for the per-request search precision.
+
+The in-process Qdrant (QDRANT_URL=":memory:") always searches exactly, so
+its recall is 1.0 for every setting; use a real server for meaningful numbers.
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import compare, run_metadata, save_results, summarize
+
+TARGET_RECALLS = (0.9, 0.95, 0.99)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HNSW parameter sweep: recall@k vs latency vs memory")
+    parser.add_argument("--qdrant-url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--source", choices=["live", "synthetic"], default="live")
+    parser.add_argument("--collection", help="collection to export (default: the documents alias target)")
+    parser.add_argument("--max-points", type=int, default=0, help="cap on exported vectors (0 = all)")
+    parser.add_argument("--points", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector size")
+    parser.add_argument("--clusters", type=int, default=64, help="synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=200, help="queries sampled (and held out) from the corpus")
+    parser.add_argument("--queries-file", help="logged queries: one per line, or JSONL with a 'query' field")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", default="8,16,32")
+    parser.add_argument("--ef-construct", default="64,128,256")
+    parser.add_argument("--hnsw-ef", default="16,32,64,128,256")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed queries per setting")
+    parser.add_argument("--upload-batch", type=int, default=512)
+    parser.add_argument("--index-timeout", type=float, default=1800.0, help="seconds to wait for indexing")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/...)")
+    parser.add_argument("--compare", help="baseline result JSON to diff against")
+    return parser.parse_args()
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+# -----------------------------
+# Corpus + queries
+# -----------------------------
+def export_vectors(client, collection: str, max_points: int, page: int = 1024) -> np.ndarray:
+    vectors, offset = [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=page, offset=offset, with_payload=False, with_vectors=True
+        )
+        vectors.extend(p.vector for p in points if p.vector is not None)
+        if offset is None or (max_points and len(vectors) >= max_points):
+            break
+    if max_points:
+        vectors = vectors[:max_points]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Unit vectors around `clusters` random centres: closer to real embeddings
+    (topics) than uniform noise, where every neighbour is about as far.
+    """
+    centres = normalize(rng.standard_normal((max(1, clusters), dim)).astype(np.float32))
+    assignment = rng.integers(0, len(centres), size=n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.08
+    return normalize(centres[assignment] + noise)
+
+
+def read_queries(path: str) -> List[str]:
+    queries = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = (json.loads(line).get("query") or "").strip()
+            if line:
+                queries.append(line)
+    return queries
+
+
+def resolve_collection(client, name: Optional[str]) -> str:
+    if name:
+        return name
+    from app.utils.config import DOCUMENTS_ALIAS
+
+    for description in client.get_aliases().aliases:
+        if description.alias_name == DOCUMENTS_ALIAS:
+            return description.collection_name
+    raise SystemExit(f"Alias {DOCUMENTS_ALIAS} not found; pass --collection")
+
+
+def embed_logged_queries(path: str, collection: str) -> np.ndarray:
+    from app.services.embedding import generate_embeddings
+    from app.services.index_versions import collection_model_id
+
+    texts = read_queries(path)
+    if not texts:
+        raise SystemExit(f"No queries in {path}")
+    return np.asarray(
+        generate_embeddings(texts, use_cache=False, model_id=collection_model_id(collection)), dtype=np.float32
+    )
+
+
+# -----------------------------
+# Ground truth
+# -----------------------------
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, block: int = 256) -> np.ndarray:
+    """
+    Indices of the k most cosine-similar corpus vectors per query, best first.
+    """
+    corpus = normalize(corpus)
+    queries = normalize(queries)
+    k = min(k, len(corpus))
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block):
+        scores = queries[start:start + block] @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + block] = np.take_along_axis(top, order, axis=1)
+    return result
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth.tolist())]))
+
+
+def estimated_memory_mb(n: int, dim: int, m: int) -> Dict[str, float]:
+    """
+    float32 vectors plus HNSW links (4-byte ids): 2*m per point on level 0,
+    m per point on each upper level, which hold ~1/(m-1) of the points in total.
+    """
+    vectors = n * dim * 4
+    graph = n * 4 * (2 * m + m / max(1, m - 1))
+    return {
+        "vectors_mb": round(vectors / 2**20, 1),
+        "graph_mb": round(graph / 2**20, 1),
+        "total_mb": round((vectors + graph) / 2**20, 1),
+    }
+
+
+# -----------------------------
+# Sweep
+# -----------------------------
+def build_collection(
+    client, name: str, corpus: np.ndarray, m: int, ef_construct: int, args, wait_for_index: bool = True
+) -> float:
+    from qdrant_client.http import models
+
+    start = time.perf_counter()
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=corpus.shape[1], distance=models.Distance.COSINE),
+        # full_scan_threshold / indexing_threshold: build and use the graph even for small corpora
+        hnsw_config=models.HnswConfigDiff(m=m, ef_construct=ef_construct, full_scan_threshold=10),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1),
+    )
+    client.upload_collection(
+        collection_name=name, vectors=corpus, ids=list(range(len(corpus))), batch_size=args.upload_batch, wait=True
+    )
+
+    # Time to a fully built graph, not just to the acknowledged upload
+    deadline = time.monotonic() + args.index_timeout
+    while wait_for_index and time.monotonic() < deadline:
+        info = client.get_collection(name)
+        if info.status == models.CollectionStatus.GREEN and (info.indexed_vectors_count or 0) >= len(corpus):
+            break
+        time.sleep(0.5)
+    else:
+        if wait_for_index:
+            print(f"  warning: {name} not fully indexed after {args.index_timeout}s", flush=True)
+    return time.perf_counter() - start
+
+
+def run_queries(client, name: str, queries: np.ndarray, k: int, params, warmup: int):
+    for vector in queries[:warmup]:
+        client.search(collection_name=name, query_vector=vector.tolist(), limit=k, search_params=params)
+
+    found, latencies = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        hits = client.search(collection_name=name, query_vector=vector.tolist(), limit=k, search_params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([int(hit.id) for hit in hits])
+    return found, latencies
+
+
+def best_settings(cases: List[Dict]) -> Dict[str, Optional[Dict]]:
+    """
+    Per target recall: the setting with the lowest p99 that reaches it.
+    """
+    best = {}
+    for target in TARGET_RECALLS:
+        candidates = [c for c in cases if c["hnsw_ef"] is not None and c["recall"] >= target]
+        choice = min(candidates, key=lambda c: c["latency_ms"]["p99"], default=None)
+        if choice is None:
+            best[str(target)] = None
+            continue
+        best[str(target)] = {key: choice[key] for key in ("m", "ef_construct", "hnsw_ef", "recall")}
+        best[str(target)]["p99_ms"] = choice["latency_ms"]["p99"]
+    return best
+
+
+def main():
+    args = parse_args()
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+
+    client = QdrantClient(location=args.qdrant_url)
+    remote = args.qdrant_url.startswith("http")
+    if not remote:
+        print("warning: local Qdrant mode searches exactly; recall will be 1.0 for every setting", flush=True)
+
+    rng = np.random.default_rng(args.seed)
+    if args.source == "live":
+        collection = resolve_collection(client, args.collection)
+        corpus = export_vectors(client, collection, args.max_points)
+        print(f"exported {len(corpus)} vectors from {collection}", flush=True)
+    else:
+        collection = None
+        corpus = synthetic_vectors(args.points, args.dim, args.clusters, rng)
+
+    if args.queries_file:
+        if collection is None:
+            raise SystemExit("--queries-file needs --source live (queries are embedded with its model)")
+        queries = embed_logged_queries(args.queries_file, collection)
+    else:
+        held_out = rng.choice(len(corpus), size=min(args.queries, len(corpus) // 2), replace=False)
+        queries = corpus[held_out]
+        corpus = np.delete(corpus, held_out, axis=0)
+    if len(corpus) == 0 or len(queries) == 0:
+        raise SystemExit("Not enough vectors to tune on")
+
+    start = time.perf_counter()
+    truth = exact_top_k(corpus, queries, args.k)
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, "
+          f"ground truth in {time.perf_counter() - start:.1f}s", flush=True)
+
+    cases = []
+    for m in int_list(args.m):
+        for ef_construct in int_list(args.ef_construct):
+            name = f"hnsw_tune_m{m}_efc{ef_construct}_{uuid.uuid4().hex[:6]}"
+            try:
+                build_s = build_collection(client, name, corpus, m, ef_construct, args, wait_for_index=remote)
+                memory = estimated_memory_mb(len(corpus), corpus.shape[1], m)
+                print(f"m={m} ef_construct={ef_construct}: built in {build_s:.1f}s, ~{memory['total_mb']} MB",
+                      flush=True)
+
+                settings = [(ef, models.SearchParams(hnsw_ef=ef)) for ef in int_list(args.hnsw_ef)]
+                settings.append((None, models.SearchParams(exact=True)))
+                for ef, params in settings:
+                    found, latencies = run_queries(client, name, queries, args.k, params, args.warmup)
+                    case = {
+                        "m": m,
+                        "ef_construct": ef_construct,
+                        "hnsw_ef": ef,   # None = exact search
+                        "recall": round(recall_at_k(found, truth), 4),
+                        "latency_ms": summarize(latencies),
+                        "qps": round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else None,
+                        "build_s": round(build_s, 2),
+                        "memory_est": memory,
+                    }
+                    cases.append(case)
+                    print(f"  hnsw_ef={'exact' if ef is None else ef:<6} recall@{args.k} {case['recall']:.4f} | "
+                          f"p50 {case['latency_ms']['p50']} ms | p99 {case['latency_ms']['p99']} ms", flush=True)
+            finally:
+                if not args.keep and client.collection_exists(name):
+                    client.delete_collection(name)
+
+    best = best_settings(cases)
+    print("\nlowest p99 per target recall:")
+    for target, choice in best.items():
+        print(f"  recall >= {target}: {choice or 'not reached'}")
+
+    results = {
+        "meta": run_metadata(args),
+        "corpus": {"points": int(len(corpus)), "dim": int(corpus.shape[1]), "queries": int(len(queries))},
+        "k": args.k,
+        "cases": cases,
+        "best": best,
+    }
+    path = save_results("hnsw", results, args.output)
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        keys = [f"cases.{i}.{metric}" for i in range(len(cases)) for metric in ("recall", "latency_ms.p99")]
+        print("\n".join(compare(results, args.compare, keys)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# benchmarks/ingestion_bench.py
+"""
+Ingestion throughput per stage, fully offline.
+
+Generates synthetic PDFs and text files of increasing size, then times
+extract -> chunk -> embed -> upsert in isolation and end to end
+(`ingest_document`), against the in-process Qdrant stand-in and an
+in-memory SQLite database (see benchmarks/standins.py).
+
+    python -m benchmarks.ingestion_bench --pages 1,10,50,200
+    python -m benchmarks.ingestion_bench --encoder model --strategies fixed
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import List
+
+from benchmarks import standins
+from benchmarks.common import compare, run_metadata, save_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline ingestion pipeline benchmark")
+    parser.add_argument("--pages", default="1,10,50,200", help="comma-separated document sizes in pages")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--formats", default="pdf,txt")
+    parser.add_argument("--strategies", default="fixed,paragraph")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case (best one is kept)")
+    parser.add_argument("--encoder", choices=["synthetic", "model"], default="synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/...)")
+    parser.add_argument("--compare", help="baseline result JSON to diff against")
+    return parser.parse_args()
+
+
+# -----------------------------
+# Memory sampling
+# -----------------------------
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class PeakRss:
+    """
+    Samples RSS in a background thread; `peak_mb` is the maximum seen in the block.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes() or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes() or 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes() or 0)
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / 2**20, 1) if self.peak else None
+
+
+# -----------------------------
+# Synthetic documents
+# -----------------------------
+def page_paragraphs(rng: random.Random, words: int) -> List[str]:
+    paragraphs, remaining = [], words
+    while remaining > 0:
+        n = min(remaining, rng.randint(40, 120))
+        paragraphs.append(standins.random_text(rng, n))
+        remaining -= n
+    return paragraphs
+
+
+def page_text(rng: random.Random, words: int) -> str:
+    return "\n\n".join(page_paragraphs(rng, words))
+
+
+def make_pdf(path: str, pages: int, words_per_page: int, rng: random.Random):
+    import fitz  # PyMuPDF
+
+    with fitz.open() as doc:
+        for _ in range(pages):
+            page = doc.new_page()
+            writer = fitz.TextWriter(page.rect)
+            # PyMuPDF's text output drops empty lines, but keeps a line holding
+            # one space: "\n \n" is what paragraph chunking sees as a break
+            overflow = writer.fill_textbox(
+                page.rect + (36, 36, -36, -36), "\n \n".join(page_paragraphs(rng, words_per_page)), fontsize=7
+            )
+            if overflow:
+                raise ValueError(f"--words-per-page {words_per_page} does not fit on a page")
+            writer.write_text(page)
+        doc.save(path)
+
+
+def make_txt(path: str, pages: int, words_per_page: int, rng: random.Random):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("\n\n".join(page_text(rng, words_per_page) for _ in range(pages)))
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def timed(fn, *args, **kwargs):
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, rss.peak_mb
+
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def run_case(path, filename, fmt, pages, strategy, db):
+    from qdrant_client.http import models as qdrant_models
+    from app.services.chunking import fixed_length_chunking, paragraph_chunking
+    from app.services.embedding import generate_embeddings
+    from app.services.ingestion import ingest_document
+    from app.services.text_extraction import extract_text_from_pdf, extract_text_from_txt
+    from app.services.vector_db import client, create_payload_indexes, hnsw_config, upsert_vectors
+
+    extract = extract_text_from_pdf if fmt == "pdf" else extract_text_from_txt
+    chunker = fixed_length_chunking if strategy == "fixed" else paragraph_chunking
+
+    text, t_extract, m_extract = timed(extract, path)
+    chunks, t_chunk, m_chunk = timed(chunker, text)
+    if strategy == "paragraph" and len(chunks) < 2:
+        # one chunk = the paragraph breaks were lost, and the case measures nothing
+        raise RuntimeError(f"{filename}: paragraph chunking produced {len(chunks)} chunk(s)")
+    # As ingestion does: chunks bypass the query embedding cache, so repeats still encode
+    vectors, t_embed, m_embed = timed(generate_embeddings, chunks, use_cache=False)
+    points = [
+        qdrant_models.PointStruct(id=str(uuid.uuid4()), vector=v, payload={"chunk": c, "document_id": 0})
+        for c, v in zip(chunks, vectors)
+    ]
+    # Stage upsert into a scratch collection (configured like the live one), dropped afterwards
+    scratch = f"bench_upsert_{uuid.uuid4().hex[:8]}"
+    client.create_collection(
+        collection_name=scratch,
+        vectors_config=qdrant_models.VectorParams(size=len(vectors[0]), distance=qdrant_models.Distance.COSINE),
+        hnsw_config=hnsw_config(),
+    )
+    try:
+        create_payload_indexes(scratch)
+        _, t_upsert, m_upsert = timed(upsert_vectors, scratch, points)
+    finally:
+        client.delete_collection(scratch)
+    _, t_total, m_total = timed(ingest_document, db, path, filename, strategy)
+
+    return {
+        "format": fmt,
+        "pages": pages,
+        "chunk_strategy": strategy,
+        "chars": len(text),
+        "chunks": len(chunks),
+        "seconds": {
+            "extract": round(t_extract, 4),
+            "chunk": round(t_chunk, 4),
+            "embed": round(t_embed, 4),
+            "upsert": round(t_upsert, 4),
+            "end_to_end": round(t_total, 4),
+        },
+        "pages_per_sec": rate(pages, t_extract),
+        "chunks_per_sec": rate(len(chunks), t_chunk),
+        "embeddings_per_sec": rate(len(chunks), t_embed),
+        "upserts_per_sec": rate(len(chunks), t_upsert),
+        "end_to_end_pages_per_sec": rate(pages, t_total),
+        "peak_rss_mb": {
+            "extract": m_extract,
+            "chunk": m_chunk,
+            "embed": m_embed,
+            "upsert": m_upsert,
+            "end_to_end": m_total,
+        },
+    }
+
+
+def main():
+    args = parse_args()
+    # Measure extraction itself, not the per-page cache
+    os.environ.setdefault("PDF_PAGE_CACHE_DIR", "")
+    standins.install(encoder=args.encoder)
+
+    from app.db.database import SessionLocal
+    from app.services.vector_db import create_collection
+
+    db = SessionLocal()
+    create_collection()
+
+    rng = random.Random(args.seed)
+    sizes = [int(p) for p in args.pages.split(",") if p]
+    formats = [f for f in args.formats.split(",") if f]
+    strategies = [s for s in args.strategies.split(",") if s]
+    cases = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            for pages in sizes:
+                filename = f"synthetic_{pages}p.{fmt}"
+                path = os.path.join(tmp, filename)
+                (make_pdf if fmt == "pdf" else make_txt)(path, pages, args.words_per_page, rng)
+
+                for strategy in strategies:
+                    runs = [run_case(path, filename, fmt, pages, strategy, db) for _ in range(max(1, args.repeat))]
+                    best = min(runs, key=lambda r: r["seconds"]["end_to_end"])
+                    cases.append(best)
+                    print(
+                        f"{fmt:<4}{pages:>6}p {strategy:<10}{best['chunks']:>7} chunks | "
+                        f"extract {best['pages_per_sec']} p/s | chunk {best['chunks_per_sec']} c/s | "
+                        f"embed {best['embeddings_per_sec']} e/s | upsert {best['upserts_per_sec']} v/s | "
+                        f"e2e {best['seconds']['end_to_end']}s | peak {best['peak_rss_mb']['end_to_end']} MB"
+                    )
+
+    results = {"meta": run_metadata(args), "cases": cases}
+    path = save_results("ingestion", results, args.output)
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        keys = [
+            f"cases.{i}.{metric}"
+            for i in range(len(cases))
+            for metric in ("pages_per_sec", "chunks_per_sec", "embeddings_per_sec", "upserts_per_sec")
+        ]
+        print("\n".join(compare(results, args.compare, keys)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/standins.py
+"""
+Local stand-ins so the real FastAPI app can be benchmarked offline:
+  - Qdrant  -> in-process store (QDRANT_URL=":memory:")
+  - Redis   -> fakeredis
+  - SQLite  -> a private in-memory database (app_data.db is never touched)
+  - Groq    -> the LLM gateway's StubBackend (configurable latency and token rate)
+  - Encoder -> SyntheticEncoder, only when the sentence-transformers
+               model is not available locally (--encoder synthetic)
+Per-caller rate limits are off (one client sends every request) unless
+RATE_LIMIT_ENABLED is set; concurrency admission still applies.
+
+`install()` must run BEFORE anything from `app` is imported.
+"""
+import hashlib
+import os
+import random
+import uuid
+from types import SimpleNamespace
+from typing import List, Sequence, Union
+
+import numpy as np
+
+DIM = 384
+
+VOCABULARY = (
+    "galaxy star planet orbit gravity black hole universe energy matter light "
+    "booking interview schedule candidate email date time document file report "
+    "policy contract invoice payment refund account customer support product "
+    "release feature version upgrade install configure network server database"
+).split()
+
+
+class SyntheticEncoder:
+    """
+    Deterministic hashed bag-of-words encoder with the SentenceTransformer
+    `encode` surface. Cost is negligible, so only the pipeline is measured.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.dim = DIM
+        # Uncased, like all-MiniLM-L6-v2
+        self.tokenizer = SimpleNamespace(do_lower_case=True)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vec[int.from_bytes(digest, "little") % self.dim] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences: Union[str, Sequence[str]], **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._encode_one(s) for s in sentences])
+
+
+def install(encoder: str = "synthetic"):
+    os.environ["QDRANT_URL"] = ":memory:"
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    if encoder == "synthetic":
+        import sentence_transformers
+        sentence_transformers.SentenceTransformer = SyntheticEncoder
+
+    import fakeredis
+    from app.utils import redis_client
+    server = fakeredis.FakeServer()
+    redis_client._redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_client._redis_binary_client = fakeredis.FakeRedis(server=server)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+    from app.db import database, session
+    from app.db.models import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    database.engine = session.engine = engine
+    database.SessionLocal.configure(bind=engine)
+
+
+def install_llm(latency_ms: float, tokens_per_sec: float, completion_tokens: int):
+    """
+    Point the real LLM gateway (coalescing, limits, retries) at a stub backend.
+    """
+    from app.services.llm_service import StubBackend, gateway
+
+    gateway.set_backend(StubBackend(latency_ms, tokens_per_sec, completion_tokens))
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def seed_corpus(n_docs: int, chunks_per_doc: int, words_per_chunk: int = 120, seed: int = 0, batch_size: int = 1000) -> int:
+    """
+    (Re)create the documents collection and fill it with synthetic unit vectors.
+    """
+    from qdrant_client.http import models as qdrant_models
+    from app.services.vector_db import DOCUMENTS_ALIAS, create_collection, upsert_vectors
+
+    create_collection()
+
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    batch: List[qdrant_models.PointStruct] = []
+    total = 0
+
+    for doc_id in range(1, n_docs + 1):
+        vectors = np_rng.standard_normal((chunks_per_doc, DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        for chunk_id, vector in enumerate(vectors):
+            batch.append(
+                qdrant_models.PointStruct(
+                    id=str(uuid.UUID(int=rng.getrandbits(128))),
+                    vector=vector.tolist(),
+                    payload={
+                        "chunk": random_text(rng, words_per_chunk),
+                        "filename": f"synthetic_{doc_id}.txt",
+                        "chunk_id": chunk_id,
+                        "document_id": doc_id,
+                    },
+                )
+            )
+            if len(batch) >= batch_size:
+                upsert_vectors(DOCUMENTS_ALIAS, batch)
+                total += len(batch)
+                batch = []
+
+    if batch:
+        upsert_vectors(DOCUMENTS_ALIAS, batch)
+        total += len(batch)
+
+    return total
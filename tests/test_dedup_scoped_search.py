@@ -0,0 +1,74 @@
+# tests/test_dedup_scoped_search.py
+"""
+Near-duplicate chunks must stay visible to scoped searches.
+
+Runs offline against the benchmark stand-ins (in-process Qdrant, fakeredis,
+in-memory SQLite, synthetic encoder):
+
+    python -m pytest -q tests
+"""
+import os
+import random
+
+from benchmarks import standins
+
+standins.install()
+
+import pytest  # noqa: E402
+
+from app.db.database import SessionLocal  # noqa: E402
+from app.services.dedup import dedup_index  # noqa: E402
+from app.services.ingestion import ingest_document  # noqa: E402
+from app.services.rag_service import RAGService  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def duplicated_documents(tmp_path_factory):
+    """
+    The same text uploaded as a.txt, then as b.txt (every chunk of b is a duplicate).
+    """
+    rng = random.Random(7)
+    text = "\n\n".join(standins.random_text(rng, 80) for _ in range(6))
+    directory = tmp_path_factory.mktemp("docs")
+    db = SessionLocal()
+    results = []
+    try:
+        for name in ("a.txt", "b.txt"):
+            path = os.path.join(directory, name)
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text)
+            results.append(ingest_document(db, path, name, "paragraph"))
+    finally:
+        db.close()
+    return text, results
+
+
+def test_duplicates_are_stored_as_points(duplicated_documents):
+    _, (a, b) = duplicated_documents
+    assert a["duplicate_chunks"] == 0
+    assert b["duplicate_chunks"] == b["total_chunks"]
+    assert len(b["vector_ids"]) == b["total_chunks"]
+
+    db = SessionLocal()
+    try:
+        assert dedup_index.stats(db)["embeddings_saved"] == b["total_chunks"]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("scope_by", ["document_ids", "filenames"])
+def test_scoped_search_finds_duplicated_document(duplicated_documents, scope_by):
+    text, (_, b) = duplicated_documents
+    scope = {"document_ids": [b["document_id"]]} if scope_by == "document_ids" else {"filenames": ["b.txt"]}
+    query = text.split("\n\n")[2]
+
+    hits = RAGService().search(query, limit=3, mode="semantic", **scope)
+    assert hits
+    assert {hit["document_id"] for hit in hits} == {b["document_id"]}
+    assert hits[0]["chunk"] == query
+
+
+def test_hierarchical_search_sees_both_documents(duplicated_documents):
+    text, (a, b) = duplicated_documents
+    hits = RAGService().search(text.split("\n\n")[0], limit=4, mode="hierarchical")
+    assert {hit["document_id"] for hit in hits} == {a["document_id"], b["document_id"]}